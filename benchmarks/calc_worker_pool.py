@@ -0,0 +1,101 @@
+"""プリント生成のコールド（毎回サブプロセス）とウォーム（常駐ワーカー）のレイテンシ比較。
+
+    python -m benchmarks.calc_worker_pool [--script PATH] [--runs N]
+
+--script を省略すると calculation_practice_program/create_worksheet.py を使い、
+無ければ重めの import だけを行う合成スクリプトで測る（ファイルは生成しない）。
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from server.features.calculator.routes import BASE_DIR, SCRIPT_PATH
+from server.features.calculator.worker import WorkerPool
+
+SYNTHETIC_SCRIPT = """\
+import decimal
+import email.mime.multipart
+import fractions
+import http.client
+import json
+import random
+import statistics
+import xml.dom.minidom
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    problems = [fractions.Fraction(rng.randint(1, 99), rng.randint(1, 99)) for _ in range(200)]
+    print(f"generated {len(problems)} problems")
+    print("OUTPUT::/tmp/bench.pdf::/tmp/bench.tex")
+"""
+
+
+def _summary(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples) * 1000, 1),
+        "p50_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def bench_cold(script, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(script)], capture_output=True, text=True, cwd=BASE_DIR, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_warm(script, runs):
+    pool = WorkerPool(script, BASE_DIR, size=1, max_jobs=runs + 1)
+    start = time.perf_counter()
+    pool.warm_up()
+    startup = time.perf_counter() - start
+    samples = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = pool.run(timeout=300)
+            samples.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr)
+    finally:
+        pool.shutdown()
+    return startup, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", type=Path)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    script = args.script or (SCRIPT_PATH if SCRIPT_PATH.exists() else None)
+    tmpdir = None
+    if script is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        script = Path(tmpdir.name) / "synthetic_worksheet.py"
+        script.write_text(SYNTHETIC_SCRIPT, encoding="utf-8")
+
+    cold = bench_cold(script, args.runs)
+    startup, warm = bench_warm(script, args.runs)
+    report = {
+        "script": str(script),
+        "cold_subprocess": _summary(cold),
+        "warm_pool": {**_summary(warm), "pool_startup_ms": round(startup * 1000, 1)},
+        "speedup_p50": round(statistics.median(cold) / statistics.median(warm), 1),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""ベンチマーク用の合成データ（件数と乱数の種が同じなら同じ内容）。
+
+    python -m benchmarks.dataset PATH [--todos 10000] [--sessions 200000] [--words 100000] [--seed 0]
+    python benchmarks/dataset.py PATH ...（直接実行も可）
+
+日付は実行日を基準にするので、履歴系の API は日をまたいでも同じ形のデータを返す。
+単語は全文検索のトライグラムが偏らないよう、音節を組み合わせた架空の語にする。
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# python benchmarks/dataset.py で直接実行した時も server を import できるように
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from server.app import create_app
+from server.extensions import borrow_db, get_pool, return_db
+from server.ordering import keys_between
+from server.schema_helpers import rebuild_daily_totals
+
+DEFAULT_SIZES = {"todos": 10_000, "sessions": 200_000, "words": 100_000, "artifacts": 1_000}
+DEFAULT_YEARS = 5
+# アプリが使うセクション。future は繰り越し（today → future）で溜まるので多めにする
+TODO_SECTIONS = ("today", "future")
+TODO_SECTION_WEIGHTS = (4, 6)
+
+SYLLABLES = (
+    "ka", "ri", "mon", "tel", "stra", "pe", "lo", "vin", "dor", "ex", "qua", "zen", "bru", "fi",
+    "sol", "ne", "ta", "gor", "lin", "mu", "ca", "ble", "tion", "ous", "pre", "ant", "ver", "ish",
+)
+PARTS = ("【名】", "【動】", "【形】", "【副】")
+MEANINGS = ("本", "予約する", "静かな", "急いで", "道具", "集める", "明るい", "約束", "続ける", "重要な")
+TEMPLATES = (
+    "The {w} was left on the table.",
+    "She wanted to {w} before the meeting.",
+    "It is a very {w} idea.",
+    "We talked about the {w} all night.",
+)
+
+
+def make_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _todo_rows(rng, count):
+    per_section = {section: [] for section in TODO_SECTIONS}
+    for i in range(count):
+        per_section[rng.choices(TODO_SECTIONS, weights=TODO_SECTION_WEIGHTS)[0]].append(i)
+    for section, items in per_section.items():
+        for order, (i, key) in enumerate(zip(items, keys_between(None, None, len(items)))):
+            indent = 0 if order == 0 else rng.choice((0, 0, 0, 1, 1, 2))
+            yield (f"todo {i}: {make_word(rng)} {make_word(rng)}", rng.random() < 0.3, indent, section, order, key)
+
+
+def todo_layout(count, seed=0):
+    """seed() が入れる todo の (セクション, indent_level)。i 番目が id = i + 1（空の DB に入れた時）。"""
+    return [(section, indent) for _, _, indent, section, _, _ in _todo_rows(random.Random(f"todos-{seed}"), count)]
+
+
+def _session_rows(rng, count, today, years):
+    days = years * 365
+    for _ in range(count):
+        day = today - timedelta(days=rng.randrange(days))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(6 * 3600, 23 * 3600))
+        duration = int(min(max(rng.lognormvariate(6.5, 0.8), 60), 3 * 3600))
+        yield (start, start + timedelta(seconds=duration), duration)
+
+
+def _word_rows(rng, count, today, years):
+    now = datetime.combine(today, datetime.min.time())
+    for _ in range(count):
+        word = make_word(rng)
+        status = rng.choices(("new", "learning", "mastered"), weights=(3, 5, 2))[0]
+        level = 0 if status == "new" else rng.randint(1, 8)
+        yield (
+            word,
+            f"{rng.choice(PARTS)}{rng.choice(MEANINGS)}",
+            rng.choice(TEMPLATES).format(w=word),
+            f"{word} についての例文です。",
+            f"/{word}/",
+            status,
+            level,
+            (today + timedelta(days=rng.randint(-60, 60))).isoformat(),
+            now - timedelta(minutes=rng.randrange(years * 365 * 24 * 60)),
+            "memo" if rng.random() < 0.1 else "",
+            rng.random() < 0.05,
+        )
+
+
+def _artifact_rows(count, now):
+    for i in range(count):
+        issued = (date.fromtimestamp(now) - timedelta(days=count - i)).strftime("%Y%m%d")
+        base_name = f"第{i + 1}回_{issued}_計算プリント"
+        mtime = now - (count - i) * 86400
+        yield (
+            "/bench/output", base_name, i + 1, issued,
+            f"/bench/output/{base_name}.pdf", f"/bench/output/{base_name}.tex",
+            40_000 + i, 8_000 + i, mtime, f"key{i}", mtime,
+        )
+
+
+def seed(conn, todos=DEFAULT_SIZES["todos"], sessions=DEFAULT_SIZES["sessions"], words=DEFAULT_SIZES["words"],
+         artifacts=DEFAULT_SIZES["artifacts"], years=DEFAULT_YEARS, seed=0):
+    """移行済みの空の DB に合成データを入れる。表ごとに別の乱数列を使うので件数を変えても他は変わらない。"""
+    today = date.today()
+    with conn:
+        conn.executemany(
+            "INSERT INTO todos (content, is_completed, indent_level, section, display_order, sort_key) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            _todo_rows(random.Random(f"todos-{seed}"), todos),
+        )
+        conn.executemany(
+            "INSERT INTO work_sessions (start_time, end_time, duration, status) VALUES (?, ?, ?, 'completed')",
+            sorted(_session_rows(random.Random(f"sessions-{seed}"), sessions, today, years)),
+        )
+        rebuild_daily_totals(conn)
+        conn.executemany(
+            "INSERT INTO words (word, meaning, example_en, example_jp, pronunciation, status, level, "
+            "next_review_date, created_at, memo, is_favorite) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            _word_rows(random.Random(f"words-{seed}"), words, today, years),
+        )
+        conn.executemany(
+            "INSERT INTO calc_artifacts (directory, base_name, edition, issue_date, pdf_path, tex_path, "
+            "pdf_size, tex_size, mtime, config_key, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            _artifact_rows(artifacts, time.time()),
+        )
+    conn.execute("ANALYZE")
+    return {"todos": todos, "sessions": sessions, "words": words, "artifacts": artifacts, "years": years, "seed": seed}
+
+
+def build(path, sizes=None, years=DEFAULT_YEARS, seed_value=0, asset_cache_dir=""):
+    """path に移行済みの DB を作ってデータを入れ、WAL を本体に書き戻して閉じる（コピーして使える状態）。"""
+    path = Path(path)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    app = create_app({"DATABASE": str(path), "ASSET_CACHE_DIR": asset_cache_dir})
+    with app.app_context():
+        conn = borrow_db()
+        try:
+            info = seed(conn, years=years, seed=seed_value, **(sizes or DEFAULT_SIZES))
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            return_db(conn)
+        get_pool().close_all()
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path)
+    for name, default in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sizes = {name: getattr(args, name) for name in DEFAULT_SIZES}
+    info = build(args.path, sizes, years=args.years, seed_value=args.seed)
+    info["seconds"] = round(time.perf_counter() - start, 1)
+    print(json.dumps(info, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
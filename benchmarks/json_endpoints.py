@@ -0,0 +1,126 @@
+"""一覧系 API の応答サイズと所要時間（JSON 化と圧縮の前後比較）。
+
+    python -m benchmarks.json_endpoints [--words 5000] [--todos 500] [--runs 50]
+
+一時ディレクトリの DB に合成データを入れ、テストクライアントで各エンドポイントを
+叩いて、応答のバイト数と 1 回あたりのミリ秒を比べる。
+
+- baseline: 標準の json（キーを並べ替え、Row は dict に変換）・圧縮なし
+- fast: serialization.FastJSONProvider（orjson があれば orjson）・圧縮なし
+- fast+gzip / fast+br: 上に加えて Accept-Encoding に応じて圧縮（br は brotli がある時だけ）
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask.json.provider import DefaultJSONProvider
+
+from server import compression, serialization
+from server.app import create_app
+from server.extensions import borrow_db, return_db
+from server.features.timer.models import rebuild_daily_totals
+
+ENDPOINTS = ("/api/english/list", "/api/todos", "/api/timer/history")
+
+
+class BaselineProvider(DefaultJSONProvider):
+    """変更前と同じ標準の json。モデルが dict(row) していた分は default で変換する。"""
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, sqlite3.Row):
+            return dict(obj)
+        return DefaultJSONProvider.default(obj)
+
+
+def populate(app, words, todos):
+    now = datetime.now()
+    with app.app_context():
+        conn = borrow_db()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO words (word, meaning, example_en, example_jp, pronunciation, status, level, "
+                    "next_review_date, created_at, memo) VALUES (?, ?, ?, ?, ?, 'learning', ?, ?, ?, ?)",
+                    (
+                        (
+                            f"word{i}", f"意味 {i}（名詞）", f"This is an example sentence for word{i}.",
+                            f"これは word{i} の例文です。", f"/wɜːd{i}/", i % 6,
+                            (now + timedelta(days=i % 30)).date(), now - timedelta(minutes=i), "memo" if i % 7 == 0 else "",
+                        )
+                        for i in range(words)
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO todos (content, section, indent_level, sort_key) VALUES (?, ?, ?, ?)",
+                    ((f"todo item {i}", ("today", "tomorrow", "someday")[i % 3], i % 2, f"a{i:06d}") for i in range(todos)),
+                )
+                conn.executemany(
+                    "INSERT INTO work_sessions (start_time, end_time, duration, status) VALUES (?, ?, 1500, 'completed')",
+                    (
+                        (now - timedelta(hours=i * 2, minutes=25), now - timedelta(hours=i * 2))
+                        for i in range(80)
+                    ),
+                )
+                rebuild_daily_totals(conn)
+        finally:
+            return_db(conn)
+
+
+def measure(client, path, runs, accept_encoding):
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    client.get(path, headers=headers)  # ウォームアップ
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "bytes": len(response.get_data()),
+        "encoding": response.headers.get("Content-Encoding", "identity"),
+        "ms": round(statistics.median(timings), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--todos", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    variants = [
+        ("baseline", BaselineProvider, False, None),
+        ("fast", serialization.FastJSONProvider, False, None),
+        ("fast+gzip", serialization.FastJSONProvider, True, "gzip"),
+    ]
+    if compression.brotli is not None:
+        variants.append(("fast+br", serialization.FastJSONProvider, True, "br, gzip"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({"DATABASE": str(Path(tmp) / "bench.db")})
+        populate(app, args.words, args.todos)
+        client = app.test_client()
+
+        report = {
+            "words": args.words,
+            "todos": args.todos,
+            "encoder": "orjson" if serialization.orjson is not None else "json",
+            "endpoints": {},
+        }
+        for path in ENDPOINTS:
+            results = report["endpoints"][path] = {}
+            for name, provider, compress, accept in variants:
+                app.json = provider(app)
+                app.config["COMPRESS_RESPONSES"] = compress
+                results[name] = measure(client, path, args.runs, accept)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,601 @@
+"""全 blueprint を対象にしたエンドポイント単位のレイテンシとスループット。
+
+    python -m benchmarks.load_test run [--mode client,http] [--requests 200] [--duration 20]
+                                       [--concurrency 8] [--output report.json] [--dataset-cache DIR]
+    python -m benchmarks.load_test compare BASE.json NEW.json [--max-regression 0.2]
+    python -m benchmarks.load_test serve --db PATH [--port 5055]   # スタブ入りでサーバーだけ起動
+
+run は benchmarks.dataset の合成データ（既定で todo 1 万・作業セッション 20 万・単語 10 万）を
+作り、モードごとに DB をコピーして測る。
+
+- client: Flask のテストクライアントでシナリオを 1 つずつ --requests 回（重いものは 1/20）
+  順に実行する。ネットワークを通さないアプリ本体の時間
+- http: スタブ入りのサーバーを別プロセスで起動し（waitress があれば waitress、無ければ
+  werkzeug のスレッドサーバー）、--concurrency 本のスレッドが重み付きのシナリオを
+  --duration 秒間 keep-alive で送り続ける
+
+Gemini は決まった JSON を返すスタブ、プリント生成スクリプトはダミーの PDF / TeX を
+書くだけのスクリプトに差し替える（--gemini-latency-ms / --calc-delay-ms で遅延を足せる）。
+/api/open-path は Finder を開くので対象外。
+
+結果はエンドポイントごとの件数・エラー数・p50 / p95 / p99 / 平均 / 最大（ミリ秒）と
+スループット（1 秒あたりの件数）の JSON で、コミットと環境の情報を含む。compare は
+2 つの結果を比べ、p95 が --max-regression の割合以上（かつ --min-delta-ms 以上）悪化したか、
+http のスループットが同じ割合以上落ちたエンドポイントがあれば終了コード 1 を返す。
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+from . import dataset
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+DEFAULT_REQUESTS = 200
+DEFAULT_DURATION = 20.0
+DEFAULT_CONCURRENCY = 8
+DEFAULT_SERVER_THREADS = 8
+DEFAULT_MAX_REGRESSION = 0.2
+DEFAULT_MIN_DELTA_MS = 1.0
+WARMUP_REQUESTS = 3
+HEAVY_DIVISOR = 20
+READY_TIMEOUT = 120
+
+CALC_STUB_SCRIPT = """\
+import time
+from pathlib import Path
+
+OUTPUT_DIR = Path({output!r})
+DELAY_SECONDS = {delay!r}
+
+if __name__ == "__main__":
+    time.sleep(DELAY_SECONDS)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    base = OUTPUT_DIR / ("第1回_" + time.strftime("%Y%m%d") + "_計算プリント")
+    base.with_suffix(".tex").write_text("% benchmark stub\\n", encoding="utf-8")
+    base.with_suffix(".pdf").write_bytes(b"%PDF-1.4 benchmark stub\\n")
+    print("OUTPUT::" + str(base.with_suffix(".pdf")) + "::" + str(base.with_suffix(".tex")))
+"""
+
+_WORD_RE = re.compile(r'English word: "(.*)"')
+_BATCH_ITEM_RE = re.compile(r'^\s*- (".*")$', re.M)
+
+
+class StubModel:
+    """Gemini の代わり。プロンプト中の語から決まった形の JSON を返す。"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    @staticmethod
+    def _info(word):
+        return {
+            "word": word,
+            "meaning": "【名】ベンチマーク用の語",
+            "pronunciation": f"/{word}/",
+            "example_en": f"This is a {word}.",
+            "example_jp": f"これは {word} です。",
+        }
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        if '"input"' in prompt:
+            words = [json.loads(item) for item in _BATCH_ITEM_RE.findall(prompt)]
+            text = json.dumps([{"input": word, **self._info(word)} for word in words], ensure_ascii=False)
+        else:
+            text = json.dumps(self._info(_WORD_RE.search(prompt).group(1)), ensure_ascii=False)
+        return SimpleNamespace(text=text)
+
+
+def install_stubs(workdir, gemini_latency=0.0, calc_delay=0.0):
+    """このプロセスの Gemini クライアントとプリント生成スクリプト・設定を workdir 内のスタブにする。"""
+    from server.features.calculator import routes as calc_routes
+    from server.features.calculator.artifacts import ArtifactStore
+    from server.features.calculator.config_store import ConfigStore
+    from server.features.english import services
+
+    services.set_client(StubModel(gemini_latency))
+
+    program = Path(workdir) / "calculation_practice_program"
+    output = program / "output"
+    output.mkdir(parents=True, exist_ok=True)
+    script = program / "create_worksheet.py"
+    script.write_text(CALC_STUB_SCRIPT.format(output=str(output), delay=calc_delay), encoding="utf-8")
+    config = program / "config.json"
+    config.write_text(json.dumps({
+        "scheduler": {"edition": 1, "start_date": date.today().strftime("%Y/%m/%d"), "num_days": 5},
+        "output": {"directory": str(output)},
+        "categories": {"addition": {"per_day": 10, "min_difficulty": 1, "max_difficulty": 3}},
+    }, ensure_ascii=False), encoding="utf-8")
+
+    calc_routes.PROGRAM_DIR = program
+    calc_routes.SCRIPT_PATH = script
+    calc_routes.CONFIG_PATH = config
+    calc_routes.config_store = ConfigStore(config)
+    calc_routes.artifacts = ArtifactStore(Path(workdir) / "worksheet_cache", max_bytes=50 * 1024 * 1024)
+
+
+# --- シナリオ ---------------------------------------------------------------
+
+@dataclass
+class Scenario:
+    """1 種類のリクエスト。path / body は乱数を受け取る関数でもよい。"""
+
+    name: str
+    method: str
+    path: object
+    body: object = None
+    weight: float = 1.0
+    ok: tuple = (200,)
+    heavy: bool = False
+    headers: dict = field(default_factory=dict)
+
+    def build(self, rng):
+        path = self.path(rng) if callable(self.path) else self.path
+        body = self.body(rng) if callable(self.body) else self.body
+        return path, (None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+
+def build_scenarios(info):
+    """データセットの件数（dataset.seed の戻り値）に合わせたシナリオ一覧。"""
+    from server.features.english.models import REVIEW_RESULTS
+
+    todos, words, sessions = info["todos"], info["words"], info["sessions"]
+    counter = iter(range(10**9))
+    unique = threading.Lock()
+
+    def next_number():
+        with unique:
+            return next(counter)
+
+    def todo_id(rng):
+        return rng.randint(1, todos)
+
+    def word_id(rng):
+        return rng.randint(1, words)
+
+    # シードした todo のセクションとインデント。シナリオはどの行のセクションもインデントも
+    # 変えないので、実行中もこの配置のまま（作成分は today の末尾に付くだけ）
+    layout = dataset.todo_layout(todos, info.get("seed", 0))
+    by_section = {section: [] for section in dataset.TODO_SECTIONS}
+    # indent 0 の行は誰の子孫にもならないので、移動先の after_id に使っても弾かれない
+    roots = {section: [] for section in dataset.TODO_SECTIONS}
+    for i, (section, indent) in enumerate(layout, start=1):
+        by_section[section].append(i)
+        if indent == 0:
+            roots[section].append(i)
+    sections = [section for section in dataset.TODO_SECTIONS if by_section[section]]
+
+    def move_body(rng):
+        # 同じセクションの中で、ランダムな行をランダムな根の行の直後（1 割は先頭）へ移す
+        section = rng.choice(sections)
+        moved = rng.choice(by_section[section])
+        candidates = [i for i in rng.sample(roots[section], min(len(roots[section]), 2)) if i != moved]
+        after_id = None if not candidates or rng.random() < 0.1 else candidates[0]
+        return {"id": moved, "after_id": after_id, "section": section}
+
+    def reorder_body(rng):
+        # 旧来の一括並び替え: 500 件をそれぞれ元のセクション・インデントのまま並べ直して送る
+        ids = rng.sample(range(1, todos + 1), min(todos, 500))
+        return {"items": [
+            {"id": i, "section": layout[i - 1][0], "display_order": order, "indent_level": layout[i - 1][1]}
+            for order, i in enumerate(ids)
+        ]}
+
+    return [
+        # todo
+        Scenario("todo.list", "GET", "/api/todos", weight=2),
+        Scenario("todo.changes", "GET", lambda rng: f"/api/todos?since={rng.randint(1, todos)}", weight=2),
+        Scenario("todo.create", "POST", "/api/todos",
+                 lambda rng: {"content": f"bench {next_number()}", "section": "today"}, ok=(201,)),
+        Scenario("todo.update", "PUT", lambda rng: f"/api/todos/{todo_id(rng)}",
+                 lambda rng: {"is_completed": rng.random() < 0.5}),
+        Scenario("todo.move", "POST", "/api/todos/move", move_body),
+        Scenario("todo.reorder", "POST", "/api/todos/reorder", reorder_body, weight=0.2, heavy=True),
+        # timer
+        Scenario("timer.status", "GET", "/api/timer/status", weight=3),
+        Scenario("timer.stats", "GET", "/api/timer/stats", weight=2),
+        Scenario("timer.history", "GET", "/api/timer/history?days=30"),
+        Scenario("timer.history_year", "GET", "/api/timer/history?days=365", weight=0.5),
+        Scenario("timer.weekly", "GET", "/api/timer/history/weekly"),
+        Scenario("timer.start", "POST", "/api/timer/start", weight=0.5),
+        Scenario("timer.stop", "POST", "/api/timer/stop", weight=0.5, ok=(200, 400)),
+        Scenario("timer.update_session", "PUT", lambda rng: f"/api/timer/session/{rng.randint(1, sessions)}",
+                 lambda rng: {"duration": rng.randint(60, 3600)}, weight=0.5),
+        # english
+        Scenario("english.page", "GET", "/api/english/list?limit=100", weight=2),
+        Scenario("english.page_filtered", "GET",
+                 lambda rng: f"/api/english/list?limit=100&status=learning&level={rng.randint(1, 8)}&fields=id,word,meaning"),
+        Scenario("english.count", "GET", lambda rng: f"/api/english/list/count?status={rng.choice(('new', 'learning', 'mastered'))}"),
+        Scenario("english.search", "GET",
+                 lambda rng: f"/api/english/search?q={rng.choice(dataset.SYLLABLES)}{rng.choice(dataset.SYLLABLES)}", weight=2),
+        Scenario("english.test", "GET", "/api/english/test?limit=20"),
+        Scenario("english.word", "GET", lambda rng: f"/api/english/word/{word_id(rng)}", weight=2),
+        Scenario("english.review_batch", "POST", "/api/english/review/batch",
+                 lambda rng: {"results": [{"id": word_id(rng), "result": rng.choice(REVIEW_RESULTS)} for _ in range(20)]}),
+        Scenario("english.favorite", "POST", lambda rng: f"/api/english/word/{word_id(rng)}/favorite", weight=0.5),
+        Scenario("english.register", "POST", "/api/english/register",
+                 lambda rng: {"word": f"benchword{next_number()}"}, weight=0.5),
+        Scenario("english.cache_stats", "GET", "/api/english/cache/stats", weight=0.2),
+        Scenario("english.list_all", "GET", "/api/english/list", weight=0.05, heavy=True),
+        # calculator
+        Scenario("calc.config", "GET", "/api/calc-config"),
+        Scenario("calc.run", "POST", "/api/calc-run", {}, weight=0.5, ok=(200, 202)),
+        Scenario("calc.artifacts", "GET", "/api/calc-artifacts?limit=20"),
+        Scenario("calc.latest", "GET", "/api/calc-artifacts/latest"),
+        # common
+        Scenario("common.index", "GET", "/"),
+        Scenario("common.ready", "GET", "/api/ready"),
+        Scenario("common.assets", "GET", "/api/assets", weight=0.2),
+        Scenario("common.metrics", "GET", "/api/metrics", weight=0.2),
+        Scenario("common.db_pool", "GET", "/api/db/pool", weight=0.2),
+    ]
+
+
+# --- 集計 -------------------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    result = {"count": count, "errors": errors}
+    if not count:
+        return result
+    for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        result[f"{name}_ms"] = round(percentile(values, q) * 1000, 3)
+    result["mean_ms"] = round(sum(values) / count * 1000, 3)
+    result["max_ms"] = round(values[-1] * 1000, 3)
+    result["rps"] = round(count / elapsed, 1) if elapsed > 0 else None
+    return result
+
+
+# --- client モード ----------------------------------------------------------
+
+def run_client(db_path, workdir, scenarios, requests, seed, gemini_latency, calc_delay):
+    from server.app import create_app
+
+    install_stubs(workdir, gemini_latency, calc_delay)
+    app = create_app({"DATABASE": str(db_path), "ASSET_CACHE_DIR": str(Path(workdir) / "asset-cache")})
+    client = app.test_client()
+    results = {}
+    for index, scenario in enumerate(scenarios):
+        rng = random.Random(f"{seed}-{index}")
+        count = max(requests // HEAVY_DIVISOR, 3) if scenario.heavy else requests
+        latencies, errors = [], 0
+        for i in range(WARMUP_REQUESTS + count):
+            path, body = scenario.build(rng)
+            headers = {"Accept-Encoding": "gzip, br", **scenario.headers}
+            if body is not None:
+                headers["Content-Type"] = "application/json"
+            start = time.perf_counter()
+            response = client.open(path, method=scenario.method, data=body, headers=headers)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+            if i < WARMUP_REQUESTS:
+                continue
+            latencies.append(elapsed)
+            if response.status_code not in scenario.ok:
+                errors += 1
+        results[scenario.name] = {
+            "method": scenario.method,
+            "path": scenario.path if isinstance(scenario.path, str) else None,
+            **summarize(latencies, errors, sum(latencies)),
+        }
+    return results
+
+
+# --- http モード ------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port, process):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/ready")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _load_worker(port, scenarios, cum_weights, seed, stop_at, records):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    while time.monotonic() < stop_at:
+        scenario = rng.choices(scenarios, cum_weights=cum_weights)[0]
+        path, body = scenario.build(rng)
+        headers = {"Accept-Encoding": "gzip, br", **scenario.headers}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        try:
+            conn.request(scenario.method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            status = None
+        records.append((scenario.name, time.perf_counter() - start, status in scenario.ok))
+    conn.close()
+
+
+def run_http(db_path, workdir, scenarios, duration, concurrency, server_threads, seed, gemini_latency, calc_delay):
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.load_test", "serve",
+        "--db", str(db_path), "--workdir", str(workdir), "--port", str(port),
+        "--threads", str(server_threads),
+        "--gemini-latency-ms", str(gemini_latency * 1000), "--calc-delay-ms", str(calc_delay * 1000),
+    ]
+    process = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, process)
+        cum_weights, total = [], 0.0
+        for scenario in scenarios:
+            total += scenario.weight
+            cum_weights.append(total)
+        # 各スレッドの記録は別のリストにして、最後にまとめる
+        records = [[] for _ in range(concurrency)]
+        stop_at = time.monotonic() + duration
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=_load_worker, args=(port, scenarios, cum_weights, f"{seed}-{i}", stop_at, records[i]))
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    by_name = defaultdict(lambda: ([], [0]))
+    everything, total_errors = [], 0
+    for thread_records in records:
+        for name, latency, ok in thread_records:
+            latencies, errors = by_name[name]
+            latencies.append(latency)
+            everything.append(latency)
+            if not ok:
+                errors[0] += 1
+                total_errors += 1
+    results = {
+        scenario.name: {
+            "method": scenario.method,
+            "path": scenario.path if isinstance(scenario.path, str) else None,
+            **summarize(by_name[scenario.name][0], by_name[scenario.name][1][0], elapsed),
+        }
+        for scenario in scenarios if scenario.name in by_name
+    }
+    results["_total"] = summarize(everything, total_errors, elapsed)
+    return results
+
+
+def serve(args):
+    """スタブを入れたアプリを起動する（run の http モードから子プロセスとして呼ばれる）。"""
+    from server.app import create_app
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench-serve-"))
+    install_stubs(workdir, args.gemini_latency_ms / 1000, args.calc_delay_ms / 1000)
+    app = create_app({"DATABASE": str(args.db), "ASSET_CACHE_DIR": str(workdir / "asset-cache")})
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+    if waitress is not None:
+        # 負荷をかけている間の "Task queue depth" の警告は出さない
+        logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+        waitress.serve(app, host="127.0.0.1", port=args.port, threads=args.threads, _quiet=True)
+    else:
+        from werkzeug.serving import make_server
+
+        make_server("127.0.0.1", args.port, app, threaded=True).serve_forever()
+
+
+# --- 実行と比較 -------------------------------------------------------------
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    from server import serialization
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def prepare_dataset(args, tmp):
+    """合成データの DB を返す。--dataset-cache があれば同じ件数・種・日付の DB を使い回す。"""
+    sizes = {name: getattr(args, name) for name in dataset.DEFAULT_SIZES}
+    key = "-".join(f"{name}{value}" for name, value in sizes.items())
+    name = f"bench-{key}-y{args.years}-s{args.seed}-{date.today():%Y%m%d}.db"
+    cache_dir = Path(args.dataset_cache) if args.dataset_cache else Path(tmp)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / name
+    info_path = path.with_suffix(".json")
+    if path.exists() and info_path.exists():
+        return path, json.loads(info_path.read_text(encoding="utf-8"))
+    start = time.perf_counter()
+    info = dataset.build(path, sizes, years=args.years, seed_value=args.seed, asset_cache_dir=str(Path(tmp) / "asset-cache"))
+    info["seed_seconds"] = round(time.perf_counter() - start, 1)
+    info_path.write_text(json.dumps(info), encoding="utf-8")
+    return path, info
+
+
+def run(args):
+    modes = [mode.strip() for mode in args.mode.split(",") if mode.strip()]
+    unknown = set(modes) - {"client", "http"}
+    if unknown:
+        raise SystemExit(f"unknown mode: {', '.join(sorted(unknown))}")
+    gemini_latency = args.gemini_latency_ms / 1000
+    calc_delay = args.calc_delay_ms / 1000
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        source, info = prepare_dataset(args, tmp)
+        scenarios = build_scenarios(info)
+        if args.only:
+            scenarios = [s for s in scenarios if any(s.name.startswith(prefix) for prefix in args.only.split(","))]
+        report = {
+            "environment": environment(),
+            "dataset": info,
+            "settings": {
+                "requests": args.requests, "duration": args.duration, "concurrency": args.concurrency,
+                "server_threads": args.server_threads, "seed": args.seed,
+                "gemini_latency_ms": args.gemini_latency_ms, "calc_delay_ms": args.calc_delay_ms,
+            },
+        }
+        for mode in modes:
+            # モードごとに元の DB をコピーして、前のモードの書き込みの影響を受けないようにする
+            workdir = Path(tmp) / mode
+            workdir.mkdir()
+            db_path = workdir / "bench.db"
+            shutil.copyfile(source, db_path)
+            print(f"running {mode} ...", file=sys.stderr)
+            if mode == "client":
+                report["client"] = run_client(db_path, workdir, scenarios, args.requests, args.seed,
+                                              gemini_latency, calc_delay)
+            else:
+                report["http"] = run_http(db_path, workdir, scenarios, args.duration, args.concurrency,
+                                          args.server_threads, args.seed, gemini_latency, calc_delay)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+def compare(args):
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    threshold = args.max_regression
+    rows, regressions = [], []
+    for mode in ("client", "http"):
+        for name, old in base.get(mode, {}).items():
+            current = new.get(mode, {}).get(name)
+            if not current or "p95_ms" not in old or "p95_ms" not in current:
+                continue
+            row = {
+                "mode": mode,
+                "endpoint": name,
+                "p95_ms": [old["p95_ms"], current["p95_ms"]],
+                "p95_change": round(current["p95_ms"] / old["p95_ms"] - 1, 3) if old["p95_ms"] else None,
+                "rps": [old.get("rps"), current.get("rps")],
+                "errors": [old.get("errors", 0), current.get("errors", 0)],
+            }
+            reasons = []
+            if (current["p95_ms"] > old["p95_ms"] * (1 + threshold)
+                    and current["p95_ms"] - old["p95_ms"] >= args.min_delta_ms):
+                reasons.append("p95")
+            # client モードの rps は 1 件あたりの時間の逆数なので p95 と別には見ない
+            if mode == "http" and old.get("rps") and current.get("rps") and current["rps"] < old["rps"] * (1 - threshold):
+                reasons.append("throughput")
+            if current.get("errors", 0) > old.get("errors", 0):
+                reasons.append("errors")
+            row["regressed"] = reasons
+            rows.append(row)
+            if reasons:
+                regressions.append(f"{mode}:{name}")
+    print(json.dumps({
+        "base": base.get("environment", {}).get("commit"),
+        "new": new.get("environment", {}).get("commit"),
+        "max_regression": threshold,
+        "regressions": regressions,
+        "endpoints": rows,
+    }, ensure_ascii=False, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="データを作って測る")
+    run_parser.add_argument("--mode", default="client,http", help="client / http（カンマ区切り）")
+    run_parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="client モードでのシナリオごとの件数")
+    run_parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="http モードの秒数")
+    run_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    run_parser.add_argument("--server-threads", type=int, default=DEFAULT_SERVER_THREADS)
+    run_parser.add_argument("--only", default="", help="シナリオ名の接頭辞で絞る（例: todo,timer.history）")
+    run_parser.add_argument("--output", help="結果の JSON を書き出すファイル")
+    run_parser.add_argument("--dataset-cache", help="合成データの DB を置いて使い回すディレクトリ")
+    for name, default in dataset.DEFAULT_SIZES.items():
+        run_parser.add_argument(f"--{name}", type=int, default=default)
+    run_parser.add_argument("--years", type=int, default=dataset.DEFAULT_YEARS)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    run_parser.add_argument("--calc-delay-ms", type=float, default=0.0)
+
+    compare_parser = commands.add_parser("compare", help="2 つの結果を比べる")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+
+    serve_parser = commands.add_parser("serve", help="スタブ入りのサーバーだけを起動する")
+    serve_parser.add_argument("--db", required=True)
+    serve_parser.add_argument("--workdir")
+    serve_parser.add_argument("--port", type=int, default=5055)
+    serve_parser.add_argument("--threads", type=int, default=DEFAULT_SERVER_THREADS)
+    serve_parser.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    serve_parser.add_argument("--calc-delay-ms", type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+    {"run": run, "compare": compare, "serve": serve}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
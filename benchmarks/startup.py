@@ -0,0 +1,123 @@
+"""create_app() の起動時間と import の内訳、および予算との比較。
+
+    python -m benchmarks.startup [--runs 5] [--budget-ms 1000] [--cold-budget-ms 5000] [--top 15] [--disable english,...]
+
+新しいインタプリタで `python -X importtime` を使って create_app() を実行し、
+
+- create_app() までの import と create_app() 自体の壁時計時間（runs 回の中央値）
+- 空の DB から起動する 1 回目（移行・静的ファイルの圧縮キャッシュ作成を含む）の時間
+- 累積時間の大きい import の上位
+- 起動時に読み込まれてはいけない重い依存（HEAVY_MODULES）と、--disable で無効にした
+  機能のパッケージが、1 回目も含めて読み込まれていないか
+
+を出す。DB と静的ファイルの圧縮キャッシュは一時ディレクトリに作る。
+中央値が --budget-ms を、1 回目が --cold-budget-ms を超えるか、読み込まれては
+いけないモジュールが読み込まれていれば終了コード 1（CI や手元での回帰チェック用）。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+DEFAULT_BUDGET_MS = 1000
+# 移行と静的ファイルの圧縮を含む 1 回目
+DEFAULT_COLD_BUDGET_MS = 5000
+# 最初に使う時まで読み込まないはずのモジュール
+HEAVY_MODULES = ("google.generativeai", "numpy", "gunicorn", "waitress")
+
+PROBE = """\
+import json, sys, time
+start = time.perf_counter()
+from server.app import create_app
+imported = time.perf_counter()
+create_app({"DATABASE": sys.argv[1]})
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (done - imported) * 1000,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def run_probe(tmp, disabled):
+    env = dict(
+        os.environ,
+        DISABLED_FEATURES=disabled,
+        ASSET_CACHE_DIR=str(Path(tmp) / "asset-cache"),
+        PYTHONPATH=str(BASE_DIR),
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, str(Path(tmp) / "startup.db")],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return json.loads(result.stdout.strip().splitlines()[-1]), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--cold-budget-ms", type=float,
+                        default=float(os.environ.get("STARTUP_COLD_BUDGET_MS", DEFAULT_COLD_BUDGET_MS)),
+                        help="空の DB から起動する 1 回目の予算")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--disable", default="", help="DISABLED_FEATURES に渡す機能名（カンマ区切り）")
+    args = parser.parse_args()
+
+    disabled = [name.strip() for name in args.disable.split(",") if name.strip()]
+    # 読み込まれてはいけないモジュール。無効にした機能は移行（初回）でも import しない
+    forbidden = [*HEAVY_MODULES, *(f"server.features.{name}" for name in disabled)]
+    totals, imports, apps = [], [], []
+    loaded = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1 回目は空の DB への移行と静的ファイルの圧縮キャッシュ作成を含むコールドスタート。
+        # 時間は中央値に入れず別に予算と比べ、読み込まれたモジュールは毎回確認する
+        cold, _ = run_probe(tmp, args.disable)
+        cold_ms = cold["import_ms"] + cold["create_app_ms"]
+        loaded.update(name for name in forbidden if name in cold["modules"])
+        for _ in range(args.runs):
+            probe, timings = run_probe(tmp, args.disable)
+            imports.append(probe["import_ms"])
+            apps.append(probe["create_app_ms"])
+            totals.append(probe["import_ms"] + probe["create_app_ms"])
+            loaded.update(name for name in forbidden if name in probe["modules"])
+
+    heavy = sorted(loaded)
+    total_ms = statistics.median(totals)
+    top = sorted(
+        ((name, us) for name, us in timings.items() if "." not in name),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:args.top]
+    report = {
+        "disabled_features": args.disable,
+        "import_ms": round(statistics.median(imports), 1),
+        "create_app_ms": round(statistics.median(apps), 1),
+        "total_ms": round(total_ms, 1),
+        "budget_ms": args.budget_ms,
+        "cold_total_ms": round(cold_ms, 1),
+        "cold_budget_ms": args.cold_budget_ms,
+        "forbidden_modules_loaded": heavy,
+        "top_imports_ms": {name: round(us / 1000, 1) for name, us in top},
+        "ok": total_ms <= args.budget_ms and cold_ms <= args.cold_budget_ms and not heavy,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
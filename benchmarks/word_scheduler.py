@@ -0,0 +1,83 @@
+"""全単語の再スケジュール（scheduler.reschedule）の所要時間。
+
+    python -m benchmarks.word_scheduler [--words 100000] [--reviews 1000000] [--scheduler ladder sm2 fsrs]
+
+一時ディレクトリに移行済みの DB を作り、合成した単語と回答ログを入れてから、
+各スケジューラで読み込み・再生・書き戻しの時間を測る。
+"""
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from server.extensions import CONNECTION_PRAGMAS
+from server.features.english import scheduler
+from server.migrations import migrate
+
+RESULTS = np.array(["ng", "ambiguous", "ok"])
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def populate(conn, words, reviews, seed=0):
+    rng = np.random.default_rng(seed)
+    with conn:
+        conn.executemany(
+            "INSERT INTO words (id, word, meaning, status, level, next_review_date) VALUES (?, ?, '-', 'new', 0, '2025-01-01')",
+            ((i, f"word{i}") for i in range(1, words + 1)),
+        )
+
+    # 回答は 1 年分に散らす。語ごとの回答数は対数正規で偏らせる（よく間違える語ほど多い）
+    weights = rng.lognormal(sigma=0.8, size=words)
+    word_ids = rng.choice(words, size=reviews, p=weights / weights.sum()) + 1
+    seconds = rng.integers(0, 365 * 86400, size=reviews) + int(np.datetime64("2025-01-01T00:00:00", "s").astype(np.int64))
+    results = RESULTS[rng.choice(3, size=reviews, p=[0.15, 0.2, 0.65])]
+    reviewed_at = np.datetime_as_string(seconds.astype("datetime64[s]")).astype(object)
+    rows = zip(word_ids.tolist(), results.tolist(), (t.replace("T", " ") for t in reviewed_at))
+    with conn:
+        conn.executemany(
+            "INSERT INTO word_reviews (word_id, result, prev_level, new_level, next_review_date, reviewed_at) "
+            "VALUES (?, ?, 0, 0, '2025-01-01', ?)",
+            rows,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--scheduler", nargs="+", default=list(scheduler.SCHEDULERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(Path(tmp) / "bench.db")
+        migrate(conn)
+        start = time.perf_counter()
+        populate(conn, args.words, args.reviews)
+        report = {
+            "words": args.words,
+            "reviews": args.reviews,
+            "populate_seconds": round(time.perf_counter() - start, 2),
+            "runs": [],
+        }
+        for name in args.scheduler:
+            start = time.perf_counter()
+            result = scheduler.reschedule(conn, scheduler.get_scheduler(name))
+            result["total_seconds"] = round(time.perf_counter() - start, 3)
+            report["runs"].append(result)
+        conn.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,12 @@ const TEMPLATE = `
           </label>
         </section>
 
+        <section>
+          <label class="form-field">
+            <span><input type="checkbox" name="force_rebuild" /> 同じ設定でも作り直す</span>
+          </label>
+        </section>
+
         <section>
           <div class="section-header">
             <h4>カテゴリ別設定</h4>
@@ -255,30 +261,63 @@ let loadCachedConfig = {
   output: { directory: "calculation_practice_program/output" },
 };
 
+// 読み込んだ時点の ETag。保存時に If-Match で送り、他で更新されていたら 412 になる
+let loadedConfigEtag = null;
+
 const fetchConfig = async () => {
   const res = await fetch(`${API_BASE}/api/calc-config`);
   if (!res.ok) throw new Error("設定の取得に失敗しました");
+  loadedConfigEtag = res.headers.get("ETag");
   return res.json();
 };
 
 const saveConfig = async (data) => {
+  const headers = { "Content-Type": "application/json" };
+  if (loadedConfigEtag) headers["If-Match"] = loadedConfigEtag;
   const res = await fetch(`${API_BASE}/api/calc-config`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers,
     body: JSON.stringify(data),
   });
-  if (!res.ok) {
+  if (res.status === 412) {
+    throw new Error("設定が他で更新されています。開き直してから保存してください");
+  }
+  if (res.ok) {
+    loadedConfigEtag = res.headers.get("ETag");
+  } else {
     const err = await res.json().catch(() => ({}));
     throw new Error(err.error || "設定の保存に失敗しました");
   }
 };
 
-const runGeneration = async () => {
-  const res = await fetch(`${API_BASE}/api/calc-run`, { method: "POST" });
-  const body = await res.json().catch(() => ({}));
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// 生成はジョブとして受け付けられるので、完了するまで状態を問い合わせる
+const runGeneration = async (force = false) => {
+  const res = await fetch(`${API_BASE}/api/calc-run`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ force }),
+  });
+  let body = await res.json().catch(() => ({}));
   if (!res.ok || body.error) {
     throw new Error(body.error || "生成に失敗しました");
   }
+
+  let delay = 500;
+  while (body.state === "queued" || body.state === "running") {
+    await sleep(delay);
+    delay = Math.min(delay * 1.5, 3000);
+    const poll = await fetch(`${API_BASE}/api/calc-run/${body.id}`);
+    body = await poll.json().catch(() => ({}));
+    if (!poll.ok) {
+      throw new Error(body.error || "生成状況の取得に失敗しました");
+    }
+  }
+
+  if (body.state !== "completed") {
+    throw new Error(body.error || "生成に失敗しました");
+  }
   return body;
 };
 
@@ -344,7 +383,8 @@ const ensureModal = () => {
           return;
         }
         setStatus(backdrop, "生成中です...(数十秒かかる場合があります)");
-        const result = await runGeneration();
+        const form = backdrop.querySelector("[data-config-form]");
+        const result = await runGeneration(Boolean(form?.force_rebuild?.checked));
         setStatus(backdrop, "生成が完了しました", "success");
         renderOutputLinks(backdrop, result);
       } catch (error) {
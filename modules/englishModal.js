@@ -67,6 +67,9 @@ export const openEnglishModal = (initialTab = "register") => {
 const renderTab = (tabName) => {
   const container = document.getElementById("english-modal-body");
 
+  // テストの途中で別のタブへ移った場合も、それまでの回答を送っておく
+  flushReviews();
+
   container.innerHTML = '<div class="loading">Loading...</div>';
 
   if (tabName === "register") {
@@ -169,20 +172,11 @@ const renderRegister = (container) => {
 };
 
 // --- List Tab ---
-const renderList = async (container) => {
-  try {
-    const res = await fetch(`${API_BASE}/list?t=${Date.now()}`);
-    const words = await res.json();
+// 一覧カードに必要な列だけ取る（例文・発音は詳細画面で取り直す）
+const LIST_FIELDS = "word,meaning,status,memo,is_favorite";
+const LIST_PAGE_SIZE = 100;
 
-    if (words.length === 0) {
-      container.innerHTML =
-        '<p class="muted" style="text-align: center; padding: 40px;">No words registered yet.</p>';
-      return;
-    }
-
-    const html = words
-      .map(
-        (word) => `
+const renderWordCard = (word) => `
       <div class="word-card" onclick="openWordDetail(${word.id})">
         <div class="favorite-star ${
           word.is_favorite ? "is-active" : ""
@@ -204,14 +198,111 @@ const renderList = async (container) => {
           <span>${new Date(word.created_at).toLocaleDateString()}</span>
         </div>
       </div>
-    `
-      )
-      .join("");
+    `;
+
+const fetchWordPage = async (cursor) => {
+  const params = new URLSearchParams({
+    limit: LIST_PAGE_SIZE,
+    fields: LIST_FIELDS,
+  });
+  if (cursor) params.set("cursor", cursor);
+  const res = await fetch(`${API_BASE}/list?${params}`);
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  return res.json();
+};
+
+// 検索結果は一致箇所を <mark> で囲んだ word / meaning を表示する
+const fetchSearchPage = async (query, offset) => {
+  const params = new URLSearchParams({ q: query, limit: 50, offset });
+  const res = await fetch(`${API_BASE}/search?${params}`);
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  const page = await res.json();
+  page.items = page.items.map((item) => ({
+    ...item,
+    word: item.highlights.word || item.word,
+    meaning: item.highlights.meaning || item.meaning,
+    memo: item.highlights.memo || "",
+  }));
+  return page;
+};
 
-    container.innerHTML = `<div class="word-grid">${html}</div>`;
+const renderList = async (container) => {
+  try {
+    const page = await fetchWordPage(null);
+
+    if (page.items.length === 0) {
+      container.innerHTML =
+        '<p class="muted" style="text-align: center; padding: 40px;">No words registered yet.</p>';
+      return;
+    }
 
-    // Store words for detail view
-    window.currentWords = words;
+    container.innerHTML = `
+      <div class="form-field" style="margin-bottom: 16px;">
+        <input type="search" id="word-search" placeholder="Search words, meanings, examples, memos...">
+      </div>
+      <div class="word-grid">${page.items.map(renderWordCard).join("")}</div>
+      <div style="text-align: center; margin-top: 16px;">
+        <button class="secondary-button" id="btn-load-more">Load more</button>
+      </div>
+    `;
+
+    // Store words for favorite toggling
+    window.currentWords = page.items;
+
+    const grid = container.querySelector(".word-grid");
+    const loadMore = container.querySelector("#btn-load-more");
+    // 一覧は cursor、検索は offset で続きを読む
+    let cursor = page.next_cursor;
+    let query = "";
+    let offset = null;
+
+    const fetchMore = () =>
+      query ? fetchSearchPage(query, offset) : fetchWordPage(cursor);
+    const applyPage = (next) => {
+      if (query) {
+        offset = next.next_offset;
+        loadMore.style.display = offset !== null ? "" : "none";
+      } else {
+        cursor = next.next_cursor;
+        loadMore.style.display = cursor ? "" : "none";
+      }
+    };
+
+    let searchTimer = null;
+    container.querySelector("#word-search").addEventListener("input", (e) => {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(async () => {
+        query = e.target.value.trim();
+        offset = 0;
+        cursor = null;
+        try {
+          const next = await fetchMore();
+          grid.innerHTML = next.items.map(renderWordCard).join("");
+          window.currentWords = next.items;
+          applyPage(next);
+        } catch (err) {
+          console.error("Failed to search words", err);
+        }
+      }, 250);
+    });
+
+    loadMore.style.display = cursor ? "" : "none";
+    loadMore.addEventListener("click", async () => {
+      loadMore.disabled = true;
+      try {
+        const next = await fetchMore();
+        grid.insertAdjacentHTML(
+          "beforeend",
+          next.items.map(renderWordCard).join("")
+        );
+        window.currentWords = window.currentWords.concat(next.items);
+        applyPage(next);
+      } catch (e) {
+        console.error("Failed to load more words", e);
+      } finally {
+        loadMore.disabled = false;
+      }
+    });
   } catch (e) {
     container.innerHTML = `<div class="modal-status" data-state="error">Error: ${e.message}</div>`;
   }
@@ -236,11 +327,18 @@ window.toggleFavorite = async (id) => {
 };
 
 // --- Detail View ---
-window.openWordDetail = (wordId) => {
-  const word = window.currentWords.find((w) => w.id === wordId);
-  if (!word) return;
-
+window.openWordDetail = async (wordId) => {
   const container = document.getElementById("english-modal-body");
+  container.innerHTML = '<div class="loading">Loading...</div>';
+
+  // 一覧は列を絞っているので、例文や発音を含む全項目をここで取る
+  const res = await fetch(`${API_BASE}/word/${wordId}`);
+  if (!res.ok) {
+    container.innerHTML = `<div class="modal-status" data-state="error">Error: HTTP ${res.status}</div>`;
+    return;
+  }
+  const word = await res.json();
+  window.currentWord = word;
 
   container.innerHTML = `
     <div class="word-detail" style="position: relative;">
@@ -314,9 +412,9 @@ window.openWordDetail = (wordId) => {
 
 window.saveWord = async (id) => {
   const data = {
-    word: window.currentWords.find((w) => w.id === id).word,
+    word: window.currentWord.word,
     meaning: document.getElementById("edit-meaning").value,
-    pronunciation: window.currentWords.find((w) => w.id === id).pronunciation,
+    pronunciation: window.currentWord.pronunciation,
     example_en: document.getElementById("edit-example-en").value,
     example_jp: document.getElementById("edit-example-jp").value,
     memo: document.getElementById("edit-memo").value,
@@ -363,6 +461,38 @@ const getStatusColor = (status) => {
 };
 
 // --- Test Tab ---
+// 回答は 1 件ずつ送らずに溜めて、REVIEW_FLUSH_SIZE 件ごとと最後にまとめて送る
+const REVIEW_FLUSH_SIZE = 5;
+let pendingReviews = [];
+let reviewSessionId = null;
+let reviewFlush = Promise.resolve();
+
+const flushReviews = () => {
+  if (pendingReviews.length === 0) return reviewFlush;
+  const results = pendingReviews;
+  pendingReviews = [];
+  const body = JSON.stringify({ session_id: reviewSessionId, results });
+  reviewFlush = reviewFlush.then(() =>
+    fetch(`${API_BASE}/review/batch`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body,
+    }).catch((e) => console.error("Failed to submit reviews", e))
+  );
+  return reviewFlush;
+};
+
+// テスト途中でページを閉じても回答を失わないよう、残りは sendBeacon で送る
+window.addEventListener("pagehide", () => {
+  if (pendingReviews.length === 0) return;
+  const body = JSON.stringify({ session_id: reviewSessionId, results: pendingReviews });
+  pendingReviews = [];
+  navigator.sendBeacon(
+    `${API_BASE}/review/batch`,
+    new Blob([body], { type: "application/json" })
+  );
+});
+
 const renderTest = async (container) => {
   try {
     const res = await fetch(`${API_BASE}/test?limit=10`);
@@ -380,9 +510,11 @@ const renderTest = async (container) => {
     }
 
     let currentIndex = 0;
+    reviewSessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
 
-    const showCard = (index) => {
+    const showCard = async (index) => {
       if (index >= words.length) {
+        await flushReviews();
         renderTest(container); // Reload to show "All caught up"
         return;
       }
@@ -434,11 +566,9 @@ const renderTest = async (container) => {
       });
     };
 
-    window.submitReview = async (id, result) => {
-      await fetch(`${API_BASE}/review`, {
-        method: "POST",
-        body: JSON.stringify({ id, result }),
-      });
+    window.submitReview = (id, result) => {
+      pendingReviews.push({ id, result });
+      if (pendingReviews.length >= REVIEW_FLUSH_SIZE) flushReviews();
       currentIndex++;
       showCard(currentIndex);
     };
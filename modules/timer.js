@@ -1,8 +1,9 @@
 const API_BASE = "/api/timer";
+import { subscribeTimerState } from "./timerEvents.js";
 
 export const initTimer = () => {
   renderTimerUI();
-  checkStatus();
+  subscribeTimerState(applyState);
 
   setInterval(updateTimerDisplay, 1000);
 };
@@ -52,34 +53,29 @@ const renderTimerUI = () => {
   updateControls();
 };
 
-const checkStatus = async () => {
-  try {
-    const res = await fetch(`${API_BASE}/status`);
-    const data = await res.json();
-    
-    if (data) {
-      timerState.status = data.status;
-      timerState.startTime = data.start_time ? new Date(data.start_time) : null;
-      timerState.duration = data.current_duration;
-    } else {
-      timerState.status = 'stopped';
-      timerState.startTime = null;
-      timerState.duration = 0;
-    }
-    updateControls();
-    updateTimerDisplay();
-  } catch (e) {
-    console.error("Failed to check timer status", e);
+// SSE で届いたスナップショットを反映する。current_duration は受信時点までの経過を含む
+const applyState = (state) => {
+  const data = state.session;
+  
+  if (data) {
+    timerState.status = data.status;
+    timerState.startTime = data.status === 'running' ? new Date(state.receivedAt) : null;
+    timerState.duration = data.current_duration;
+  } else {
+    timerState.status = 'stopped';
+    timerState.startTime = null;
+    timerState.duration = 0;
   }
+  updateControls();
+  updateTimerDisplay();
 };
 
 const startTimer = async () => {
   try {
-    const res = await fetch(`${API_BASE}/start`, { method: 'POST' });
-    const data = await res.json();
+    await fetch(`${API_BASE}/start`, { method: 'POST' });
     timerState.status = 'running';
     timerState.startTime = new Date();
-    checkStatus();
+    updateControls();
   } catch (e) {
     console.error("Start failed", e);
   }
@@ -1,11 +1,16 @@
-const API_BASE = "/api/timer";
 import { openTimerModal } from "./timerModal.js";
+import { subscribeTimerState } from "./timerEvents.js";
+
+let latestState = null;
 
 export const initTimerCard = () => {
   renderCard();
-  updateStats();
+  subscribeTimerState((state) => {
+    latestState = state;
+    updateStats();
+  });
 
-  document.addEventListener('timerStopped', updateStats);
+  // 計測中の経過分はサーバーに問い合わせずローカルで加算して表示を進める
   setInterval(updateStats, 60000);
 };
 
@@ -56,10 +61,15 @@ const renderCard = () => {
   document.getElementById('btn-timer-details').addEventListener('click', openTimerModal);
 };
 
-const updateStats = async () => {
+const updateStats = () => {
+  if (!latestState) return;
   try {
-    const res = await fetch(`${API_BASE}/stats`);
-    const data = await res.json();
+    const running = latestState.session && latestState.session.status === 'running';
+    const extra = running ? Math.floor((Date.now() - latestState.receivedAt) / 1000) : 0;
+    const data = {
+      today: latestState.stats.today + extra,
+      weekly: latestState.stats.weekly + extra
+    };
     
     document.getElementById('stat-today').textContent = formatDuration(data.today);
     document.getElementById('stat-weekly').textContent = formatDuration(data.weekly);
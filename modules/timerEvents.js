@@ -0,0 +1,53 @@
+const API_BASE = "/api/timer";
+const EVENTS_URL = `${API_BASE}/events`;
+// SSE は同じワーカーで起きた遷移しか届かないので、複数ワーカー構成向けに低頻度でも取り直す
+const POLL_INTERVAL_MS = 60000;
+// サーバーが同時ストリーム数の上限で断った（503）時に繋ぎ直すまでの間隔
+const RECONNECT_DELAY_MS = 60000;
+
+// タブ内で 1 本の EventSource を共有し、状態スナップショットを各リスナーへ配る
+let source = null;
+let pollTimer = null;
+let lastState = null;
+const listeners = new Set();
+
+const publish = (state) => {
+  lastState = { ...state, receivedAt: Date.now() };
+  listeners.forEach(fn => fn(lastState));
+};
+
+const poll = async () => {
+  try {
+    const [session, stats] = await Promise.all([
+      fetch(`${API_BASE}/status`).then(res => res.json()),
+      fetch(`${API_BASE}/stats`).then(res => res.json())
+    ]);
+    publish({ session, stats });
+  } catch (e) {
+    console.error("Failed to poll timer state", e);
+  }
+};
+
+const connect = () => {
+  // サーバーが寿命で閉じたストリームは EventSource が retry 後に自動で繋ぎ直す
+  source = new EventSource(EVENTS_URL);
+  source.addEventListener("state", (e) => publish(JSON.parse(e.data)));
+  source.addEventListener("error", () => {
+    // 200 以外（上限超過の 503 など）では EventSource は諦めて閉じる。しばらくポーリングだけで待つ
+    if (source.readyState !== EventSource.CLOSED) return;
+    setTimeout(connect, RECONNECT_DELAY_MS);
+    poll();
+  });
+};
+
+export const subscribeTimerState = (listener) => {
+  listeners.add(listener);
+  if (lastState) listener(lastState);
+
+  if (!source) connect();
+  if (!pollTimer) {
+    pollTimer = setInterval(poll, POLL_INTERVAL_MS);
+  }
+
+  return () => listeners.delete(listener);
+};
@@ -7,11 +7,31 @@ export const initTodo = () => {
 };
 
 let currentTodos = [];
+let todoIndex = new Map();
+let syncVersion = null;
+
+// 初回は全件、以降は前回の版番号以降の差分（変更行と削除 id）だけを取得する
+const fetchTodos = async () => {
+  if (syncVersion === null) {
+    const res = await fetch(API_BASE);
+    const todos = await res.json();
+    todoIndex = new Map(todos.map(t => [t.id, t]));
+    const version = parseInt(res.headers.get("X-Todos-Version"), 10);
+    syncVersion = Number.isNaN(version) ? null : version;
+  } else {
+    const res = await fetch(`${API_BASE}?since=${syncVersion}`);
+    const delta = await res.json();
+    if (delta.full) todoIndex = new Map();
+    delta.todos.forEach(t => todoIndex.set(t.id, t));
+    delta.deleted.forEach(id => todoIndex.delete(id));
+    syncVersion = delta.version;
+  }
+  currentTodos = Array.from(todoIndex.values());
+};
 
 const renderTodos = async () => {
   try {
-    const res = await fetch(API_BASE);
-    currentTodos = await res.json();
+    await fetchTodos();
     
     const todayList = document.getElementById("todo-list-today");
     const futureList = document.getElementById("todo-list-future");
@@ -33,7 +53,8 @@ const renderTodos = async () => {
 };
 
 const buildTree = (items) => {
-  items.sort((a, b) => a.display_order - b.display_order);
+  // sort_key はバイト順で比較する（localeCompare は使わない）
+  items.sort((a, b) => (a.sort_key < b.sort_key ? -1 : a.sort_key > b.sort_key ? 1 : a.id - b.id));
   
   const root = [];
   const stack = [{ level: -1, children: root }];
@@ -151,7 +172,7 @@ const handleKeydown = async (e, id, liElement) => {
     const newInput = newLi.querySelector('.todo-text');
     if (newInput) newInput.focus();
     
-    await saveOrder();
+    await saveMove(newLi);
     
   } else if (e.key === "Tab") {
     e.preventDefault();
@@ -161,7 +182,7 @@ const handleKeydown = async (e, id, liElement) => {
       const parentLi = parentUl.parentElement;
       if (parentLi && parentLi.tagName === "LI") {
         parentLi.after(liElement);
-        await saveOrder();
+        await saveMove(liElement);
         liElement.querySelector('.todo-text').focus();
       }
     } else {
@@ -175,7 +196,7 @@ const handleKeydown = async (e, id, liElement) => {
           initNestedSortable(subUl);
         }
         subUl.appendChild(liElement);
-        await saveOrder();
+        await saveMove(liElement);
         liElement.querySelector('.todo-text').focus();
       }
     }
@@ -193,7 +214,7 @@ const initNestedSortable = (el) => {
     swapThreshold: 0.65,
     ghostClass: "sortable-ghost",
     onEnd: async (evt) => {
-      await saveOrder();
+      await saveMove(evt.item);
     }
   });
   
@@ -201,45 +222,37 @@ const initNestedSortable = (el) => {
   subs.forEach(sub => initNestedSortable(sub));
 };
 
-const saveOrder = async () => {
-  const items = [];
-  
-  const traverse = (ul, section, level) => {
-    const lis = Array.from(ul.children).filter(child => child.tagName === "LI");
-    lis.forEach((li, index) => {
-      const id = li.dataset.id;
-      if (id) {
-        items.push({
-          id: parseInt(id),
-          section: section,
-          display_order: items.length,
-          indent_level: level
-        });
-        
-        const subUl = li.querySelector("ul");
-        if (subUl) {
-          traverse(subUl, section, level + 1);
-        }
-      }
-    });
-  };
+// 移動した 1 件（子孫ごと）だけをサーバーへ送る
+const saveMove = async (li) => {
+  const id = li.dataset.id;
+  const root = li.closest(".todo-tree-root");
+  if (!id || !root) return;
   
-  const todayRoot = document.querySelector("#todo-list-today .todo-tree-root");
-  const futureRoot = document.querySelector("#todo-list-future .todo-tree-root");
+  // 平坦化した並びで直前に来る行と、ネストの深さを DOM から求める
+  const flat = Array.from(root.querySelectorAll("li")).filter(el => el.dataset.id);
+  const index = flat.indexOf(li);
+  const prev = index > 0 ? flat[index - 1] : null;
   
-  if (todayRoot) traverse(todayRoot, "today", 0);
-  if (futureRoot) traverse(futureRoot, "future", 0);
+  let level = 0;
+  let parent = li.parentElement;
+  while (parent && parent !== root) {
+    if (parent.tagName === "UL") level++;
+    parent = parent.parentElement;
+  }
   
-  if (items.length > 0) {
-    try {
-      await fetch(`${API_BASE}/reorder`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ items })
-      });
-    } catch (e) {
-      console.error("Failed to save order", e);
-    }
+  try {
+    await fetch(`${API_BASE}/move`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        id: parseInt(id),
+        after_id: prev ? parseInt(prev.dataset.id) : null,
+        section: root.dataset.section,
+        indent_level: level
+      })
+    });
+  } catch (e) {
+    console.error("Failed to save order", e);
   }
 };
 
@@ -0,0 +1,30 @@
+"""python -m server <command>
+
+    serve  本番用 WSGI サーバーで起動する（詳しくは server/serve.py）
+    dev    Flask の開発サーバー（デバッグ・自動リロード）で起動する
+"""
+import argparse
+
+from . import serve
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m server", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve.add_arguments(commands.add_parser("serve", help="本番用 WSGI サーバーで起動する"))
+    dev = commands.add_parser("dev", help="開発サーバーで起動する")
+    dev.add_argument("--host", default="127.0.0.1")
+    dev.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve.serve(args)
+    else:
+        from .app import create_app
+
+        create_app().run(host=args.host, port=args.port, debug=True)
+
+
+if __name__ == "__main__":
+    main()
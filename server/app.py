@@ -1,7 +1,9 @@
+import importlib
+import os
 from flask import Flask
 from pathlib import Path
 from dotenv import load_dotenv
-from . import extensions
+from . import assets, compression, extensions, metrics, migrations, profiling, serialization
 
 # Load environment variables from .env file
 load_dotenv()
@@ -9,35 +11,53 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parents[1]
 FRONTEND_DIR = BASE_DIR
 
-def create_app():
+# 無効にできる機能（server/features/<name> の blueprint）。common は常に有効
+OPTIONAL_FEATURES = ("calculator", "english", "todo", "timer")
+
+def _disabled_from_env():
+    # 例: DISABLED_FEATURES=english,calculator
+    value = os.environ.get("DISABLED_FEATURES", "")
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def create_app(config=None):
     app = Flask(
         __name__,
         static_folder=str(FRONTEND_DIR),
         static_url_path="",
     )
+    if config:
+        app.config.update(config)
+    
+    # Request / SQL metrics (before compression so its time is included)
+    metrics.init_app(app)
+    
+    # Opt-in request profiler (PROFILING_ENABLED); also before compression
+    profiling.init_app(app)
+    
+    # JSON encoding (orjson if available) and compression of large API responses
+    serialization.init_app(app)
+    compression.init_app(app)
     
     # Initialize extensions
     extensions.init_app(app)
     
-    # Register Blueprints
-    from .features.common import bp as common_bp
-    from .features.calculator import bp as calculator_bp
-    from .features.english import bp as english_bp
-    from .features.todo import bp as todo_bp
-    from .features.todo import init_app as init_todo
-    from .features.timer import bp as timer_bp
-    from .features.timer import init_app as init_timer
-    
-    app.register_blueprint(common_bp)
-    app.register_blueprint(calculator_bp)
-    app.register_blueprint(english_bp)
-    app.register_blueprint(todo_bp)
-    app.register_blueprint(timer_bp)
-    
-    # Initialize features (create tables, etc.)
-    with app.app_context():
-        init_todo(app)
-        init_timer(app)
+    # Register Blueprints (disabled features are never imported)
+    app.config.setdefault("DISABLED_FEATURES", _disabled_from_env())
+    disabled = set(app.config["DISABLED_FEATURES"])
+    unknown = disabled - set(OPTIONAL_FEATURES)
+    if unknown:
+        raise ValueError(f"unknown features in DISABLED_FEATURES: {', '.join(sorted(unknown))}")
+    for name in ("common", *OPTIONAL_FEATURES):
+        if name in disabled:
+            continue
+        module = importlib.import_module(f".features.{name}", __package__)
+        app.register_blueprint(module.bp)
+    
+    # Apply schema migrations once at startup (not per request)
+    migrations.init_app(app)
+    
+    # Fingerprinted / precompressed static assets
+    assets.init_app(app)
     
     return app
 
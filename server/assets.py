@@ -0,0 +1,509 @@
+"""フロントエンド静的ファイルの配信パイプライン。
+
+起動時に index.html / script.js / styles.css / modules / assets を読み、
+
+- 内容ハッシュ入りの名前（modules/todo.3f9a0c1b2d.js など）を付ける
+- index.html・CSS・JS 内の参照（ES module の import と assets/ への文字列）を
+  ハッシュ付きの名前へ書き換える。参照先を先に処理するので、依存先が変われば
+  参照元のハッシュも変わる
+- テキスト系は gzip（brotli モジュールがあれば br も）を事前に作っておく
+- ASSET_BUNDLE=1 なら script.js から辿れるモジュールを 1 ファイルにまとめる
+
+ハッシュ付きの URL は Cache-Control: immutable と強い ETag で返し、Accept-Encoding
+に応じて圧縮済みの内容を選ぶ。index.html 自体は名前を変えられないので no-cache。
+元の名前（/styles.css など）へのリクエストは従来どおり Flask の static が返す。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from pathlib import Path
+
+import click
+from flask import Response, current_app, request, send_file
+
+from server.compression import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。無ければ gzip のみ
+    brotli = None
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# 圧縮済みの内容のキャッシュ（内容ハッシュ名）。空文字の ASSET_CACHE_DIR で無効
+CACHE_DIR = BASE_DIR / "instance" / "asset-cache"
+
+# パイプラインで扱うファイル（BASE_DIR からの相対 glob）
+SOURCE_PATTERNS = ("index.html", "*.js", "*.css", "modules/**/*.js", "assets/**/*")
+ENTRY_HTML = "index.html"
+ENTRY_SCRIPT = "script.js"
+BUNDLE_NAME = "bundle.js"
+
+TEXT_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt"}
+COMPRESS_MIN_BYTES = 1024
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+STALE_CHECK_INTERVAL = 1.0
+
+_IMPORT_RE = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(["'])(\.{1,2}/[^"']+)\2""")
+_STATIC_IMPORT_RE = re.compile(
+    r"""^[ \t]*import\s*(?:\{(?P<names>[^}]*)\}\s*from\s*)?(["'])(?P<spec>\.{1,2}/[^"']+)\2\s*;?[ \t]*$""",
+    re.M,
+)
+_EXPORT_DECL_RE = re.compile(r"^export\s+((?:async\s+)?function\*?|const|let|var|class)\s+([A-Za-z_$][\w$]*)", re.M)
+_EXPORT_LIST_RE = re.compile(r"^export\s*\{([^}]*)\}\s*;?[ \t]*$", re.M)
+
+
+class AssetBuildError(Exception):
+    pass
+
+
+class BundleUnsupported(AssetBuildError):
+    """バンドラが扱えない構文（default export / export * / 動的 import など）。"""
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(logical, digest):
+    stem, ext = posixpath.splitext(logical)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def _relative(from_logical, to_logical):
+    rel = posixpath.relpath(to_logical, posixpath.dirname(from_logical) or ".")
+    return rel if rel.startswith(".") else "./" + rel
+
+
+class Asset:
+    def __init__(self, url, mimetype, digest, body=None, source=None):
+        self.url = url
+        self.mimetype = mimetype
+        self.etag = digest[:32]
+        self.body = body            # 書き換えたテキスト（bytes）。バイナリは None で source から送る
+        self.source = source
+        self.encodings = {}         # {"br": bytes, "gzip": bytes}
+
+    @property
+    def size(self):
+        return len(self.body) if self.body is not None else os.path.getsize(self.source)
+
+    def compress(self, cache_dir=None):
+        if self.body is None or len(self.body) < COMPRESS_MIN_BYTES:
+            return
+        if brotli is not None:
+            data = _cached_compress(cache_dir, self.etag, "br", lambda: brotli.compress(self.body, quality=11))
+            if len(data) < len(self.body):
+                self.encodings["br"] = data
+        data = _cached_compress(cache_dir, self.etag, "gz", lambda: gzip.compress(self.body, compresslevel=9, mtime=0))
+        if len(data) < len(self.body):
+            self.encodings["gzip"] = data
+
+
+def _cached_compress(cache_dir, digest, suffix, compress):
+    """圧縮結果を内容ハッシュをキーにディスクへ残し、再起動や別ワーカーでは読むだけにする。"""
+    if cache_dir is None:
+        return compress()
+    path = Path(cache_dir) / f"{digest}.{suffix}"
+    try:
+        return path.read_bytes()
+    except OSError:
+        pass
+    data = compress()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return data
+
+
+class AssetPipeline:
+    def __init__(self, root=BASE_DIR, bundle=False, cache_dir=None):
+        self.root = Path(root)
+        self.bundle = bundle
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._signature = None
+        self.manifest = {}          # 論理パス -> ハッシュ付きパス
+        self.assets = {}            # ハッシュ付きパス -> Asset
+        self.index = None           # 書き換え済み index.html の Asset
+        self.built_at = None
+        self.build_seconds = None
+
+    # --- ビルド ---------------------------------------------------------
+
+    def _prune_cache(self, current):
+        """今のビルドで使っていない圧縮キャッシュを消す。"""
+        if self.cache_dir is None:
+            return
+        keep = {asset.etag for asset in current}
+        try:
+            entries = list(Path(self.cache_dir).iterdir())
+        except OSError:
+            return
+        for path in entries:
+            if path.name.split(".", 1)[0] not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def sources(self):
+        files = {}
+        for pattern in SOURCE_PATTERNS:
+            for path in self.root.glob(pattern):
+                if path.is_file() and not path.name.startswith("."):
+                    files[path.relative_to(self.root).as_posix()] = path
+        return files
+
+    def signature(self):
+        result = []
+        for logical, path in sorted(self.sources().items()):
+            stat = path.stat()
+            result.append((logical, stat.st_mtime_ns, stat.st_size))
+        return tuple(result)
+
+    def build(self):
+        started = time.perf_counter()
+        signature = self.signature()
+        sources = self.sources()
+        texts = {
+            logical: path.read_text(encoding="utf-8")
+            for logical, path in sources.items()
+            if path.suffix in TEXT_SUFFIXES
+        }
+        manifest = {}
+        assets = {}
+
+        # バイナリ（画像など）は中身を書き換えないので先にハッシュを決める
+        for logical, path in sources.items():
+            if logical in texts:
+                continue
+            digest = _file_digest(path)
+            url = hashed_name(logical, digest)
+            manifest[logical] = url
+            assets[url] = Asset(url, self._mimetype(logical), digest, source=path)
+
+        literal_re = self._literal_pattern(sources)
+        deps = {logical: self._references(logical, text, sources, literal_re) for logical, text in texts.items()}
+        rewritten = {}
+        for logical in self._topological(deps):
+            text = self._rewrite(logical, texts[logical], manifest, literal_re)
+            rewritten[logical] = text
+            if logical == ENTRY_HTML:
+                continue
+            body = text.encode("utf-8")
+            digest = _digest(body)
+            url = hashed_name(logical, digest)
+            manifest[logical] = url
+            assets[url] = Asset(url, self._mimetype(logical), digest, body=body)
+
+        if self.bundle and ENTRY_SCRIPT in texts:
+            try:
+                body = self._bundle(ENTRY_SCRIPT, rewritten, deps, manifest).encode("utf-8")
+            except BundleUnsupported as exc:
+                current_app.logger.warning("asset bundle skipped: %s", exc)
+            else:
+                digest = _digest(body)
+                url = hashed_name(BUNDLE_NAME, digest)
+                assets[url] = Asset(url, "text/javascript", digest, body=body)
+                manifest[ENTRY_SCRIPT] = url
+                # index.html は script.js をバンドルへ差し替えて書き換え直す
+                rewritten[ENTRY_HTML] = self._rewrite(ENTRY_HTML, texts[ENTRY_HTML], manifest, literal_re)
+
+        index = None
+        if ENTRY_HTML in rewritten:
+            body = rewritten[ENTRY_HTML].encode("utf-8")
+            index = Asset(ENTRY_HTML, "text/html", _digest(body), body=body)
+            index.compress(self.cache_dir)
+        for asset in assets.values():
+            asset.compress(self.cache_dir)
+        self._prune_cache([index, *assets.values()] if index else assets.values())
+
+        with self._lock:
+            self.manifest = manifest
+            self.assets = assets
+            self.index = index
+            self._signature = signature
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+        return self
+
+    def refresh_if_stale(self):
+        """開発時用。ソースが変わっていればビルドし直す（確認は STALE_CHECK_INTERVAL 秒に 1 回）。"""
+        now = time.monotonic()
+        if now - self._checked_at < STALE_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        if self.signature() == self._signature:
+            return False
+        self.build()
+        return True
+
+    @staticmethod
+    def _mimetype(logical):
+        if logical.endswith(".js"):
+            return "text/javascript"
+        return mimetypes.guess_type(logical)[0] or "application/octet-stream"
+
+    @staticmethod
+    def _literal_pattern(sources):
+        # ルート相対で書かれた参照（"assets/icons/sun.png"、"styles.css?v=2" など）。
+        # ?v= のような手動キャッシュバスターは取り除く
+        names = sorted(sources, key=len, reverse=True)
+        if not names:
+            return None
+        alternatives = "|".join(re.escape(name) for name in names)
+        return re.compile(rf"(?<![\w.\-/])(?:\./)?(?P<path>{alternatives})(?:\?v=[\w.\-]*)?(?![\w\-])|(?<=/)(?P<abs>{alternatives})(?![\w.\-])")
+
+    def _references(self, logical, text, sources, literal_re):
+        refs = set()
+        if logical.endswith(".js"):
+            for match in _IMPORT_RE.finditer(text):
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(logical), match.group(3)))
+                if target in sources:
+                    refs.add(target)
+        if literal_re is not None:
+            for match in literal_re.finditer(text):
+                refs.add(match.group("path") or match.group("abs"))
+        refs.discard(logical)
+        return refs
+
+    def _rewrite(self, logical, text, manifest, literal_re):
+        if logical.endswith(".js"):
+            def replace_import(match):
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(logical), match.group(3)))
+                if target not in manifest:
+                    return match.group(0)
+                return f"{match.group(1)}{match.group(2)}{_relative(logical, manifest[target])}{match.group(2)}"
+            text = _IMPORT_RE.sub(replace_import, text)
+        if literal_re is not None:
+            def replace_literal(match):
+                target = match.group("path") or match.group("abs")
+                return manifest.get(target, match.group(0))
+            text = literal_re.sub(replace_literal, text)
+        return text
+
+    @staticmethod
+    def _topological(deps):
+        order = []
+        state = {}
+
+        def visit(node, trail):
+            if state.get(node) == "done":
+                return
+            if state.get(node) == "visiting":
+                raise AssetBuildError(f"循環参照があります: {' -> '.join(trail + [node])}")
+            state[node] = "visiting"
+            for dep in sorted(deps.get(node, ())):
+                if dep in deps:
+                    visit(dep, trail + [node])
+            state[node] = "done"
+            order.append(node)
+
+        for node in sorted(deps):
+            visit(node, [])
+        return order
+
+    def _bundle(self, entry, texts, deps, manifest):
+        """import / export を各モジュールの関数スコープと exports オブジェクトに置き換えて連結する。
+
+        対応するのは名前付き import と export const/function/class/let/var・export { } のみ。
+        import した値はモジュール評価時点の値をコピーする（このリポジトリのモジュールは
+        関数と定数しか export しないので live binding は不要）。
+        """
+        modules = []
+        seen = set()
+
+        def visit(logical):
+            if logical in seen:
+                return
+            seen.add(logical)
+            for dep in sorted(deps.get(logical, ())):
+                if dep.endswith(".js") and dep in texts:
+                    visit(dep)
+            modules.append(logical)
+
+        visit(entry)
+        names = {logical: "__mod_" + re.sub(r"\W", "_", logical[:-3]) for logical in modules}
+        # texts は _rewrite 済みで import 先がハッシュ付きの名前なので、元の名前へ引き戻す
+        original = {manifest.get(logical, logical): logical for logical in modules}
+        chunks = ["// generated by server/assets.py; do not edit"]
+        for logical in modules:
+            text = texts[logical]
+            if re.search(r"^\s*export\s+(default\b|\*)", text, re.M) or re.search(r"\bimport\s*\(", text):
+                raise BundleUnsupported(f"{logical}: default export / export * / 動的 import は未対応です")
+
+            def replace_import(match):
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(logical), match.group("spec")))
+                source = original.get(target)
+                if source is None:
+                    raise BundleUnsupported(f"{logical}: {match.group('spec')} を解決できません")
+                if match.group("names") is None:
+                    return ""
+                bindings = []
+                for item in match.group("names").split(","):
+                    item = item.strip()
+                    if not item:
+                        continue
+                    imported, _, local = item.partition(" as ")
+                    imported, local = imported.strip(), (local.strip() or imported.strip())
+                    bindings.append(imported if imported == local else f"{imported}: {local}")
+                return f"const {{ {', '.join(bindings)} }} = {names[source]};"
+
+            body = _STATIC_IMPORT_RE.sub(replace_import, text)
+            exported = [match.group(2) for match in _EXPORT_DECL_RE.finditer(body)]
+            body = _EXPORT_DECL_RE.sub(lambda m: f"{m.group(1)} {m.group(2)}", body)
+            for match in _EXPORT_LIST_RE.finditer(body):
+                for item in match.group(1).split(","):
+                    local, _, alias = item.strip().partition(" as ")
+                    if local.strip():
+                        exported.append(f"{alias.strip()}: {local.strip()}" if alias.strip() else local.strip())
+            body = _EXPORT_LIST_RE.sub("", body)
+            if re.search(r"^\s*(import|export)\b", body, re.M):
+                raise BundleUnsupported(f"{logical}: 解釈できない import / export があります")
+            exports = f"{{ {', '.join(exported)} }}" if exported else "{}"
+            chunks.append(f"// {logical}\nconst {names[logical]} = (() => {{\n{body}\nreturn {exports};\n}})();")
+        return "\n".join(chunks) + "\n"
+
+    # --- 配信 -----------------------------------------------------------
+
+    def lookup(self, url):
+        with self._lock:
+            return self.assets.get(url)
+
+    def respond(self, asset, cache_control=IMMUTABLE):
+        # 事前圧縮した表現は中身が違うので、ETag にも符号化ごとの接尾辞を付ける
+        encoding = self._negotiate(asset)
+        etag = encoded_etag(asset.etag, encoding)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            if encoding:
+                response = Response(asset.encodings[encoding], mimetype=asset.mimetype)
+                response.headers["Content-Encoding"] = encoding
+            elif asset.body is not None:
+                response = Response(asset.body, mimetype=asset.mimetype)
+            else:
+                response = send_file(asset.source, mimetype=asset.mimetype, etag=False, conditional=False)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        if asset.encodings:
+            response.vary.add("Accept-Encoding")
+        if asset.mimetype.startswith("text/") or asset.mimetype.endswith(("javascript", "json", "+xml")):
+            response.charset = "utf-8"
+        return response
+
+    @staticmethod
+    def _negotiate(asset):
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encodings and accepted[encoding]:
+                return encoding
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "assets": len(self.assets),
+                "bundle": self.bundle,
+                "brotli": brotli is not None,
+                "bytes": sum(asset.size for asset in self.assets.values()),
+                "compressed_bytes": {
+                    encoding: sum(len(a.encodings[encoding]) for a in self.assets.values() if encoding in a.encodings)
+                    for encoding in ("br", "gzip")
+                },
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+            }
+
+    def write(self, out_dir):
+        """ビルド結果（圧縮版と manifest.json を含む）をディレクトリへ書き出す。CDN / nginx 配信用。"""
+        import json
+
+        out_dir = Path(out_dir)
+        with self._lock:
+            items = list(self.assets.values()) + ([self.index] if self.index else [])
+            manifest = dict(self.manifest)
+        for asset in items:
+            target = out_dir / asset.url
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(asset.body if asset.body is not None else Path(asset.source).read_bytes())
+            for encoding, data in asset.encodings.items():
+                suffix = ".br" if encoding == "br" else ".gz"
+                target.with_name(target.name + suffix).write_bytes(data)
+        (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        return len(items)
+
+
+def get_pipeline():
+    return current_app.extensions.get("asset_pipeline")
+
+
+def serve_index():
+    """パイプラインが有効なら書き換え済みの index.html を返す。無効なら None。"""
+    pipeline = get_pipeline()
+    if pipeline is None or pipeline.index is None:
+        return None
+    if current_app.debug:
+        pipeline.refresh_if_stale()
+    return pipeline.respond(pipeline.index, cache_control="no-cache")
+
+
+def init_app(app):
+    app.config.setdefault("ASSET_PIPELINE", os.environ.get("ASSET_PIPELINE", "1") != "0")
+    app.config.setdefault("ASSET_BUNDLE", os.environ.get("ASSET_BUNDLE", "0") == "1")
+    if not app.config["ASSET_PIPELINE"]:
+        return
+
+    app.config.setdefault("ASSET_CACHE_DIR", os.environ.get("ASSET_CACHE_DIR", str(CACHE_DIR)))
+    pipeline = AssetPipeline(
+        Path(app.static_folder),
+        bundle=app.config["ASSET_BUNDLE"],
+        cache_dir=app.config["ASSET_CACHE_DIR"] or None,
+    )
+    with app.app_context():
+        try:
+            pipeline.build()
+        except (AssetBuildError, OSError, UnicodeDecodeError) as exc:
+            app.logger.warning("asset pipeline disabled: %s", exc)
+            return
+    app.extensions["asset_pipeline"] = pipeline
+
+    # ハッシュ付きの URL は static より先にパイプラインで返す
+    serve_static = app.view_functions["static"]
+
+    def static(filename):
+        if app.debug:
+            pipeline.refresh_if_stale()
+        asset = pipeline.lookup(filename)
+        if asset is not None:
+            return pipeline.respond(asset)
+        return serve_static(filename=filename)
+
+    app.view_functions["static"] = static
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """フィンガープリント付きの静的ファイルを instance/static_build へ書き出す。"""
+        out_dir = Path(app.instance_path) / "static_build"
+        count = pipeline.build().write(out_dir)
+        stats = pipeline.stats()
+        click.echo(f"wrote {count} files to {out_dir} ({stats['build_seconds']:.2f}s)")
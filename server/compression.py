@@ -0,0 +1,99 @@
+"""API 応答の圧縮。
+
+一定サイズ以上の JSON 応答を、Accept-Encoding に応じて brotli（モジュールが
+あれば）か gzip で圧縮する。圧縮の有無にかかわらず Vary: Accept-Encoding を
+付ける。静的ファイル（assets パイプラインの事前圧縮や send_file）と SSE の
+ストリームは direct_passthrough / streamed なので触らない。
+
+強い ETag は表現ごとに異なる必要があるので、圧縮した応答の ETag には
+"-br" / "-gz" を付ける。todo 一覧や calc-config は If-None-Match / If-Match を
+matching_etag / strip_encoding_suffix で接尾辞を外してから版と比べる。
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。無ければ gzip のみ
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = ("application/json",)
+GZIP_LEVEL = 6
+# 応答ごとに圧縮するので、静的ファイルより速さ寄りの品質にする
+BROTLI_QUALITY = 4
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def _choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag, encoding):
+    return etag + ETAG_SUFFIXES[encoding] if encoding else etag
+
+
+def strip_encoding_suffix(etag):
+    for suffix in ETAG_SUFFIXES.values():
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)]
+    return etag
+
+
+def matching_etag(etags, etag):
+    """If-None-Match などの中で etag のどれかの表現に当たるものを返す。無ければ None。"""
+    if etags.star_tag:
+        return etag
+    for candidate in etags:
+        if strip_encoding_suffix(candidate) == etag:
+            return candidate
+    return None
+
+
+def compress_response(response, min_bytes=COMPRESS_MIN_BYTES):
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or request.method == "HEAD"
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
+
+
+def init_app(app):
+    app.config.setdefault("COMPRESS_RESPONSES", True)
+    app.config.setdefault("COMPRESS_MIN_BYTES", COMPRESS_MIN_BYTES)
+
+    @app.after_request
+    def _compress(response):
+        if not app.config["COMPRESS_RESPONSES"]:
+            return response
+        return compress_response(response, app.config["COMPRESS_MIN_BYTES"])
@@ -1,21 +1,191 @@
+import os
+import queue
 import sqlite3
-from flask import g
+import threading
+from flask import g, current_app
 from pathlib import Path
 
+from . import metrics
+
 # Database setup
 DB_PATH = Path(__file__).resolve().parents[1] / "instance" / "dashboard.db"
 
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_TIMEOUT = 10.0
+
+# 接続ごとに一度だけ適用する PRAGMA
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",      # 約 20MB のページキャッシュ
+    "PRAGMA mmap_size = 268435456",    # 256MB まで mmap I/O
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """プロセス単位の SQLite 接続プール。
+
+    接続は初回に PRAGMA を設定した後は使い回し、acquire / release で貸し出す。
+    fork 後の子プロセスでは親の接続を使わず、新しいプールとして作り直す。
+    """
+
+    def __init__(self, db_path, max_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT, factory=sqlite3.Connection):
+        self.db_path = Path(db_path)
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._open = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._in_use = 0
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            try:
+                conn = self._idle.get_nowait()
+                self._hits += 1
+                self._in_use += 1
+                return conn
+            except queue.Empty:
+                pass
+            if self._open < self.max_size:
+                self._open += 1
+                self._misses += 1
+                self._in_use += 1
+                create = True
+            else:
+                self._waits += 1
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                    self._in_use -= 1
+                raise
+
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"DB 接続の取得がタイムアウトしました ({self.timeout}s)")
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        if conn is None:
+            return
+        with self._lock:
+            foreign = self._pid != os.getpid()
+        if foreign:
+            # fork 前に借りた接続は子プロセスでは戻さない
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # 壊れた接続は捨てて枠を空ける
+            with self._lock:
+                self._open -= 1
+                self._in_use -= 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "db_path": str(self.db_path),
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
+
+
+def get_pool():
+    return current_app.extensions["db_pool"]
+
+
+def borrow_db():
+    """リクエスト外（スレッドや CLI）で使う接続を借りる。使い終わったら return_db に返す。"""
+    return get_pool().acquire()
+
+
+def return_db(conn):
+    get_pool().release(conn)
+
+
 def get_db():
     if 'db' not in g:
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
+        g.db = borrow_db()
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        return_db(db)
 
 def init_app(app):
+    app.config.setdefault("DATABASE", str(DB_PATH))
+    app.config.setdefault("DB_POOL_SIZE", int(os.environ.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE)))
+    app.config.setdefault("DB_POOL_TIMEOUT", float(os.environ.get("DB_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT)))
+    app.extensions["db_pool"] = ConnectionPool(
+        app.config["DATABASE"],
+        max_size=app.config["DB_POOL_SIZE"],
+        timeout=app.config["DB_POOL_TIMEOUT"],
+        # メトリクスかプロファイラが有効なら SQL を計測・記録できる接続にする
+        factory=(
+            metrics.InstrumentedConnection
+            if metrics.enabled(app) or app.config.get("PROFILING_ENABLED")
+            else sqlite3.Connection
+        ),
+    )
     app.teardown_appcontext(close_db)
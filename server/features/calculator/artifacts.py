@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """生成済みプリント（PDF / TeX）のコンテンツアドレス型ストア。
+
+    objects/<sha256><拡張子> にファイル本体を内容のハッシュで 1 つだけ置き、
+    entries/<key>.json に「設定キー → 各ファイルのハッシュと元のパス」を記録する。
+    合計サイズが max_bytes を超えたら最終参照の古いエントリから消し、
+    どのエントリからも参照されなくなった本体を削除する。
+    """
+
+    KINDS = ("pdf", "tex")
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def objects_dir(self):
+        return self.root / "objects"
+
+    @property
+    def entries_dir(self):
+        return self.root / "entries"
+
+    def lookup(self, key):
+        """保存済みなら {'pdf_path', 'tex_path'} を返す。元の出力が保存時のまま残っていればそれを、なければ保存コピーを指す。"""
+        with self._lock:
+            entry = self._read_entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            paths = {}
+            for kind in self.KINDS:
+                item = entry["files"].get(kind)
+                if not item:
+                    paths[f"{kind}_path"] = None
+                    continue
+                stored = self.objects_dir / item["object"]
+                if not stored.exists():
+                    # 本体が消えていたら無効なエントリとして扱う
+                    self._entry_path(key).unlink(missing_ok=True)
+                    self.misses += 1
+                    return None
+                if self._original_unchanged(item):
+                    paths[f"{kind}_path"] = item["original_path"]
+                else:
+                    paths[f"{kind}_path"] = str(stored.resolve())
+            entry["accessed_at"] = time.time()
+            self._write_entry(key, entry)
+            self.hits += 1
+            return paths
+
+    def put(self, key, pdf_path=None, tex_path=None):
+        files = {}
+        with self._lock:
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            self.entries_dir.mkdir(parents=True, exist_ok=True)
+            for kind, path in (("pdf", pdf_path), ("tex", tex_path)):
+                if not path or not Path(path).is_file():
+                    continue
+                path = Path(path)
+                object_name = file_sha256(path) + path.suffix
+                target = self.objects_dir / object_name
+                if not target.exists():
+                    tmp = target.with_name(target.name + ".tmp")
+                    shutil.copyfile(path, tmp)
+                    os.replace(tmp, target)
+                files[kind] = {
+                    "object": object_name,
+                    "original_path": str(path.resolve()),
+                    "size": target.stat().st_size,
+                    "mtime_ns": path.stat().st_mtime_ns,
+                }
+            if not files:
+                return False
+            now = time.time()
+            self._write_entry(key, {"files": files, "created_at": now, "accessed_at": now})
+            self._evict()
+            return True
+
+    def stats(self):
+        with self._lock:
+            entries = len(list(self.entries_dir.glob("*.json"))) if self.entries_dir.exists() else 0
+            return {
+                "entries": entries,
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _original_unchanged(item):
+        """元の出力が保存時からサイズも mtime も変わっていなければ True。
+
+        同じサイズのまま上書きされた PDF を取り違えないよう mtime_ns も比べる。
+        mtime を持たない古いエントリは常に保存コピーを使う。
+        """
+        if not item.get("original_path") or "mtime_ns" not in item:
+            return False
+        try:
+            stat = Path(item["original_path"]).stat()
+        except OSError:
+            return False
+        return stat.st_size == item["size"] and stat.st_mtime_ns == item["mtime_ns"]
+
+    def _entry_path(self, key):
+        return self.entries_dir / f"{key}.json"
+
+    def _read_entry(self, key):
+        try:
+            return json.loads(self._entry_path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_entry(self, key, entry):
+        path = self._entry_path(key)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _total_bytes(self):
+        if not self.objects_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.objects_dir.iterdir() if p.is_file())
+
+    def _evict(self):
+        entries = []
+        for path in self.entries_dir.glob("*.json"):
+            try:
+                entries.append((path, json.loads(path.read_text(encoding="utf-8"))))
+            except ValueError:
+                path.unlink(missing_ok=True)
+        entries.sort(key=lambda item: item[1].get("accessed_at", 0))
+
+        total = self._total_bytes()
+        while total > self.max_bytes and len(entries) > 1:
+            path, _ = entries.pop(0)
+            path.unlink(missing_ok=True)
+            referenced = {
+                item["object"] for _, entry in entries for item in entry["files"].values()
+            }
+            for obj in self.objects_dir.iterdir():
+                if obj.is_file() and obj.name not in referenced:
+                    total -= obj.stat().st_size
+                    obj.unlink()
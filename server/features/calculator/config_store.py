@@ -0,0 +1,179 @@
+"""config.json の読み書き。
+
+解析済みの設定を (mtime_ns, size) をキーにメモリへ保持し、ファイルが変わった
+時だけ読み直して検証する。書き込みは一時ファイル + os.replace で行うので、
+読み手が書きかけのファイルを見ることはない。ETag は内容のハッシュで、
+If-Match による楽観的排他に使う。
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+REQUIRED_SECTIONS = ("scheduler", "output", "categories")
+
+_DATE_RE = re.compile(r"^\d{4}[/-]\d{1,2}[/-]\d{1,2}$")
+
+
+class ConfigNotFound(FileNotFoundError):
+    pass
+
+
+class ConfigInvalid(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class ConfigConflict(Exception):
+    """If-Match の ETag が現在のファイルと一致しない。"""
+
+    def __init__(self, current_etag):
+        super().__init__("設定ファイルが他で更新されています")
+        self.current_etag = current_etag
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_config(data):
+    """scheduler / output / categories の形を確認し、エラーメッセージのリストを返す（空なら OK）。"""
+    if not isinstance(data, dict):
+        return ["設定は JSON オブジェクトである必要があります"]
+    missing = [key for key in REQUIRED_SECTIONS if key not in data]
+    if missing:
+        return [f"必須セクションが不足しています: {', '.join(missing)}"]
+
+    errors = []
+    scheduler = data["scheduler"]
+    if not isinstance(scheduler, dict):
+        errors.append("scheduler はオブジェクトである必要があります")
+    else:
+        edition = scheduler.get("edition", 1)
+        if not _is_int(edition) or edition < 1:
+            errors.append("scheduler.edition は 1 以上の整数です")
+        start_date = scheduler.get("start_date", "")
+        if not isinstance(start_date, str) or (start_date and not _DATE_RE.match(start_date)):
+            errors.append("scheduler.start_date は YYYY/MM/DD 形式です")
+        num_days = scheduler.get("num_days", 1)
+        if not _is_int(num_days) or num_days < 1:
+            errors.append("scheduler.num_days は 1 以上の整数です")
+        notes = scheduler.get("notes", [])
+        if not isinstance(notes, str) and not (
+            isinstance(notes, list) and all(isinstance(note, str) for note in notes)
+        ):
+            errors.append("scheduler.notes は文字列か文字列のリストです")
+
+    output = data["output"]
+    if not isinstance(output, dict):
+        errors.append("output はオブジェクトである必要があります")
+    elif "directory" in output and not (isinstance(output["directory"], str) and output["directory"].strip()):
+        errors.append("output.directory は空でない文字列です")
+
+    categories = data["categories"]
+    if not isinstance(categories, dict):
+        errors.append("categories はオブジェクトである必要があります")
+    else:
+        for name, category in categories.items():
+            if not isinstance(category, dict):
+                errors.append(f"categories.{name} はオブジェクトである必要があります")
+                continue
+            per_day = category.get("per_day", category.get("count", 0))
+            if not _is_int(per_day) or per_day < 0:
+                errors.append(f"categories.{name}.per_day は 0 以上の整数です")
+            low = category.get("min_difficulty", 1)
+            high = category.get("max_difficulty", 5)
+            if not (_is_int(low) and _is_int(high) and 1 <= low <= high <= 5):
+                errors.append(f"categories.{name} の難易度は 1 <= min_difficulty <= max_difficulty <= 5 です")
+    return errors
+
+
+def _etag(raw):
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+class ConfigStore:
+    """config.json のキャッシュ付きストア。load() が返す dict は共有なので書き換えないこと。"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._marker = None
+        self._data = None
+        self._etag = None
+        self._errors = []
+        self.hits = 0
+        self.reloads = 0
+
+    def _stat_marker(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            raise ConfigNotFound("config.json が見つかりません。")
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        marker = self._stat_marker()
+        if marker == self._marker:
+            self.hits += 1
+            return
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            raise ConfigNotFound("config.json が見つかりません。")
+        data = json.loads(raw.decode("utf-8"))
+        self._data = data
+        self._etag = _etag(raw)
+        self._errors = validate_config(data)
+        self._marker = marker
+        self.reloads += 1
+
+    def load(self):
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """(設定, ETag, 検証エラー) を返す。ファイルが変わっていなければ読み直さない。"""
+        with self._lock:
+            self._refresh()
+            return self._data, self._etag, self._errors
+
+    def write(self, data, if_match=None):
+        """検証してから原子的に書き込み、新しい ETag を返す。"""
+        errors = validate_config(data)
+        if errors:
+            raise ConfigInvalid(errors)
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        with self._lock:
+            if if_match is not None:
+                try:
+                    self._refresh()
+                    current = self._etag
+                except ConfigNotFound:
+                    current = None
+                if if_match != current:
+                    raise ConfigConflict(current)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".config.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(raw)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            # 書いた内容をそのままキャッシュに載せる（解析し直しはしない）
+            self._data = json.loads(raw.decode("utf-8"))
+            self._etag = _etag(raw)
+            self._errors = []
+            self._marker = self._stat_marker()
+            return self._etag
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "reloads": self.reloads, "etag": self._etag}
@@ -0,0 +1,114 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+OUTPUT_TAIL_CHARS = 8000
+
+
+def _tail(text, limit=OUTPUT_TAIL_CHARS):
+    if not text:
+        return text or ""
+    return text[-limit:]
+
+
+class CalcJob:
+    def __init__(self, key, app=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        # runner が DB（成果物の索引）を使う時のアプリ。リクエスト外のスレッドで動くため
+        self.app = app
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.returncode = None
+        self.stdout = ""
+        self.stderr = ""
+        self.pdf_path = None
+        self.tex_path = None
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.state in ("completed", "failed")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "returncode": self.returncode,
+            "stdout": _tail(self.stdout),
+            "stderr": _tail(self.stderr),
+            "pdf_path": self.pdf_path,
+            "tex_path": self.tex_path,
+            "error": self.error,
+        }
+
+
+class CalcJobQueue:
+    """プリント生成ジョブのキュー。
+
+    runner(job) は job の stdout / パス等を埋めて返し、失敗時は例外を投げる。
+    同時実行数は max_workers で制限し、同じ key（設定内容）のジョブが待機中・
+    実行中ならそれを返して二重に起動しない。終わったジョブは retention_seconds
+    経過後か max_retained 件を超えた分から捨てる。
+    """
+
+    def __init__(self, runner, max_workers=1, retention_seconds=3600, max_retained=100):
+        self.runner = runner
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calc-run")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+
+    def submit(self, key, app=None):
+        """(job, coalesced) を返す。"""
+        with self._lock:
+            self._prune()
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return existing, True
+            job = CalcJob(key, app)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+        self._executor.submit(self._run, job)
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        with self._lock:
+            job.state = "running"
+            job.started_at = time.time()
+        state = "failed"
+        try:
+            self.runner(job)
+            state = "completed"
+        except Exception as exc:
+            job.error = job.error or str(exc)
+        finally:
+            # 終了時刻と状態は同時に変える（_prune は finished なら finished_at がある前提）
+            with self._lock:
+                job.finished_at = time.time()
+                job.state = state
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+
+    def _prune(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished and job.finished_at is not None]
+        excess = len(finished) - self.max_retained
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.retention_seconds:
+                del self._jobs[job.id]
+                excess -= 1
@@ -0,0 +1,215 @@
+"""生成済みプリントの索引（calc_artifacts テーブル）。
+
+生成が成功するたびに PDF / TeX の組を 1 行として記録し、最新の取得や一覧は
+(mtime DESC, id DESC) のインデックスだけで引く。出力ディレクトリの走査は
+reconcile（手動の再構築、または OUTPUT:: 行が無く、前回の走査以降に出力
+ディレクトリが変わっていた時の 1 回）に限る。
+"""
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+KINDS = ("pdf", "tex")
+
+# create_worksheet.py の出力名: 第{edition}回_{YYYYMMDD}_計算プリント
+_NAME_RE = re.compile(r"^第(\d+)回_(\d{8})_")
+
+_COLUMNS = "id, directory, base_name, edition, issue_date, pdf_path, tex_path, pdf_size, tex_size, mtime, config_key, recorded_at"
+
+
+def parse_name(base_name):
+    """ファイル名から (回, 日付 YYYY-MM-DD) を取り出す。形式が違えば (None, None)。"""
+    match = _NAME_RE.match(base_name)
+    if not match:
+        return None, None
+    try:
+        issue_date = datetime.strptime(match.group(2), "%Y%m%d").date().isoformat()
+    except ValueError:
+        issue_date = None
+    return int(match.group(1)), issue_date
+
+
+def to_dict(row):
+    return {key: row[key] for key in row.keys()}
+
+
+def _upsert(conn, directory, base_name, files, config_key=None):
+    edition, issue_date = parse_name(base_name)
+    pdf = files.get("pdf")
+    tex = files.get("tex")
+    mtime = max(item["mtime"] for item in files.values())
+    conn.execute(f"""
+        INSERT INTO calc_artifacts (directory, base_name, edition, issue_date, pdf_path, tex_path,
+                                    pdf_size, tex_size, mtime, config_key, recorded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (directory, base_name) DO UPDATE SET
+            pdf_path = excluded.pdf_path,
+            tex_path = excluded.tex_path,
+            pdf_size = excluded.pdf_size,
+            tex_size = excluded.tex_size,
+            mtime = excluded.mtime,
+            config_key = COALESCE(excluded.config_key, calc_artifacts.config_key),
+            recorded_at = excluded.recorded_at
+    """, (
+        directory, base_name, edition, issue_date,
+        pdf["path"] if pdf else None,
+        tex["path"] if tex else None,
+        pdf["size"] if pdf else None,
+        tex["size"] if tex else None,
+        mtime, config_key, time.time(),
+    ))
+
+
+def record(conn, pdf_path=None, tex_path=None, config_key=None):
+    """生成結果を記録する。存在しないパスは無視し、何も無ければ False。"""
+    groups = {}
+    for kind, path in (("pdf", pdf_path), ("tex", tex_path)):
+        if not path:
+            continue
+        path = Path(path).resolve()
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        group = groups.setdefault((str(path.parent), path.stem), {})
+        group[kind] = {"path": str(path), "size": stat.st_size, "mtime": stat.st_mtime}
+    for (directory, base_name), files in groups.items():
+        _upsert(conn, directory, base_name, files, config_key)
+    conn.commit()
+    return bool(groups)
+
+
+def latest(conn):
+    row = conn.execute(
+        f"SELECT {_COLUMNS} FROM calc_artifacts ORDER BY mtime DESC, id DESC LIMIT 1"
+    ).fetchone()
+    return to_dict(row) if row else None
+
+
+# reconcile 直後のディレクトリの mtime（プロセス内）。変わっていなければ索引は最新とみなす
+_reconciled_at = {}
+
+
+def _directory_marker(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def latest_or_reconcile(conn, directory):
+    """directory 内の最新の行を索引から引く。
+
+    前回の reconcile 以降ディレクトリにファイルの追加・削除が無ければ（ディレクトリの
+    mtime が同じなら）索引だけで返し、変わっていた時だけ走査して取り込み直す。
+    """
+    directory = str(Path(directory).resolve())
+    marker = _directory_marker(directory)
+    if marker is not None and _reconciled_at.get(directory) == marker:
+        row = conn.execute(
+            f"SELECT {_COLUMNS} FROM calc_artifacts WHERE directory = ? ORDER BY mtime DESC, id DESC LIMIT 1",
+            (directory,),
+        ).fetchone()
+        if row is not None:
+            return to_dict(row)
+    reconcile(conn, [directory])
+    return latest(conn)
+
+
+def encode_cursor(row):
+    return f"{row['mtime']!r}_{row['id']}"
+
+
+def decode_cursor(cursor):
+    mtime, _, row_id = cursor.rpartition("_")
+    return float(mtime), int(row_id)
+
+
+def list_artifacts(conn, limit=20, cursor=None):
+    """新しい順に limit 件。(行のリスト, 次ページのカーソル or None) を返す。"""
+    if cursor:
+        mtime, row_id = decode_cursor(cursor)
+        rows = conn.execute(f"""
+            SELECT {_COLUMNS} FROM calc_artifacts
+            WHERE mtime < ? OR (mtime = ? AND id < ?)
+            ORDER BY mtime DESC, id DESC LIMIT ?
+        """, (mtime, mtime, row_id, limit + 1)).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM calc_artifacts ORDER BY mtime DESC, id DESC LIMIT ?",
+            (limit + 1,),
+        ).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [to_dict(row) for row in rows[:limit]], next_cursor
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM calc_artifacts").fetchone()[0]
+
+
+def scan_directory(directory):
+    """ディレクトリを 1 回だけ走査し、{base_name: {kind: {path, size, mtime}}} を返す。"""
+    groups = {}
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return groups
+    with entries:
+        for entry in entries:
+            stem, dot, ext = entry.name.rpartition(".")
+            if not dot or ext.lower() not in KINDS or not entry.is_file():
+                continue
+            stat = entry.stat()
+            groups.setdefault(stem, {})[ext.lower()] = {
+                "path": os.path.join(directory, entry.name),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+    return groups
+
+
+def reconcile(conn, directories):
+    """指定ディレクトリ（と索引に載っているディレクトリ）を走査して索引を作り直す。
+
+    消えたファイルの行は削除し、サイズや mtime が変わった行だけを更新する。
+    戻り値は {'added', 'updated', 'removed', 'total'}。
+    """
+    known = {}
+    for row in conn.execute(
+        "SELECT id, directory, base_name, pdf_path, tex_path, pdf_size, tex_size, mtime FROM calc_artifacts"
+    ):
+        known[(row["directory"], row["base_name"])] = row
+
+    targets = {str(Path(d).resolve()) for d in directories if d}
+    targets.update(directory for directory, _ in known)
+
+    added = updated = removed = 0
+    seen = set()
+    for directory in sorted(targets):
+        for base_name, files in scan_directory(directory).items():
+            key = (directory, base_name)
+            seen.add(key)
+            row = known.get(key)
+            if row is None:
+                added += 1
+            elif (
+                row["pdf_path"] == (files["pdf"]["path"] if "pdf" in files else None)
+                and row["tex_path"] == (files["tex"]["path"] if "tex" in files else None)
+                and row["pdf_size"] == (files["pdf"]["size"] if "pdf" in files else None)
+                and row["tex_size"] == (files["tex"]["size"] if "tex" in files else None)
+                and row["mtime"] == max(item["mtime"] for item in files.values())
+            ):
+                continue
+            else:
+                updated += 1
+            _upsert(conn, directory, base_name, files)
+
+    stale = [row["id"] for key, row in known.items() if key not in seen]
+    conn.executemany("DELETE FROM calc_artifacts WHERE id = ?", [(row_id,) for row_id in stale])
+    removed = len(stale)
+    conn.commit()
+    for directory in targets:
+        _reconciled_at[directory] = _directory_marker(directory)
+    return {"added": added, "updated": updated, "removed": removed, "total": count(conn)}
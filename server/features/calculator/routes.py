@@ -1,9 +1,21 @@
-from flask import Blueprint, request, jsonify
+import click
+from flask import Blueprint, Response, current_app, request, jsonify
+import hashlib
 import json
+import os
 import subprocess
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
+from server import metrics
+from server.compression import matching_etag, strip_encoding_suffix
+from server.extensions import borrow_db, get_db, return_db
+from . import manifest
+from .artifacts import ArtifactStore, file_sha256
+from .config_store import ConfigConflict, ConfigInvalid, ConfigNotFound, ConfigStore
+from .jobs import CalcJobQueue
+from .worker import WorkerPool, WorkerTimeout, WorkerUnavailable
 
 bp = Blueprint('calculator', __name__, url_prefix='/api')
 
@@ -11,22 +23,43 @@ BASE_DIR = Path(__file__).resolve().parents[3]
 PROGRAM_DIR = BASE_DIR / "calculation_practice_program"
 CONFIG_PATH = PROGRAM_DIR / "config.json"
 SCRIPT_PATH = PROGRAM_DIR / "create_worksheet.py"
+ARTIFACT_DIR = BASE_DIR / "instance" / "worksheet_cache"
 
-def load_config():
-    try:
-        return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-    except FileNotFoundError:
-        raise FileNotFoundError("config.json が見つかりません。")
+artifacts = ArtifactStore(
+    ARTIFACT_DIR,
+    max_bytes=int(os.environ.get("CALC_CACHE_MAX_MB", 200)) * 1024 * 1024,
+)
+
+config_store = ConfigStore(CONFIG_PATH)
 
-def write_config(data: dict):
-    CONFIG_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+RUN_LATENCY = metrics.histogram(
+    "calc_run_duration_seconds", "Worksheet generation runs.", ("mode", "outcome"), metrics.SLOW_BUCKETS
+)
+
+def load_config():
+    """解析済みの config.json（共有の dict なので書き換えないこと）。"""
+    return config_store.load()
 
 @bp.get("/calc-config")
 def get_calc_config():
     try:
-        return jsonify(load_config())
-    except FileNotFoundError as exc:
+        config, etag, errors = config_store.snapshot()
+    except ConfigNotFound as exc:
         return jsonify({"error": str(exc)}), 404
+    except ValueError as exc:
+        return jsonify({"error": f"config.json を解析できません: {exc}"}), 500
+
+    matched = matching_etag(request.if_none_match, etag)
+    if matched:
+        response = Response(status=304)
+    else:
+        response = jsonify(config)
+    response.set_etag(matched or etag)
+    response.headers["Cache-Control"] = "no-cache"
+    if errors:
+        # 手で編集された不正な設定でも画面から直せるよう、内容は返して警告だけ付ける
+        response.headers["X-Config-Warnings"] = str(len(errors))
+    return response
 
 @bp.post("/calc-config")
 def update_calc_config():
@@ -35,98 +68,244 @@ def update_calc_config():
     except Exception:
         return jsonify({"error": "JSON を解析できません"}), 400
 
-    missing = [key for key in ("scheduler", "output", "categories") if key not in payload]
-    if missing:
-        return jsonify({"error": f"必須セクションが不足しています: {', '.join(missing)}"}), 400
+    # If-Match があれば読み込んだ時点の設定から変わっていない場合だけ保存する
+    if_match = None
+    if request.if_match and not request.if_match.star_tag:
+        if_match = next(iter(request.if_match), None)
+        if if_match is not None:
+            # 圧縮して返した表現の ETag（"-gz" など付き）でも同じ版として扱う
+            if_match = strip_encoding_suffix(if_match)
 
     try:
-        write_config(payload)
+        etag = config_store.write(payload, if_match=if_match)
+    except ConfigInvalid as exc:
+        return jsonify({"error": exc.errors[0], "errors": exc.errors}), 400
+    except ConfigConflict as exc:
+        return jsonify({"error": str(exc), "etag": exc.current_etag}), 412
     except Exception as exc:
         return jsonify({"error": f"設定ファイルを書き込めません: {exc}"}), 500
 
-    return jsonify({"status": "saved"})
+    response = jsonify({"status": "saved"})
+    response.set_etag(etag)
+    return response
 
-@bp.post("/calc-run")
-def run_calc_script():
-    if not SCRIPT_PATH.exists():
-        return jsonify({"error": "create_worksheet.py が見つかりません"}), 404
-
-    def compute_expected_paths():
-        try:
-            config = load_config()
-            edition = int(config.get("scheduler", {}).get("edition", 1))
-            start_date = config.get("scheduler", {}).get("start_date", "")
-            replaced = start_date.replace("-", "/")
-            try:
-                start_dt = datetime.strptime(replaced, "%Y/%m/%d")
-            except ValueError:
-                start_dt = datetime.now()
-            dated_suffix = start_dt.strftime("%Y%m%d")
-            base_name = f"第{edition}回_{dated_suffix}_計算プリント"
-            out_dir = Path(config.get("output", {}).get("directory", PROGRAM_DIR / "output"))
-            pdf_path = str((out_dir / f"{base_name}.pdf").resolve())
-            tex_path = str((out_dir / f"{base_name}.tex").resolve())
-            return pdf_path, tex_path
-        except Exception:
-            return None, None
-
-    def guess_latest_paths():
+def compute_expected_paths():
+    try:
+        config = load_config()
+        edition = int(config.get("scheduler", {}).get("edition", 1))
+        start_date = config.get("scheduler", {}).get("start_date", "")
+        replaced = start_date.replace("-", "/")
         try:
-            config = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-            out_dir = Path(config.get("output", {}).get("directory", PROGRAM_DIR / "output"))
-        except Exception:
-            out_dir = PROGRAM_DIR / "output"
-        out_dir = Path(out_dir)
-        pdf_candidates = sorted(out_dir.glob("*.pdf"), key=lambda p: p.stat().st_mtime, reverse=True)
-        tex_candidates = sorted(out_dir.glob("*.tex"), key=lambda p: p.stat().st_mtime, reverse=True)
-        pdf_path = str(pdf_candidates[0].resolve()) if pdf_candidates else None
-        tex_path = str(tex_candidates[0].resolve()) if tex_candidates else None
+            start_dt = datetime.strptime(replaced, "%Y/%m/%d")
+        except ValueError:
+            start_dt = datetime.now()
+        dated_suffix = start_dt.strftime("%Y%m%d")
+        base_name = f"第{edition}回_{dated_suffix}_計算プリント"
+        out_dir = Path(config.get("output", {}).get("directory", PROGRAM_DIR / "output"))
+        pdf_path = str((out_dir / f"{base_name}.pdf").resolve())
+        tex_path = str((out_dir / f"{base_name}.tex").resolve())
         return pdf_path, tex_path
+    except Exception:
+        return None, None
 
-    def parse_output_paths(stdout: str):
-        pdf_path = None
-        tex_path = None
-        for line in stdout.splitlines():
-            if line.startswith("OUTPUT::"):
-                parts = line.split("::")
-                if len(parts) >= 3:
-                    pdf_path = parts[1].strip() or None
-                    tex_path = parts[2].strip() or None
-        return pdf_path, tex_path
+def output_directory():
+    try:
+        config = load_config()
+        return Path(config.get("output", {}).get("directory", PROGRAM_DIR / "output"))
+    except Exception:
+        return PROGRAM_DIR / "output"
+
+def existing_expected_paths():
+    pdf_path, tex_path = compute_expected_paths()
+    pdf_path = pdf_path if pdf_path and Path(pdf_path).is_file() else None
+    tex_path = tex_path if tex_path and Path(tex_path).is_file() else None
+    return pdf_path, tex_path
+
+def guess_latest_paths(conn):
+    # まず索引を引き、出力ディレクトリが前回の走査から変わっていた時だけ走査し直す
+    row = manifest.latest_or_reconcile(conn, output_directory())
+    if row is None:
+        return None, None
+    return row["pdf_path"], row["tex_path"]
+
+def parse_output_paths(stdout: str):
+    pdf_path = None
+    tex_path = None
+    for line in stdout.splitlines():
+        if line.startswith("OUTPUT::"):
+            parts = line.split("::")
+            if len(parts) >= 3:
+                pdf_path = parts[1].strip() or None
+                tex_path = parts[2].strip() or None
+    return pdf_path, tex_path
+
+_script_hash = {}
+
+def script_hash():
+    # 生成スクリプトが変わったら別の成果物として扱う。中身のハッシュは mtime / サイズが変わった時だけ取り直す
+    try:
+        stat = SCRIPT_PATH.stat()
+    except FileNotFoundError:
+        return ""
+    marker = (stat.st_mtime_ns, stat.st_size)
+    if _script_hash.get("marker") != marker:
+        _script_hash["marker"] = marker
+        _script_hash["digest"] = file_sha256(SCRIPT_PATH)
+    return _script_hash["digest"]
 
+def config_key():
+    """正規化した config.json と生成スクリプトのハッシュ。同じキーなら同じプリントが得られる。"""
     try:
-        result = subprocess.run(
+        canonical = json.dumps(load_config(), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    except Exception:
+        canonical = ""
+    return hashlib.sha256(f"{script_hash()}\n{canonical}".encode("utf-8")).hexdigest()
+
+RUN_TIMEOUT = float(os.environ.get("CALC_RUN_TIMEOUT", 300))
+WORKER_POOL_SIZE = int(os.environ.get("CALC_WORKER_POOL_SIZE", 1))
+WORKER_MAX_JOBS = int(os.environ.get("CALC_WORKER_MAX_JOBS", 50))
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """常駐ワーカープール（CALC_WORKER_POOL_SIZE=0 なら無効で None）。初回の生成時に作る。"""
+    global _worker_pool
+    if WORKER_POOL_SIZE <= 0:
+        return None
+    with _worker_pool_lock:
+        if _worker_pool is None or _worker_pool.script_path != str(SCRIPT_PATH):
+            if _worker_pool is not None:
+                _worker_pool.shutdown()
+            _worker_pool = WorkerPool(SCRIPT_PATH, BASE_DIR, size=WORKER_POOL_SIZE, max_jobs=WORKER_MAX_JOBS)
+        return _worker_pool
+
+def run_script():
+    pool = get_worker_pool()
+    if pool is not None:
+        try:
+            with RUN_LATENCY.time(mode="worker"):
+                result = pool.run(RUN_TIMEOUT)
+        except WorkerUnavailable:
+            # ワーカーが使えなければ従来どおり新しいインタプリタで実行する
+            pass
+        else:
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, str(SCRIPT_PATH), result.stdout, result.stderr)
+            return result
+    with RUN_LATENCY.time(mode="subprocess"):
+        return subprocess.run(
             [sys.executable, str(SCRIPT_PATH)],
             capture_output=True,
             text=True,
             cwd=BASE_DIR,
             check=True,
+            timeout=RUN_TIMEOUT,
         )
-        pdf_path, tex_path = parse_output_paths(result.stdout)
-        if not pdf_path and not tex_path:
-            pdf_path, tex_path = guess_latest_paths()
-        if not pdf_path and not tex_path:
-            pdf_path, tex_path = compute_expected_paths()
+
+def build_worksheet(job):
+    try:
+        result = run_script()
     except subprocess.CalledProcessError as exc:
-        return (
-            jsonify(
-                {
-                    "error": "スクリプトの実行に失敗しました",
-                    "stdout": exc.stdout,
-                    "stderr": exc.stderr,
-                }
-            ),
-            500,
-        )
+        job.returncode = exc.returncode
+        job.stdout = exc.stdout or ""
+        job.stderr = exc.stderr or ""
+        job.error = "スクリプトの実行に失敗しました"
+        raise
+    except (subprocess.TimeoutExpired, WorkerTimeout):
+        job.error = f"スクリプトがタイムアウトしました ({RUN_TIMEOUT:.0f} 秒)"
+        raise
+
+    job.returncode = result.returncode
+    job.stdout = result.stdout
+    job.stderr = result.stderr
+    pdf_path, tex_path = parse_output_paths(result.stdout)
+    # OUTPUT:: 行が無ければ 索引（最新） → 想定パス（実在するもの） → 想定パス の順
+    if job.app is not None:
+        with job.app.app_context():
+            conn = borrow_db()
+            try:
+                if not pdf_path and not tex_path:
+                    pdf_path, tex_path = guess_latest_paths(conn)
+                if not pdf_path and not tex_path:
+                    pdf_path, tex_path = existing_expected_paths()
+                manifest.record(conn, pdf_path, tex_path, config_key=job.key)
+            finally:
+                return_db(conn)
+    if not pdf_path and not tex_path:
+        pdf_path, tex_path = existing_expected_paths()
+    if not pdf_path and not tex_path:
+        pdf_path, tex_path = compute_expected_paths()
+    job.pdf_path = pdf_path
+    job.tex_path = tex_path
+    artifacts.put(job.key, pdf_path, tex_path)
+
+# 同じ出力ディレクトリに書くので既定では 1 件ずつ実行する
+jobs = CalcJobQueue(
+    build_worksheet,
+    max_workers=int(os.environ.get("CALC_RUN_CONCURRENCY", 1)),
+    retention_seconds=int(os.environ.get("CALC_RUN_RETENTION_SECONDS", 3600)),
+)
+
+@bp.post("/calc-run")
+def run_calc_script():
+    if not SCRIPT_PATH.exists():
+        return jsonify({"error": "create_worksheet.py が見つかりません"}), 404
+
+    payload = request.get_json(silent=True) or {}
+    force = bool(payload.get("force") or request.args.get("force"))
+    key = config_key()
+
+    if not force:
+        cached = artifacts.lookup(key)
+        if cached:
+            return jsonify({
+                "id": None,
+                "state": "completed",
+                "cached": True,
+                "stdout": "",
+                **cached,
+            })
+
+    job, coalesced = jobs.submit(key, current_app._get_current_object())
+    return jsonify({**job.to_dict(), "cached": False, "coalesced": coalesced}), 202
 
-    return jsonify(
-        {
-            "status": "completed",
-            "stdout": result.stdout,
-            "pdf_path": pdf_path,
-            "tex_path": tex_path,
-        }
-    )
+@bp.get("/calc-run/<job_id>")
+def get_calc_run(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    return jsonify(job.to_dict())
+
+@bp.get("/calc-artifacts")
+def list_calc_artifacts():
+    """生成済みプリントの一覧（新しい順）。?cursor= に前回の next_cursor を渡して次のページ。"""
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit は整数で指定してください"}), 400
+    try:
+        items, next_cursor = manifest.list_artifacts(get_db(), limit, request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error": "cursor が不正です"}), 400
+    return jsonify({"items": items, "next_cursor": next_cursor})
+
+@bp.get("/calc-artifacts/latest")
+def latest_calc_artifact():
+    row = manifest.latest(get_db())
+    if row is None:
+        return jsonify({"error": "生成済みのプリントがありません"}), 404
+    return jsonify(row)
+
+@bp.cli.command('reconcile-artifacts')
+def reconcile_artifacts_command():
+    """出力ディレクトリを走査して calc_artifacts を作り直す。"""
+    conn = borrow_db()
+    try:
+        result = manifest.reconcile(conn, [output_directory()])
+    finally:
+        return_db(conn)
+    click.echo(f"calc_artifacts: +{result['added']} ~{result['updated']} -{result['removed']} (total {result['total']})")
 
 @bp.route("/calc-config", methods=["OPTIONS"])
 def calc_config_options():
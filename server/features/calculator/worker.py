@@ -0,0 +1,230 @@
+"""常駐ワーカープロセスでのプリント生成。
+
+毎回 sys.executable を起動する代わりに、生成スクリプトの依存モジュールを
+読み込み済みのワーカープロセスへパイプで依頼する。スクリプト本体は
+__main__ として runpy で実行し、標準出力をそのまま返すので OUTPUT:: 行の
+解析は従来どおり呼び出し側で行える。
+"""
+import ast
+import contextlib
+import importlib
+import io
+import multiprocessing
+import os
+import runpy
+import sys
+import threading
+import time
+import traceback
+
+
+class WorkerUnavailable(Exception):
+    """ワーカーが使えない（起動失敗・異常終了）。呼び出し側はサブプロセスにフォールバックする。"""
+
+
+class WorkerTimeout(Exception):
+    pass
+
+
+class ScriptResult:
+    def __init__(self, returncode, stdout, stderr):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+def _preload_imports(script_path):
+    # スクリプトを実行せずに、トップレベルの import だけを先に済ませておく
+    try:
+        tree = ast.parse(open(script_path, encoding="utf-8").read(), filename=script_path)
+    except (OSError, SyntaxError):
+        return
+    for node in tree.body:
+        names = []
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = [node.module]
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+
+
+def _worker_main(conn, script_path, cwd):
+    os.chdir(cwd)
+    sys.path.insert(0, os.path.dirname(script_path))
+    _preload_imports(script_path)
+    conn.send("ready")
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        stdout, stderr = io.StringIO(), io.StringIO()
+        returncode = 0
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                runpy.run_path(script_path, run_name="__main__")
+            except SystemExit as exc:
+                if isinstance(exc.code, int):
+                    returncode = exc.code
+                elif exc.code is not None:
+                    print(exc.code, file=sys.stderr)
+                    returncode = 1
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+        conn.send((returncode, stdout.getvalue(), stderr.getvalue()))
+
+
+class _Worker:
+    def __init__(self, ctx, script_path, cwd, start_timeout):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, script_path, cwd), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise WorkerUnavailable("worker did not become ready")
+        try:
+            self.conn.recv()
+        except EOFError:
+            self.kill()
+            raise WorkerUnavailable("worker exited during startup")
+
+    def run(self, timeout):
+        try:
+            self.conn.send("run")
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise WorkerTimeout(f"生成が {timeout} 秒以内に終わりませんでした")
+            returncode, stdout, stderr = self.conn.recv()
+        except (EOFError, BrokenPipeError, OSError) as exc:
+            self.kill()
+            raise WorkerUnavailable(f"worker crashed: {exc}")
+        self.jobs += 1
+        return ScriptResult(returncode, stdout, stderr)
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class WorkerPool:
+    """size 個の常駐ワーカー。max_jobs 件こなしたワーカーや落ちたワーカーは作り直す。
+
+    空きが無い時は、ワーカーが返されるか（落ちた・入れ替えたワーカーの分の）
+    起動枠が空くまで Condition で待つ。待ち時間も依頼の timeout に含める。
+    """
+
+    def __init__(self, script_path, cwd, size=1, max_jobs=50, start_timeout=60):
+        self.script_path = str(script_path)
+        self.cwd = str(cwd)
+        self.size = size
+        self.max_jobs = max_jobs
+        self.start_timeout = start_timeout
+        # fork だとリクエスト処理中のスレッドやロックまで複製されるので spawn で起動する
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = []  # 最後に返したものから使う（LIFO）
+        self._cond = threading.Condition()
+        self._started = 0
+        self.recycled = 0
+        self.crashes = 0
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkerTimeout(f"空きワーカーを {timeout} 秒待っても得られませんでした")
+                self._cond.wait(remaining)
+        try:
+            return _Worker(self._ctx, self.script_path, self.cwd, self.start_timeout)
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _discard(self, worker):
+        # 起動枠を空けて、待っている依頼に新しいワーカーを起動させる
+        with self._cond:
+            self._started -= 1
+            self._cond.notify()
+        if worker.alive:
+            worker.stop()
+
+    def run(self, timeout):
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(timeout)
+        try:
+            result = worker.run(max(deadline - time.monotonic(), 0.001))
+        except (WorkerUnavailable, WorkerTimeout):
+            self.crashes += 1
+            self._discard(worker)
+            raise
+        if worker.jobs >= self.max_jobs or not worker.alive:
+            self.recycled += 1
+            self._discard(worker)
+        else:
+            self._release(worker)
+        return result
+
+    def warm_up(self):
+        """起動直後にワーカーを先に立ち上げておく（初回の依頼で待たせない）。"""
+        workers = []
+        try:
+            for _ in range(self.size):
+                workers.append(self._acquire(self.start_timeout))
+        except Exception:
+            pass
+        for worker in workers:
+            self._release(worker)
+
+    def shutdown(self):
+        with self._cond:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            self._discard(worker)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "started": self._started,
+                "idle": len(self._idle),
+                "recycled": self.recycled,
+                "crashes": self.crashes,
+            }
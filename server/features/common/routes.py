@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, current_app, request, jsonify, send_from_directory
 from pathlib import Path
+import os
 import subprocess
+import json
+import marshal
+from server import assets, metrics, migrations, profiling
+from server.extensions import borrow_db, get_pool, return_db
 
 bp = Blueprint('common', __name__)
 
@@ -10,6 +15,10 @@ OPEN_CMD = ["open"]  # macOS Finder 用
 
 @bp.route("/")
 def serve_index():
+    # パイプラインが有効ならハッシュ付きの参照に書き換えた index.html を返す
+    response = assets.serve_index()
+    if response is not None:
+        return response
     return send_from_directory(FRONTEND_DIR, "index.html")
 
 @bp.post("/api/open-path")
@@ -28,3 +37,108 @@ def open_path():
         return jsonify({"error": f"open コマンドの実行に失敗しました: {exc}"}), 500
     except Exception as exc:
         return jsonify({"error": f"処理に失敗しました: {exc}"}), 400
+
+@bp.get("/api/assets")
+def asset_stats():
+    pipeline = assets.get_pipeline()
+    if pipeline is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **pipeline.stats()})
+
+@bp.get("/api/ready")
+def readiness():
+    """このワーカーがリクエストを受けられるか（DB に届き、スキーマが最新か）。"""
+    latest = migrations.MIGRATIONS[-1][0]
+    try:
+        conn = borrow_db()
+        try:
+            version = migrations.current_version(conn)
+        finally:
+            return_db(conn)
+    except Exception as exc:
+        return jsonify({"status": "unavailable", "error": str(exc), "pid": os.getpid()}), 503
+    if version < latest:
+        return jsonify({"status": "migrating", "schema_version": version, "pid": os.getpid()}), 503
+    return jsonify({"status": "ready", "schema_version": version, "pid": os.getpid()})
+
+@bp.get("/api/metrics")
+def export_metrics():
+    """Prometheus のテキスト形式。値はこのワーカープロセスの分。"""
+    if not metrics.enabled(current_app):
+        return jsonify({"error": "metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+def _profiling_disabled():
+    return jsonify({"error": "profiling is disabled (PROFILING_ENABLED=1)"}), 404
+
+def _find_profile(profile_id):
+    profile = profiling.get_store().get(profile_id)
+    if profile is None:
+        return None, (jsonify({"error": "プロファイルが見つかりません"}), 404)
+    return profile, None
+
+@bp.get("/api/debug/profiles")
+def list_profiles():
+    """遅いリクエストのプロファイル一覧（新しい順）。"""
+    if not profiling.enabled(current_app):
+        return _profiling_disabled()
+    return jsonify(profiling.get_store().list())
+
+@bp.delete("/api/debug/profiles")
+def clear_profiles():
+    if not profiling.enabled(current_app):
+        return _profiling_disabled()
+    profiling.get_store().clear()
+    return jsonify({"status": "cleared"})
+
+@bp.get("/api/debug/profiles/<profile_id>")
+def profile_detail(profile_id):
+    """SQL と EXPLAIN QUERY PLAN、累積時間の大きい関数を含む詳細。"""
+    if not profiling.enabled(current_app):
+        return _profiling_disabled()
+    profile, error = _find_profile(profile_id)
+    if error:
+        return error
+    conn = borrow_db()
+    try:
+        return jsonify(profiling.detail(profile, conn))
+    finally:
+        return_db(conn)
+
+@bp.get("/api/debug/profiles/<profile_id>/pstats")
+def download_pstats(profile_id):
+    """python -m pstats や snakeviz で開けるファイル。"""
+    if not profiling.enabled(current_app):
+        return _profiling_disabled()
+    profile, error = _find_profile(profile_id)
+    if error:
+        return error
+    if not profile["stats"]:
+        return jsonify({"error": "サンプルがありません（リクエストがサンプル間隔より短い）"}), 404
+    return Response(
+        marshal.dumps(profile["stats"]),
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+@bp.get("/api/debug/profiles/<profile_id>/speedscope")
+def download_speedscope(profile_id):
+    """https://www.speedscope.app で開けるファイル（PROFILE_MODE=sample の時のみ）。"""
+    if not profiling.enabled(current_app):
+        return _profiling_disabled()
+    profile, error = _find_profile(profile_id)
+    if error:
+        return error
+    if profile["samples"] is None:
+        return jsonify({"error": "speedscope 形式は sample モードのプロファイルのみです"}), 404
+    summary = profile["summary"]
+    document = profiling.samples_to_speedscope(profile["samples"], f"{summary['method']} {summary['path']}")
+    return Response(
+        json.dumps(document),
+        mimetype="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
+
+@bp.get("/api/db/pool")
+def db_pool_stats():
+    return jsonify(get_pool().stats())
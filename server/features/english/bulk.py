@@ -0,0 +1,168 @@
+"""単語リストの一括インポート。
+
+未キャッシュの語を BATCH_SIZE 語ずつ 1 プロンプトにまとめ、共有の有限スレッド
+プールで並行に生成する。失敗した語だけを指数バックオフで再試行し、最後に
+executemany の 1 トランザクションで words へ登録する。進捗はジョブ id で参照する。
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import models, services
+from .cache import normalize_word
+
+BATCH_SIZE = int(os.environ.get("BULK_IMPORT_BATCH_SIZE", 20))
+MAX_WORKERS = int(os.environ.get("BULK_IMPORT_WORKERS", 4))
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 1.0
+MAX_WORDS = 2000
+MAX_RETAINED_JOBS = 50
+MAX_REPORTED_ERRORS = 100
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="word-import")
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+class ImportJob:
+    def __init__(self, words, memo=""):
+        self.id = uuid.uuid4().hex
+        self.words = words
+        self.memo = memo
+        self.status = "queued"
+        self.total = len(words)
+        self.cached = 0
+        self.generated = 0
+        self.skipped = 0
+        self.inserted = 0
+        self.errors = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        with self._lock:
+            failed = len(self.errors)
+            return {
+                "id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "processed": self.cached + self.generated + self.skipped + failed,
+                "cached": self.cached,
+                "generated": self.generated,
+                "skipped": self.skipped,
+                "failed": failed,
+                "inserted": self.inserted,
+                "errors": [
+                    {"word": word, "error": error}
+                    for word, error in list(self.errors.items())[:MAX_REPORTED_ERRORS]
+                ],
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+def clean_word_list(words):
+    """空行・重複（正規化後）を除き、入力順を保つ。"""
+    seen = set()
+    cleaned = []
+    for word in words:
+        if not isinstance(word, str):
+            continue
+        word = word.strip()
+        key = normalize_word(word)
+        if key and key not in seen:
+            seen.add(key)
+            cleaned.append(word)
+    return cleaned
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def start_import(app, words, memo="", skip_existing=True):
+    """バックグラウンドでインポートを開始し、ジョブを返す。"""
+    job = ImportJob(clean_word_list(words)[:MAX_WORDS], memo)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_RETAINED_JOBS:
+            _jobs.popitem(last=False)
+    # 取りまとめ役はプールの外で動かし、バッチ待ちでワーカーを塞がないようにする
+    threading.Thread(
+        target=run_import, args=(app, job, skip_existing), name=f"word-import-{job.id[:8]}", daemon=True
+    ).start()
+    return job
+
+
+def run_import(app, job, skip_existing=True):
+    """ジョブを最後まで実行する（CLI からは同期的に呼ぶ）。"""
+    job.status = "running"
+    try:
+        results = {}
+        pending = []
+        with app.app_context():
+            existing = models.get_existing_words() if skip_existing else set()
+            for word in job.words:
+                if normalize_word(word) in existing:
+                    with job._lock:
+                        job.skipped += 1
+                    continue
+                cached = services.cached_word_info(word)
+                if cached is not None:
+                    results[word] = cached
+                    with job._lock:
+                        job.cached += 1
+                else:
+                    pending.append(word)
+
+        batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        futures = [_executor.submit(_run_batch, app, batch) for batch in batches]
+        for future in as_completed(futures):
+            found, errors = future.result()
+            results.update(found)
+            with job._lock:
+                job.generated += len(found)
+                job.errors.update(errors)
+
+        rows = []
+        for word in job.words:
+            info = results.get(word)
+            if info:
+                rows.append({**info, "memo": job.memo})
+        with app.app_context():
+            inserted = models.add_words(rows) if rows else 0
+        with job._lock:
+            job.inserted = inserted
+            job.status = "completed"
+    except Exception as exc:
+        with job._lock:
+            job.status = "failed"
+            job.errors["*"] = str(exc)
+    finally:
+        job.finished_at = time.time()
+    return job
+
+
+def _run_batch(app, batch):
+    remaining = list(batch)
+    found = {}
+    errors = {}
+    with app.app_context():
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                got, failed = services.generate_words_info_batch(remaining)
+            except Exception as exc:
+                got, failed = {}, {word: str(exc) for word in remaining}
+            found.update(got)
+            errors = failed
+            remaining = [word for word in remaining if word in failed]
+            if not remaining:
+                break
+            if attempt < MAX_ATTEMPTS - 1:
+                time.sleep(BACKOFF_SECONDS * (2 ** attempt))
+    return found, {word: errors[word] for word in remaining}
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from server.extensions import get_db
+
+DEFAULT_TTL_DAYS = 90
+DEFAULT_MAX_ENTRIES = 20000
+# 前段のヒットで更新する accessed_at は、この件数か秒数が溜まったらまとめて書く
+TOUCH_BATCH = 64
+TOUCH_INTERVAL = 30.0
+
+
+def normalize_word(word):
+    return " ".join(word.strip().lower().split())
+
+
+class WordLookupCache:
+    """単語情報（LLM の生成結果）の 2 段キャッシュ。
+
+    前段はプロセス内の LRU、後段は SQLite の word_lookup_cache テーブル。
+    キーは正規化した単語 + モデル名 + プロンプト版で、プロンプトやモデルを
+    変えれば自然に別キーになる。期限切れは読み込み時に捨て、件数が
+    max_entries を超えたら最終参照の古い順に削除する。前段でのヒットも
+    最終参照として後段の accessed_at にまとめて反映するので、よく引く語ほど残る。
+    """
+
+    def __init__(self, ttl_seconds, max_entries, memory_entries=256,
+                 touch_batch=TOUCH_BATCH, touch_interval=TOUCH_INTERVAL):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._touched_since = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(word, model_name, prompt_version):
+        return f"{prompt_version}:{model_name}:{normalize_word(word)}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self._touched[key] = now
+                if self._touched_since is None:
+                    self._touched_since = now
+                due = (len(self._touched) >= self.touch_batch
+                       or now - self._touched_since >= self.touch_interval)
+                data = dict(entry[1])
+            else:
+                due = False
+                data = None
+                if entry:
+                    del self._memory[key]
+        if data is not None:
+            if due:
+                self.flush_touches()
+            return data
+
+        db = get_db()
+        row = db.execute(
+            "SELECT payload, created_at FROM word_lookup_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row['created_at'] >= self.ttl_seconds:
+            if row is not None:
+                db.execute("DELETE FROM word_lookup_cache WHERE cache_key = ?", (key,))
+                db.commit()
+            with self._lock:
+                self.misses += 1
+            return None
+
+        db.execute("UPDATE word_lookup_cache SET accessed_at = ? WHERE cache_key = ?", (now, key))
+        db.commit()
+        data = json.loads(row['payload'])
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, row['created_at'], data)
+        return dict(data)
+
+    def flush_touches(self, db=None):
+        """前段でのヒットを後段の accessed_at に書き込む（コミットまで行う）。"""
+        with self._lock:
+            touched = self._touched
+            self._touched = {}
+            self._touched_since = None
+        if not touched:
+            return
+        db = db or get_db()
+        db.executemany(
+            "UPDATE word_lookup_cache SET accessed_at = MAX(accessed_at, ?) WHERE cache_key = ?",
+            [(at, key) for key, at in touched.items()]
+        )
+        db.commit()
+
+    def put(self, key, word, model_name, prompt_version, data):
+        now = time.time()
+        db = get_db()
+        # 削除する古い順に前段のヒットを反映しておく
+        self.flush_touches(db)
+        db.execute(
+            """
+            INSERT OR REPLACE INTO word_lookup_cache
+                (cache_key, word, model, prompt_version, payload, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (key, normalize_word(word), model_name, prompt_version,
+             json.dumps(data, ensure_ascii=False), now, now)
+        )
+        cursor = db.execute(
+            """
+            DELETE FROM word_lookup_cache WHERE cache_key IN (
+                SELECT cache_key FROM word_lookup_cache
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+        db.commit()
+        with self._lock:
+            self.evictions += max(cursor.rowcount, 0)
+            self._remember(key, now, data)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._touched_since = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'hit_ratio': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key, created_at, data):
+        self._memory[key] = (created_at, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+def get_lookup_cache():
+    """アプリごとのキャッシュ。前段の LRU をアプリ（＝DB）をまたいで共有しないよう app.extensions に置く。"""
+    return current_app.extensions["word_lookup_cache"]
+
+
+def init_app(app):
+    env = os.environ.get
+    app.config.setdefault("WORD_CACHE_TTL_DAYS", float(env("WORD_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS)))
+    app.config.setdefault("WORD_CACHE_MAX_ENTRIES", int(env("WORD_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+    app.extensions["word_lookup_cache"] = WordLookupCache(
+        ttl_seconds=app.config["WORD_CACHE_TTL_DAYS"] * 86400,
+        max_entries=app.config["WORD_CACHE_MAX_ENTRIES"],
+    )
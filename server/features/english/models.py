@@ -1,24 +1,9 @@
+from flask import current_app
 from server.extensions import get_db
+from .cache import normalize_word
+import base64
 import datetime
-
-def init_db():
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS words (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            word TEXT NOT NULL,
-            meaning TEXT NOT NULL,
-            example_en TEXT,
-            example_jp TEXT,
-            pronunciation TEXT,
-            status TEXT DEFAULT 'new', -- new / learning / mastered を表す
-            next_review_date DATE,
-            level INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    db.commit()
+import json
 
 def add_word(data):
     db = get_db()
@@ -47,16 +32,112 @@ def add_word(data):
     db.commit()
     return word_id
 
-def get_words(status=None):
+def add_words(items):
+    """複数語を 1 トランザクションでまとめて登録する。戻り値は登録件数。"""
     db = get_db()
-    cursor = db.cursor()
     
+    now = datetime.datetime.now()
+    today = now.date()
+    
+    rows = [(
+        data['word'],
+        data['meaning'],
+        data.get('example_en'),
+        data.get('example_jp'),
+        data.get('pronunciation'),
+        'new',
+        today,
+        0,
+        now,
+        data.get('memo', '')
+    ) for data in items]
+    
+    with db:
+        db.executemany('''
+            INSERT INTO words (word, meaning, example_en, example_jp, pronunciation, status, next_review_date, level, created_at, memo, is_favorite)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+        ''', rows)
+    return len(rows)
+
+def get_existing_words():
+    db = get_db()
+    return {normalize_word(row[0]) for row in db.execute('SELECT word FROM words')}
+
+def _word_filters(status=None, favorite=None, level=None):
+    clauses, args = [], []
     if status:
-        cursor.execute('SELECT * FROM words WHERE status = ? ORDER BY created_at DESC', (status,))
+        clauses.append('status = ?')
+        args.append(status)
+    if favorite is not None:
+        clauses.append('is_favorite = ?')
+        args.append(1 if favorite else 0)
+    if level is not None:
+        clauses.append('level = ?')
+        args.append(int(level))
+    return clauses, args
+
+def get_words(status=None, favorite=None, level=None):
+    clauses, args = _word_filters(status, favorite, level)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return get_db().execute(f'SELECT * FROM words {where} ORDER BY created_at DESC, id DESC', args).fetchall()
+
+# 一覧 API で返せる列。fields を省略したときは全部返す
+WORD_FIELDS = (
+    'id', 'word', 'meaning', 'example_en', 'example_jp', 'pronunciation',
+    'status', 'next_review_date', 'level', 'created_at', 'memo', 'is_favorite',
+)
+MAX_LIST_LIMIT = 500
+
+def _encode_cursor(row):
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        created_at, word_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(created_at), int(word_id)
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
+
+def list_words(status=None, favorite=None, level=None, fields=None, cursor=None, limit=100):
+    """新しい順の 1 ページ分と次ページのカーソルを返す。
+
+    (created_at, id) のキーセットで続きから読むので、深いページでも OFFSET のように
+    読み飛ばしが発生しない。fields で返す列を絞れる（id / created_at は常に含む）。
+    """
+    if fields:
+        unknown = set(fields) - set(WORD_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+        columns = [name for name in WORD_FIELDS if name in fields or name in ('id', 'created_at')]
     else:
-        cursor.execute('SELECT * FROM words ORDER BY created_at DESC')
-        
-    return [dict(row) for row in cursor.fetchall()]
+        columns = list(WORD_FIELDS)
+    limit = max(1, min(int(limit), MAX_LIST_LIMIT))
+
+    clauses, args = _word_filters(status, favorite, level)
+    if cursor:
+        clauses.append('(created_at, id) < (?, ?)')
+        args.extend(_decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    rows = get_db().execute(f'''
+        SELECT {', '.join(columns)} FROM words {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', (*args, limit + 1)).fetchall()
+
+    items = rows[:limit]
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return items, next_cursor
+
+def count_words(status=None, favorite=None, level=None):
+    clauses, args = _word_filters(status, favorite, level)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return get_db().execute(f'SELECT COUNT(*) FROM words {where}', args).fetchone()[0]
+
+def get_word(word_id):
+    row = get_db().execute('SELECT * FROM words WHERE id = ?', (word_id,)).fetchone()
+    return dict(row) if row else None
 
 def get_review_words(limit=10):
     db = get_db()
@@ -73,49 +154,83 @@ def get_review_words(limit=10):
     
     return [dict(row) for row in cursor.fetchall()]
 
-def update_word_status(word_id, result):
-    db = get_db()
-    cursor = db.cursor()
-    
-    cursor.execute('SELECT * FROM words WHERE id = ?', (word_id,))
-    row = cursor.fetchone()
-    if not row:
-        return None
-        
-    current_level = row['level']
-    
-    next_level = current_level
-    days_to_add = 1
-    
+REVIEW_RESULTS = ('ok', 'ambiguous', 'ng')
+
+# 正解で上がったレベルごとの次回までの日数（5 以上は 30 日）
+REVIEW_INTERVALS = {1: 1, 2: 3, 3: 7, 4: 14}
+
+def next_review(current_level, result, today):
+    """回答結果から (新レベル, 新ステータス, 次回復習日) を計算する。"""
     if result == 'ok':
-        next_level += 1
-        if next_level == 1: days_to_add = 1
-        elif next_level == 2: days_to_add = 3
-        elif next_level == 3: days_to_add = 7
-        elif next_level == 4: days_to_add = 14
-        else: days_to_add = 30
+        next_level = current_level + 1
+        days_to_add = REVIEW_INTERVALS.get(next_level, 30)
         new_status = 'learning' if next_level < 5 else 'mastered'
-        
     elif result == 'ambiguous':
         next_level = max(0, current_level - 1)
         days_to_add = 1
         new_status = 'learning'
-        
     else: # ng
         next_level = 0
         days_to_add = 0
         new_status = 'learning'
-    
-    next_date = datetime.date.today() + datetime.timedelta(days=days_to_add)
-    
-    cursor.execute('''
-        UPDATE words 
-        SET status = ?, next_review_date = ?, level = ? 
-        WHERE id = ?
-    ''', (new_status, next_date, next_level, word_id))
-    
-    db.commit()
-    return True
+    return next_level, new_status, today + datetime.timedelta(days=days_to_add)
+
+def update_word_status(word_id, result):
+    try:
+        applied = apply_reviews([{'id': int(word_id), 'result': result}])
+    except (TypeError, ValueError):
+        return None
+    return True if applied['updated'] else None
+
+def apply_reviews(reviews, session_id=None):
+    """テスト 1 回分の回答をまとめて反映する。
+
+    reviews は [{'id', 'result'}, ...]（回答順）。現在のレベルを 1 回の SELECT で読み、
+    同じ語が複数回あっても順に積み上げて計算し、UPDATE と回答ログの INSERT を
+    executemany で 1 トランザクションにまとめる。戻り値は {'updated', 'missing'}。
+    """
+    db = get_db()
+    ids = sorted({int(item['id']) for item in reviews})
+    if not ids:
+        return {'updated': 0, 'missing': []}
+
+    placeholders = ','.join('?' * len(ids))
+    levels = {
+        row['id']: row['level']
+        for row in db.execute(f'SELECT id, level FROM words WHERE id IN ({placeholders})', ids)
+    }
+
+    now = datetime.datetime.now()
+    today = now.date()
+    updates = {}
+    log_rows = []
+    missing = []
+    for item in reviews:
+        word_id = int(item['id'])
+        if word_id not in levels:
+            missing.append(word_id)
+            continue
+        prev_level = levels[word_id]
+        next_level, new_status, next_date = next_review(prev_level, item['result'], today)
+        levels[word_id] = next_level
+        updates[word_id] = (new_status, next_date, next_level, word_id)
+        log_rows.append((word_id, item['result'], prev_level, next_level, next_date, session_id, now))
+
+    with db:
+        db.executemany('''
+            UPDATE words 
+            SET status = ?, next_review_date = ?, level = ? 
+            WHERE id = ?
+        ''', list(updates.values()))
+        db.executemany('''
+            INSERT INTO word_reviews (word_id, result, prev_level, new_level, next_review_date, session_id, reviewed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', log_rows)
+        if current_app.config.get('WORD_SCHEDULER', 'ladder') != 'ladder':
+            # SM-2 / FSRS は回答履歴全体から間隔を決めるので、答えた語をログから計算し直す
+            from . import scheduler
+            scheduler.reschedule(db, scheduler.configured_scheduler(current_app.config), word_ids=ids, commit=False)
+    return {'updated': len(log_rows), 'missing': sorted(set(missing))}
 
 def update_word(word_id, data):
     db = get_db()
@@ -1,13 +1,19 @@
-from flask import Blueprint, request, jsonify
-from . import models, services
+import click
+import os
+from flask import Blueprint, current_app, request, jsonify
+from . import bulk, cache, models, search, services
 
 bp = Blueprint('english', __name__, url_prefix='/api/english')
 
-@bp.before_app_request
-def init_db_once():
-    # Simple check to ensure table exists
-    # In production, use migrations
-    models.init_db()
+@bp.record_once
+def _init_app(state):
+    app = state.app
+    # 復習間隔のスケジューラ（ladder / sm2 / fsrs）とそのパラメータ（JSON）。create_app(config) で上書きできる
+    app.config.setdefault("WORD_SCHEDULER", os.environ.get("WORD_SCHEDULER", "ladder"))
+    app.config.setdefault("WORD_SCHEDULER_PARAMS", os.environ.get("WORD_SCHEDULER_PARAMS", ""))
+    cache.init_app(app)
+
+MAX_REVIEW_BATCH = 500
 
 @bp.post("/register")
 def register_word():
@@ -36,11 +42,75 @@ def register_word():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@bp.post("/import")
+def import_words():
+    try:
+        payload = request.get_json(force=True)
+        words = payload.get("words")
+        if words is None and payload.get("text"):
+            words = payload["text"].splitlines()
+        if not words:
+            return jsonify({"error": "words is required"}), 400
+        
+        job = bulk.start_import(
+            current_app._get_current_object(),
+            words,
+            memo=payload.get("memo", ""),
+            skip_existing=payload.get("skip_existing", True),
+        )
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.get("/import/<job_id>")
+def import_status(job_id):
+    job = bulk.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+def _list_filters():
+    favorite = request.args.get("favorite")
+    return {
+        "status": request.args.get("status") or None,
+        "favorite": None if favorite is None else favorite.lower() in ("1", "true", "yes"),
+        "level": request.args.get("level", type=int),
+    }
+
 @bp.get("/list")
 def list_words():
-    status = request.args.get("status")
-    words = models.get_words(status)
-    return jsonify(words)
+    """単語一覧。limit / cursor を付けるとキーセットページングで {items, next_cursor} を返す。
+
+    fields=word,meaning,... で返す列を絞れる。どれも無ければ従来どおり全件の配列。
+    """
+    filters = _list_filters()
+    fields = [name for name in request.args.get("fields", "").split(",") if name] or None
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor")
+    if limit is None and cursor is None and fields is None:
+        return jsonify(models.get_words(**filters))
+    try:
+        items, next_cursor = models.list_words(fields=fields, cursor=cursor, limit=limit or 100, **filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": items, "next_cursor": next_cursor})
+
+@bp.get("/list/count")
+def count_words():
+    return jsonify({"count": models.count_words(**_list_filters())})
+
+@bp.get("/search")
+def search_words():
+    """全文検索。q（空白区切りで AND）に一致する語を関連度順に返す。"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    items, next_offset = search.search_words(
+        query,
+        limit=request.args.get("limit", 20, type=int),
+        offset=request.args.get("offset", 0, type=int),
+    )
+    return jsonify({"items": items, "next_offset": next_offset})
 
 @bp.get("/test")
 def get_test_words():
@@ -66,6 +136,33 @@ def review_word():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@bp.post("/review/batch")
+def review_words_batch():
+    """テスト 1 回分（または数件ずつ）の回答をまとめて反映する。"""
+    payload = request.get_json(silent=True) or {}
+    results = payload.get("results")
+    if not isinstance(results, list) or not results:
+        return jsonify({"error": "results is required"}), 400
+    if len(results) > MAX_REVIEW_BATCH:
+        return jsonify({"error": f"results は {MAX_REVIEW_BATCH} 件までです"}), 400
+
+    for item in results:
+        if not isinstance(item, dict) or not isinstance(item.get("id"), int) or item.get("result") not in models.REVIEW_RESULTS:
+            return jsonify({"error": "each result needs an integer id and result (ok / ambiguous / ng)"}), 400
+
+    try:
+        applied = models.apply_reviews(results, session_id=payload.get("session_id"))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"status": "updated", **applied})
+
+@bp.get("/word/<int:word_id>")
+def get_word(word_id):
+    word = models.get_word(word_id)
+    if word is None:
+        return jsonify({"error": "Word not found"}), 404
+    return jsonify(word)
+
 @bp.put("/word/<int:word_id>")
 def update_word(word_id):
     try:
@@ -92,3 +189,70 @@ def toggle_favorite(word_id):
         return jsonify({"status": "updated", "is_favorite": new_status})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@bp.get("/cache/stats")
+def lookup_cache_stats():
+    return jsonify(cache.get_lookup_cache().stats())
+
+@bp.cli.command("import-words")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--memo", default="", help="登録する単語に付けるメモ")
+@click.option("--no-skip-existing", is_flag=True, help="登録済みの単語も追加する")
+def import_words_command(path, memo, no_skip_existing):
+    """1 行 1 語のファイルから単語を一括登録する。"""
+    with open(path, encoding="utf-8") as f:
+        words = f.read().splitlines()
+    job = bulk.ImportJob(bulk.clean_word_list(words)[:bulk.MAX_WORDS], memo)
+    bulk.run_import(current_app._get_current_object(), job, skip_existing=not no_skip_existing)
+    result = job.to_dict()
+    click.echo(
+        f"{result['status']}: inserted {result['inserted']} / {result['total']} "
+        f"(cached {result['cached']}, generated {result['generated']}, "
+        f"skipped {result['skipped']}, failed {result['failed']})"
+    )
+    for error in result["errors"]:
+        click.echo(f"  {error['word']}: {error['error']}", err=True)
+
+@bp.cli.command("reschedule")
+@click.option("--scheduler", "name", default=None, help="ladder / sm2 / fsrs（既定は WORD_SCHEDULER）")
+@click.option("--params", default=None, help='スケジューラのパラメータ（JSON）例: {"retention": 0.85}')
+@click.option("--dry-run", is_flag=True, help="計算だけして words には書き込まない")
+def reschedule_command(name, params, dry_run):
+    """回答ログから全単語の復習日を計算し直す。"""
+    from . import scheduler
+    from server.extensions import borrow_db, return_db
+
+    if name is None and params is None:
+        chosen = scheduler.configured_scheduler(current_app.config)
+    else:
+        chosen = scheduler.get_scheduler(name or "ladder", params)
+    conn = borrow_db()
+    try:
+        result = scheduler.reschedule(conn, chosen, dry_run=dry_run)
+    finally:
+        return_db(conn)
+    click.echo(
+        f"{result['scheduler']}: {result['words']} words / {result['reviews']} reviews "
+        f"(load {result['load_seconds']}s, replay {result['replay_seconds']}s, write {result['write_seconds']}s)"
+        + (" [dry run]" if dry_run else "")
+    )
+
+@bp.cli.command("reindex")
+def reindex_command():
+    """全文検索の索引（words_fts）を words から作り直す。"""
+    from server.extensions import borrow_db, return_db
+
+    conn = borrow_db()
+    try:
+        with conn:
+            if search.fts_available(conn):
+                search.rebuild(conn)
+                created = False
+            else:
+                created = search.create_fts(conn)
+                if not created:
+                    raise click.ClickException("this SQLite build has no FTS5 trigram tokenizer")
+        count = conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+    finally:
+        return_db(conn)
+    click.echo(f"{'created' if created else 'rebuilt'} words_fts for {count} words")
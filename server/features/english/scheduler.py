@@ -0,0 +1,296 @@
+"""回答ログ（word_reviews）から復習日を計算し直すスケジューラ。
+
+固定ラダー（従来の 1/3/7/14/30 日）・SM-2・FSRS を切り替えられる。各語の回答を
+古い順に再生して次回の復習日を決めるが、語ごとのループではなく「k 回目の回答」
+ごとに全語分をまとめて NumPy で処理するので、ループ回数は 1 語あたりの最大回答数で
+済む。結果は executemany でまとめて words に書き戻す。
+
+level / status（画面の Level 表示と mastered 判定）はどのスケジューラでも従来の
+ラダーの規則で数え、スケジューラが決めるのは次回までの間隔だけ。
+ログより前の履歴は持っていないので、各語の最初のログの prev_level を初期状態とする。
+"""
+import json
+import math
+import time
+
+import numpy as np
+
+# models.REVIEW_INTERVALS と同じ。正解で上がったレベルごとの日数（5 以上は 30 日）
+LADDER_DAYS = np.array([0, 1, 3, 7, 14, 30], dtype=np.float64)
+MASTERED_LEVEL = 5
+
+# julianday -> 1970-01-01 からの日数
+_UNIX_EPOCH_JD = 2440587.5
+
+
+class Scheduler:
+    """スケジューラの基底。状態は語ごとの配列の dict で持つ。"""
+
+    name = ""
+    defaults = {}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"unknown parameters for {self.name}: {', '.join(sorted(unknown))}")
+        self.params = {**self.defaults, **params}
+
+    def init_state(self, level):
+        """ログの最初の回答より前の状態を、その時点の level（配列）から作る。"""
+        return {}
+
+    def review(self, state, idx, grade, elapsed, level):
+        """idx の語に評価 grade をまとめて適用し、次回までの日数（配列）を返す。
+
+        elapsed は前回の回答からの経過日数（最初の回答では nan）、level は回答後の level。
+        """
+        raise NotImplementedError
+
+
+class LadderScheduler(Scheduler):
+    """従来の固定ラダー。正解なら level に応じた日数、曖昧は 1 日、不正解は当日。"""
+
+    name = "ladder"
+
+    def review(self, state, idx, grade, elapsed, level):
+        ok_days = LADDER_DAYS[np.minimum(level, MASTERED_LEVEL)]
+        return np.select([grade == 2, grade == 1], [ok_days, 1.0], 0.0)
+
+
+class SM2Scheduler(Scheduler):
+    """SuperMemo-2。ng / ambiguous / ok を品質 1 / 3 / 5 として扱う。"""
+
+    name = "sm2"
+    defaults = {"initial_ease": 2.5, "min_ease": 1.3, "quality": (1, 3, 5)}
+
+    def init_state(self, level):
+        n = len(level)
+        return {
+            "ease": np.full(n, float(self.params["initial_ease"])),
+            "reps": level.astype(np.int64),
+            "interval": LADDER_DAYS[np.minimum(level, MASTERED_LEVEL)].copy(),
+        }
+
+    def review(self, state, idx, grade, elapsed, level):
+        q = np.asarray(self.params["quality"], dtype=np.float64)[grade]
+        ease = state["ease"][idx]
+        reps = state["reps"][idx]
+        interval = state["interval"][idx]
+
+        passed = q >= 3
+        grown = np.where(reps == 0, 1.0, np.where(reps == 1, 6.0, np.round(interval * ease)))
+        interval = np.where(passed, grown, 1.0)
+        reps = np.where(passed, reps + 1, 0)
+        ease = np.maximum(self.params["min_ease"], ease + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)))
+
+        state["ease"][idx] = ease
+        state["reps"][idx] = reps
+        state["interval"][idx] = interval
+        return interval
+
+
+class FSRSScheduler(Scheduler):
+    """FSRS-4.5。ng / ambiguous / ok を Again / Hard / Good として扱う。
+
+    weights は FSRS-4.5 の既定値。retention は目標の想起率で、間隔は
+    想起率がこの値まで下がる日数になる（0.9 なら間隔 ≒ 安定度）。
+    """
+
+    name = "fsrs"
+    defaults = {
+        "weights": (
+            0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+            0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+        ),
+        "retention": 0.9,
+        "maximum_interval": 36500,
+    }
+
+    DECAY = -0.5
+    FACTOR = 19 / 81
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.w = np.asarray(self.params["weights"], dtype=np.float64)
+        if len(self.w) != 17:
+            raise ValueError("fsrs weights must have 17 values")
+
+    def _initial_difficulty(self, rating):
+        return np.clip(self.w[4] - (rating - 3) * self.w[5], 1.0, 10.0)
+
+    def init_state(self, level):
+        n = len(level)
+        # ログ以前に学習済みの語は、ラダーの間隔を安定度とみなして始める
+        stability = LADDER_DAYS[np.minimum(level, MASTERED_LEVEL)].copy()
+        return {
+            "stability": np.where(level > 0, stability, np.nan),
+            "difficulty": np.where(level > 0, self._initial_difficulty(3.0), np.nan),
+        }
+
+    def review(self, state, idx, grade, elapsed, level):
+        w = self.w
+        rating = grade.astype(np.float64) + 1.0   # Again=1, Hard=2, Good=3
+        s = state["stability"][idx]
+        d = state["difficulty"][idx]
+        first = np.isnan(s)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.nan_to_num(np.maximum(elapsed, 0.0))
+            r = np.power(1.0 + self.FACTOR * t / s, self.DECAY)
+
+            next_d = d - w[6] * (rating - 3.0)
+            next_d = np.clip(w[7] * self._initial_difficulty(4.0) + (1 - w[7]) * next_d, 1.0, 10.0)
+
+            hard_penalty = np.where(rating == 2.0, w[15], 1.0)
+            recall_s = s * (
+                1.0 + math.exp(w[8]) * (11.0 - d) * np.power(s, -w[9])
+                * (np.exp(w[10] * (1.0 - r)) - 1.0) * hard_penalty
+            )
+            forget_s = w[11] * np.power(d, -w[12]) * (np.power(s + 1.0, w[13]) - 1.0) * np.exp(w[14] * (1.0 - r))
+            next_s = np.where(rating == 1.0, np.minimum(forget_s, s), recall_s)
+
+        init_s = w[grade]
+        s = np.where(first, init_s, next_s)
+        d = np.where(first, self._initial_difficulty(rating), next_d)
+        state["stability"][idx] = s
+        state["difficulty"][idx] = d
+
+        retention = self.params["retention"]
+        interval = s / self.FACTOR * (math.pow(retention, 1.0 / self.DECAY) - 1.0)
+        interval = np.clip(np.round(interval), 1.0, self.params["maximum_interval"])
+        # 不正解は従来どおり当日中にもう一度出す
+        return np.where(grade == 0, 0.0, interval)
+
+
+SCHEDULERS = {cls.name: cls for cls in (LadderScheduler, SM2Scheduler, FSRSScheduler)}
+
+
+def get_scheduler(name="ladder", params=None):
+    if isinstance(params, str):
+        params = json.loads(params) if params.strip() else {}
+    try:
+        cls = SCHEDULERS[name]
+    except KeyError:
+        raise ValueError(f"unknown scheduler: {name} (choose from {', '.join(SCHEDULERS)})")
+    return cls(**(params or {}))
+
+
+def configured_scheduler(config):
+    """設定（app.config）の WORD_SCHEDULER（ladder / sm2 / fsrs）と WORD_SCHEDULER_PARAMS（JSON）で選んだスケジューラ。"""
+    return get_scheduler(config.get("WORD_SCHEDULER") or "ladder", config.get("WORD_SCHEDULER_PARAMS") or "")
+
+
+class ReviewHistory:
+    """word_reviews を語順・時刻順に並べた配列。"""
+
+    def __init__(self, word_ids, grades, days, prev_levels):
+        self.word_ids = word_ids        # 各回答の語 id
+        self.grades = grades            # 0 / 1 / 2
+        self.days = days                # 1970-01-01 からの日数（小数）
+        self.prev_levels = prev_levels  # 回答前の level（最初の回答の値だけ使う）
+
+    def __len__(self):
+        return len(self.word_ids)
+
+
+def load_history(conn, word_ids=None):
+    """word_reviews を読み込む。word_ids を渡すとその語だけ。"""
+    sql = """
+        SELECT word_id,
+               CASE result WHEN 'ok' THEN 2 WHEN 'ambiguous' THEN 1 ELSE 0 END,
+               julianday(reviewed_at) - ?,
+               prev_level
+        FROM word_reviews
+    """
+    args = [_UNIX_EPOCH_JD]
+    if word_ids is not None:
+        word_ids = sorted(set(word_ids))
+        if not word_ids:
+            return ReviewHistory(*(np.empty(0, dtype=dtype) for dtype in (np.int64, np.int64, np.float64, np.int64)))
+        sql += f" WHERE word_id IN ({','.join('?' * len(word_ids))})"
+        args += word_ids
+    sql += " ORDER BY word_id, reviewed_at, id"
+    # sqlite3.Row だと配列への変換が遅いので、このカーソルだけ素のタプルで受け取る
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = np.array(cursor.execute(sql, args).fetchall(), dtype=np.float64).reshape(-1, 4)
+    return ReviewHistory(
+        rows[:, 0].astype(np.int64),
+        rows[:, 1].astype(np.int64),
+        rows[:, 2],
+        rows[:, 3].astype(np.int64),
+    )
+
+
+def replay(history, scheduler):
+    """全回答を再生し、(語 id, level, status, 次回の復習日 'YYYY-MM-DD') の配列を返す。"""
+    if len(history) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype="<U9"), np.empty(0, dtype="<U10")
+
+    # 語ごとの通し番号 word_index と、語の中での回答番号 rank を作る
+    word_ids = history.word_ids
+    starts = np.flatnonzero(np.r_[True, word_ids[1:] != word_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(word_ids)])
+    unique_ids = word_ids[starts]
+    word_index = np.repeat(np.arange(len(starts)), counts)
+    rank = np.arange(len(word_ids)) - np.repeat(starts, counts)
+
+    level = history.prev_levels[starts].copy()
+    state = scheduler.init_state(level)
+    last_day = np.full(len(starts), np.nan)
+    interval = np.zeros(len(starts))
+    last_grade = np.zeros(len(starts), dtype=np.int64)
+
+    # rank 順に並べ替え、k 回目の回答を全語まとめて処理する（同じ k の中で語は重複しない）
+    order = np.argsort(rank, kind="stable")
+    bounds = np.searchsorted(rank[order], np.arange(counts.max() + 1))
+    for k in range(counts.max()):
+        events = order[bounds[k]:bounds[k + 1]]
+        idx = word_index[events]
+        grade = history.grades[events]
+        day = history.days[events]
+
+        lv = level[idx]
+        lv = np.select([grade == 2, grade == 1], [lv + 1, np.maximum(lv - 1, 0)], 0)
+        level[idx] = lv
+        interval[idx] = scheduler.review(state, idx, grade, day - last_day[idx], lv)
+        last_day[idx] = day
+        last_grade[idx] = grade
+
+    # mastered になるのは正解で level 5 以上に上がった時だけ（曖昧・不正解は常に learning）
+    status = np.where((last_grade == 2) & (level >= MASTERED_LEVEL), "mastered", "learning")
+    due = (np.floor(last_day) + interval).astype(np.int64).astype("datetime64[D]").astype(str)
+    return unique_ids, level, status, due
+
+
+def reschedule(conn, scheduler, word_ids=None, dry_run=False, commit=True):
+    """回答ログから level / status / next_review_date を計算し直して words に書き戻す。
+
+    ログの無い語（未回答の新語）は変更しない。commit=False なら呼び出し側の
+    トランザクションの中で書く。戻り値は所要時間などの集計。
+    """
+    started = time.perf_counter()
+    history = load_history(conn, word_ids)
+    loaded = time.perf_counter()
+    ids, level, status, due = replay(history, scheduler)
+    replayed = time.perf_counter()
+
+    if not dry_run and len(ids):
+        rows = zip(status.tolist(), due.tolist(), level.tolist(), ids.tolist())
+        if commit:
+            with conn:
+                conn.executemany("UPDATE words SET status = ?, next_review_date = ?, level = ? WHERE id = ?", rows)
+        else:
+            conn.executemany("UPDATE words SET status = ?, next_review_date = ?, level = ? WHERE id = ?", rows)
+    written = time.perf_counter()
+
+    return {
+        "scheduler": scheduler.name,
+        "words": int(len(ids)),
+        "reviews": int(len(history)),
+        "dry_run": dry_run,
+        "load_seconds": round(loaded - started, 3),
+        "replay_seconds": round(replayed - loaded, 3),
+        "write_seconds": round(written - replayed, 3),
+    }
@@ -0,0 +1,118 @@
+"""words の全文検索。
+
+words_fts（FTS5 の外部コンテンツテーブル、trigram トークナイザ）を words と
+トリガーで同期させておき、MATCH で引いて bm25 の順に返す。trigram は 3 文字
+未満の語を MATCH できないので、短い語（日本語の 1〜2 文字など）は MATCH の
+結果を LIKE で絞り込む。短い語しか無い検索と、FTS5 / trigram が使えない
+SQLite では words を LIKE で走査する（件数に比例して遅くなる）。
+"""
+from server.extensions import get_db
+from server.schema_helpers import FTS_COLUMNS, create_fts, rebuild
+
+# bm25 の列ごとの重み（FTS_COLUMNS と同じ順）。見出し語と意味の一致を優先する
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 1.0, 2.0)
+RESULT_COLUMNS = ("id", "word", "meaning", "status", "level", "is_favorite", "created_at")
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+MAX_SEARCH_LIMIT = 100
+# trigram が MATCH できる最短の語
+MIN_MATCH_LENGTH = 3
+
+
+def fts_available(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'words_fts'").fetchone()
+    return row is not None
+
+
+def _split_terms(query):
+    terms = [term for term in query.split() if term]
+    long_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_MATCH_LENGTH]
+    return long_terms, short_terms
+
+
+def _match_expression(terms):
+    # 各語をフレーズとして引用し、FTS5 の演算子や記号として解釈させない
+    return " AND ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _like_clauses(terms, columns):
+    """各語がどれかの列に含まれる、という LIKE 条件（全語 AND）。"""
+    clauses, args = [], []
+    for term in terms:
+        pattern = _like_pattern(term)
+        clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in columns) + ")")
+        args.extend([pattern] * len(columns))
+    return clauses, args
+
+
+def search_words(query, limit=20, offset=0):
+    """query に一致する語を関連度順に返す。戻り値は (items, next_offset)。
+
+    各 item には RESULT_COLUMNS と、一致した列の値の一致箇所を <mark> で囲んだ
+    highlights（列名 → 文字列）が入る。LIKE で拾った短い語は強調しない。
+    """
+    long_terms, short_terms = _split_terms(query or "")
+    if not long_terms and not short_terms:
+        return [], None
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+    offset = max(0, int(offset))
+
+    db = get_db()
+    if long_terms and fts_available(db):
+        rows = _search_fts(db, long_terms, short_terms, limit + 1, offset)
+    else:
+        rows = _search_like(db, long_terms + short_terms, limit + 1, offset)
+
+    items = []
+    for row in rows[:limit]:
+        item = {name: row[name] for name in RESULT_COLUMNS}
+        item["highlights"] = {
+            name: row[f"hl_{name}"]
+            for name in FTS_COLUMNS
+            if row[f"hl_{name}"] and HIGHLIGHT_OPEN in row[f"hl_{name}"]
+        }
+        items.append(item)
+    next_offset = offset + limit if len(rows) > limit else None
+    return items, next_offset
+
+
+def _search_fts(db, long_terms, short_terms, limit, offset):
+    result_columns = ", ".join(f"w.{name}" for name in RESULT_COLUMNS)
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    highlights = ", ".join(
+        f"highlight(words_fts, {index}, ?, ?) AS hl_{name}" for index, name in enumerate(FTS_COLUMNS)
+    )
+    highlight_args = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE] * len(FTS_COLUMNS)
+
+    # 短い語は MATCH で絞った候補に対する LIKE で確かめる
+    clauses, args = _like_clauses(short_terms, [f"w.{name}" for name in FTS_COLUMNS])
+    clauses.insert(0, "words_fts MATCH ?")
+    args.insert(0, _match_expression(long_terms))
+
+    return db.execute(f"""
+        SELECT {result_columns}, {highlights}
+        FROM words_fts JOIN words w ON w.id = words_fts.rowid
+        WHERE {' AND '.join(clauses)}
+        ORDER BY bm25(words_fts, {weights})
+        LIMIT ? OFFSET ?
+    """, (*highlight_args, *args, limit, offset)).fetchall()
+
+
+def _search_like(db, terms, limit, offset):
+    # 短い語だけの検索と、FTS が無いときの代替。一致箇所の強調はしない
+    result_columns = ", ".join(RESULT_COLUMNS)
+    highlights = ", ".join(f"NULL AS hl_{name}" for name in FTS_COLUMNS)
+    clauses, args = _like_clauses(terms, FTS_COLUMNS)
+    return db.execute(f"""
+        SELECT {result_columns}, {highlights}
+        FROM words
+        WHERE {' AND '.join(clauses)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ? OFFSET ?
+    """, (*args, limit, offset)).fetchall()
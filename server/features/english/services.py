@@ -1,22 +1,18 @@
 import os
 import json
-import google.generativeai as genai
+import hashlib
+import threading
+from flask import current_app
+from server import metrics
+from .cache import WordLookupCache, get_lookup_cache, normalize_word
 
 API_KEY = os.environ.get("GEMINI_API_KEY")
-if API_KEY:
-    genai.configure(api_key=API_KEY)
 
-def generate_word_info(word):
-    if not API_KEY:
-        return {
-            "error": "API key not found. Please set GEMINI_API_KEY environment variable."
-        }
+MODEL_NAME = 'gemini-2.0-flash-lite'
 
-    model = genai.GenerativeModel('gemini-2.0-flash-lite')
-    
-    prompt = f"""
+PROMPT_TEMPLATE = """
     You are a strict JSON generator. Provide detailed information for the English word: "{word}".
-    
+
     Response MUST be valid JSON with these exact keys:
     {{
       "word": "The word itself (corrected)",
@@ -25,26 +21,167 @@ def generate_word_info(word):
       "example_en": "Simple English example sentence",
       "example_jp": "Japanese translation (No Romaji)"
     }}
-    
+
+    Rules:
+    1. NO Katakana in pronunciation.
+    2. NO Romaji in example_jp.
+    3. Meaning MUST have 【】 tags.
+    """
+
+BATCH_PROMPT_TEMPLATE = """
+    You are a strict JSON generator. Provide detailed information for each of these English words:
+    {words}
+
+    Response MUST be a valid JSON array with exactly one object per word, in the same order, with these exact keys:
+    [
+      {{
+        "input": "The word exactly as given above",
+        "word": "The word itself (corrected)",
+        "meaning": "Japanese meaning. MUST use format: 【Part of Speech】Meaning. Example: 【名】本 【動】予約する",
+        "pronunciation": "IPA ONLY. Example: /rʌn/",
+        "example_en": "Simple English example sentence",
+        "example_jp": "Japanese translation (No Romaji)"
+      }}
+    ]
+
     Rules:
     1. NO Katakana in pronunciation.
     2. NO Romaji in example_jp.
     3. Meaning MUST have 【】 tags.
     """
-    
+
+REQUIRED_KEYS = ("word", "meaning", "pronunciation", "example_en", "example_jp")
+
+# プロンプトを書き換えるとキャッシュキーも変わる
+PROMPT_VERSION = hashlib.sha1(
+    (PROMPT_TEMPLATE + BATCH_PROMPT_TEMPLATE).encode("utf-8")
+).hexdigest()[:10]
+
+_model = None
+_model_lock = threading.Lock()
+
+GEMINI_LATENCY = metrics.histogram(
+    "gemini_request_duration_seconds", "Gemini generate_content calls.", ("kind", "outcome"), metrics.SLOW_BUCKETS
+)
+
+
+def set_client(client):
+    """generate_content(prompt) を持つオブジェクトに差し替える（テスト・オフライン用のスタブ）。"""
+    global _model
+    with _model_lock:
+        _model = client
+
+
+def get_model():
+    # GenerativeModel はリクエストごとに作らず使い回す。SDK の読み込みは重いので
+    # 起動時ではなく最初に生成が必要になった時に行う
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+
+                if API_KEY:
+                    genai.configure(api_key=API_KEY)
+                _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+
+def parse_response_text(text):
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:-3]
+    elif text.startswith("```"):
+        text = text[3:-3]
+    return json.loads(text)
+
+
+def validate_word_info(item):
+    """モデル出力 1 語分を確認する。(キャッシュに入れる dict, None) か (None, 理由) を返す。
+
+    壊れた出力をキャッシュに入れると期限まで再生されるので、形が違うものは入れない。
+    """
+    if not isinstance(item, dict):
+        return None, "response is not a JSON object"
+    missing = [key for key in ("word", "meaning") if not isinstance(item.get(key), str) or not item[key].strip()]
+    if missing:
+        return None, f"missing keys: {', '.join(missing)}"
+    return {key: item[key] if isinstance(item.get(key), str) else "" for key in REQUIRED_KEYS}, None
+
+
+def generate_word_info(word):
+    key = WordLookupCache.make_key(word, MODEL_NAME, PROMPT_VERSION)
+    cached = get_lookup_cache().get(key)
+    if cached is not None:
+        return cached
+
+    if not API_KEY and _model is None:
+        return {
+            "error": "API key not found. Please set GEMINI_API_KEY environment variable."
+        }
+
+    prompt = PROMPT_TEMPLATE.format(word=word)
+
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        if text.startswith("```json"):
-            text = text[7:-3]
-        elif text.startswith("```"):
-            text = text[3:-3]
-            
-        data = json.loads(text)
-        return data
+        with GEMINI_LATENCY.time(kind="single"):
+            response = get_model().generate_content(prompt)
+        data, problem = validate_word_info(parse_response_text(response.text))
     except Exception as e:
-        print(f"LLM Error: {e}")
+        current_app.logger.warning("word lookup failed for %r: %s", word, e)
         return {
             "error": "Failed to generate content",
             "details": str(e)
         }
+    if problem:
+        current_app.logger.warning("word lookup for %r returned an unusable response: %s", word, problem)
+        return {
+            "error": "Failed to generate content",
+            "details": problem
+        }
+
+    get_lookup_cache().put(key, word, MODEL_NAME, PROMPT_VERSION, data)
+    return data
+
+
+def cached_word_info(word):
+    return get_lookup_cache().get(WordLookupCache.make_key(word, MODEL_NAME, PROMPT_VERSION))
+
+
+def generate_words_info_batch(words):
+    """複数語を 1 回のプロンプトで生成する。
+
+    戻り値は (成功: {入力語: 情報}, 失敗: {入力語: 理由})。API 呼び出し自体の
+    失敗は例外のまま呼び出し側に任せ、再試行の判断をさせる。成功分はキャッシュに入れる。
+    """
+    if not API_KEY and _model is None:
+        raise RuntimeError("API key not found. Please set GEMINI_API_KEY environment variable.")
+
+    listing = "\n".join(f"    - {json.dumps(word, ensure_ascii=False)}" for word in words)
+    with GEMINI_LATENCY.time(kind="batch"):
+        response = get_model().generate_content(BATCH_PROMPT_TEMPLATE.format(words=listing))
+    items = parse_response_text(response.text)
+    if not isinstance(items, list):
+        raise ValueError("batch response is not a JSON array")
+
+    by_input = {}
+    for item in items:
+        if isinstance(item, dict) and item.get("input"):
+            by_input[normalize_word(item["input"])] = item
+
+    found = {}
+    errors = {}
+    for index, word in enumerate(words):
+        item = by_input.get(normalize_word(word))
+        if item is None and len(items) == len(words) and isinstance(items[index], dict):
+            # input を返さないモデル出力には順序で対応付ける
+            item = items[index]
+        if item is None:
+            errors[word] = "missing from response"
+            continue
+        data, problem = validate_word_info(item)
+        if problem:
+            errors[word] = problem
+            continue
+        get_lookup_cache().put(WordLookupCache.make_key(word, MODEL_NAME, PROMPT_VERSION), word, MODEL_NAME, PROMPT_VERSION, data)
+        found[word] = data
+    return found, errors
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+DEFAULT_CHECK_INTERVAL = 0.5
+
+
+def _session_entry(session_id, status, start_time, duration):
+    started_at = start_time if isinstance(start_time, datetime) else datetime.fromisoformat(start_time)
+    return {
+        'id': session_id,
+        'status': status,
+        'start_time': str(start_time),
+        'started_at': started_at,
+        'duration': duration or 0,
+    }
+
+
+class ActiveSessionCache:
+    """実行中／一時停止中セッション（高々 1 件）のプロセス内キャッシュ。
+
+    work_sessions への書き込みはトリガーで timer_state.generation を進める。
+    キャッシュは読み込み時の generation を覚えておき、check_interval 秒を過ぎたら
+    主キー 1 件の参照で世代を照合し、他プロセスの書き込みを検知したら読み直す。
+    間隔内はクエリを一切発行しない。
+    """
+
+    def __init__(self, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._session = None
+        self._generation = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.checks = 0
+        self.loads = 0
+
+    def get(self, conn):
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded and now - self._checked_at < self.check_interval:
+                self.hits += 1
+                return self._session
+
+        # 世代を先に読む。行の読み込みとの間に書き込みが入っても、古い世代で
+        # 新しい行を持つだけなので次回の照合で読み直しになる（逆順だと古い行を掴む）
+        generation = current_generation(conn)
+        with self._lock:
+            self.checks += 1
+            if self._loaded and generation == self._generation:
+                self._checked_at = now
+                return self._session
+
+        row = conn.execute(
+            "SELECT id, status, start_time, duration FROM work_sessions "
+            "WHERE status IN ('running', 'paused') ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        session = _session_entry(row['id'], row['status'], row['start_time'], row['duration']) if row else None
+        with self._lock:
+            self.loads += 1
+            self._store(session, generation, now)
+        return session
+
+    def set(self, generation, session_id=None, status=None, start_time=None, duration=0):
+        """書き込みと同じトランザクションで読んだ generation と共に最新状態を反映する。"""
+        session = _session_entry(session_id, status, start_time, duration) if session_id else None
+        with self._lock:
+            self._store(session, generation, time.monotonic())
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._session = None
+            self._generation = None
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'checks': self.checks, 'loads': self.loads}
+
+    def _store(self, session, generation, now):
+        self._session = session
+        self._generation = generation
+        self._checked_at = now
+        self._loaded = True
+
+
+def current_generation(conn):
+    return conn.execute("SELECT generation FROM timer_state WHERE id = 1").fetchone()[0]
+
+
+def get_active_session_cache():
+    """アプリごとのキャッシュ。アプリ（＝DB）をまたいで共有しないよう app.extensions に置く。"""
+    return current_app.extensions["timer_session_cache"]
+
+
+def init_app(app):
+    app.config.setdefault(
+        "TIMER_CACHE_CHECK_INTERVAL",
+        float(os.environ.get("TIMER_CACHE_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL)),
+    )
+    app.extensions["timer_session_cache"] = ActiveSessionCache(app.config["TIMER_CACHE_CHECK_INTERVAL"])
@@ -0,0 +1,59 @@
+import json
+import queue
+import threading
+
+
+class EventHub:
+    """プロセス内の pub/sub。
+
+    publish されたイベントは一度だけ SSE 形式に整形し、購読中の全キューへ
+    そのまま配るので、購読者が何人いても DB やシリアライズは 1 回で済む。
+    遅い購読者のキューが溢れた場合は古いイベントを捨てて最新を残す。
+    """
+
+    def __init__(self, max_queue=16):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, limit=None):
+        """購読用のキューを返す。limit 本が既に購読中なら None。"""
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    pass
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+hub = EventHub()
@@ -2,24 +2,17 @@ import sqlite3
 import json
 from datetime import datetime, timedelta
 from server.extensions import get_db
+from server.schema_helpers import apply_daily_totals as _apply_daily_totals, rebuild_daily_totals, split_by_day
+from .cache import current_generation, get_active_session_cache
 
-class WorkSession:
-    @staticmethod
-    def create_table():
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS work_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                start_time TIMESTAMP NOT NULL,
-                end_time TIMESTAMP,
-                duration INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'running'
-            )
-        ''')
-        conn.commit()
-        conn.close()
 
+def _completed_split(row):
+    if not row or row['status'] != 'completed':
+        return {}
+    return split_by_day(row['end_time'], row['duration'])
+
+
+class WorkSession:
     @staticmethod
     def start_session():
         conn = get_db()
@@ -30,15 +23,18 @@ class WorkSession:
         
         if existing:
             if existing['status'] == 'running':
-                conn.close()
                 return existing['id']
             elif existing['status'] == 'paused':
+                resumed_at = datetime.now()
                 cursor.execute(
                     "UPDATE work_sessions SET status = 'running', start_time = ? WHERE id = ?",
-                    (datetime.now(), existing['id'])
+                    (resumed_at, existing['id'])
                 )
+                cursor.execute("SELECT duration FROM work_sessions WHERE id = ?", (existing['id'],))
+                duration = cursor.fetchone()['duration']
+                generation = current_generation(conn)
                 conn.commit()
-                conn.close()
+                get_active_session_cache().set(generation, existing['id'], 'running', resumed_at, duration)
                 return existing['id']
 
         start_time = datetime.now()
@@ -47,8 +43,9 @@ class WorkSession:
             (start_time,)
         )
         session_id = cursor.lastrowid
+        generation = current_generation(conn)
         conn.commit()
-        conn.close()
+        get_active_session_cache().set(generation, session_id, 'running', start_time, 0)
         return session_id
 
     @staticmethod
@@ -60,7 +57,6 @@ class WorkSession:
         session = cursor.fetchone()
         
         if not session:
-            conn.close()
             return None
 
         now = datetime.now()
@@ -72,8 +68,9 @@ class WorkSession:
             "UPDATE work_sessions SET status = 'paused', duration = ? WHERE id = ?",
             (new_duration, session['id'])
         )
+        generation = current_generation(conn)
         conn.commit()
-        conn.close()
+        get_active_session_cache().set(generation, session['id'], 'paused', session['start_time'], new_duration)
         return new_duration
 
     @staticmethod
@@ -85,7 +82,6 @@ class WorkSession:
         session = cursor.fetchone()
         
         if not session:
-            conn.close()
             return None
 
         end_time = datetime.now()
@@ -99,23 +95,20 @@ class WorkSession:
             "UPDATE work_sessions SET end_time = ?, duration = ?, status = 'completed' WHERE id = ?",
             (end_time, final_duration, session['id'])
         )
+        _apply_daily_totals(cursor, split_by_day(end_time, final_duration))
+        generation = current_generation(conn)
         conn.commit()
-        conn.close()
+        get_active_session_cache().set(generation)
         return final_duration
 
     @staticmethod
     def get_current_session():
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM work_sessions WHERE status IN ('running', 'paused')")
-        session = cursor.fetchone()
-        conn.close()
+        session = get_active_session_cache().get(get_db())
         
         if session:
-            current_duration = session['duration'] or 0
+            current_duration = session['duration']
             if session['status'] == 'running':
-                start_time = datetime.fromisoformat(session['start_time'])
-                current_duration += int((datetime.now() - start_time).total_seconds())
+                current_duration += int((datetime.now() - session['started_at']).total_seconds())
             
             return {
                 'id': session['id'],
@@ -135,33 +128,32 @@ class WorkSession:
         week_start = today_start - timedelta(days=today_start.weekday())
         
         cursor.execute(
-            "SELECT SUM(duration) as total FROM work_sessions WHERE end_time >= ?",
-            (today_start,)
+            "SELECT duration FROM work_daily_totals WHERE date = ?",
+            (today_start.date().isoformat(),)
         )
-        today_total = cursor.fetchone()['total'] or 0
+        row = cursor.fetchone()
+        today_total = row['duration'] if row else 0
         
-        cursor.execute("SELECT start_time FROM work_sessions WHERE status = 'running'")
-        running = cursor.fetchone()
+        active = get_active_session_cache().get(conn)
+        running = active if active and active['status'] == 'running' else None
         if running:
-            start_time = datetime.fromisoformat(running['start_time'])
+            start_time = running['started_at']
             if start_time >= today_start:
                 today_total += int((now - start_time).total_seconds())
             else:
                 today_total += int((now - today_start).total_seconds())
 
         cursor.execute(
-            "SELECT SUM(duration) as total FROM work_sessions WHERE end_time >= ?",
-            (week_start,)
+            "SELECT SUM(duration) as total FROM work_daily_totals WHERE date >= ?",
+            (week_start.date().isoformat(),)
         )
         weekly_total = cursor.fetchone()['total'] or 0
         
         if running:
-            start_time = datetime.fromisoformat(running['start_time'])
+            start_time = running['started_at']
             if start_time >= week_start:
                 weekly_total += int((now - start_time).total_seconds())
 
-        conn.close()
-        
         return {
             'today': today_total,
             'weekly': weekly_total
@@ -175,18 +167,13 @@ class WorkSession:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days - 1)
         
-        cursor.execute('''
-            SELECT 
-                date(start_time) as date,
-                SUM(duration) as total_duration
-            FROM work_sessions
-            WHERE start_time >= ? AND status = 'completed'
-            GROUP BY date(start_time)
-            ORDER BY date(start_time) DESC
-        ''', (start_date,))
+        cursor.execute(
+            "SELECT date, duration FROM work_daily_totals WHERE date >= ?",
+            (start_date.date().isoformat(),)
+        )
         
         rows = cursor.fetchall()
-        daily_map = {row['date']: row['total_duration'] for row in rows}
+        daily_map = {row['date']: row['duration'] for row in rows}
 
         history = []
         current = start_date
@@ -201,9 +188,7 @@ class WorkSession:
             ORDER BY start_time DESC
             LIMIT 50
         ''', (start_date,))
-        sessions = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
+        sessions = cursor.fetchall()
         
         return {
             'daily_summary': history,
@@ -228,49 +213,65 @@ class WorkSession:
             values.append(data['duration'])
             
         if not fields:
-            conn.close()
             return False
+        
+        cursor.execute("SELECT * FROM work_sessions WHERE id = ?", (session_id,))
+        before = cursor.fetchone()
             
         values.append(session_id)
         cursor.execute(f"UPDATE work_sessions SET {', '.join(fields)} WHERE id = ?", values)
+        
+        # 集計テーブルは旧値の寄与を引いて新値の寄与を足す（同一トランザクション）
+        cursor.execute("SELECT * FROM work_sessions WHERE id = ?", (session_id,))
+        after = cursor.fetchone()
+        _apply_daily_totals(cursor, _completed_split(before), sign=-1)
+        _apply_daily_totals(cursor, _completed_split(after))
         conn.commit()
-        conn.close()
+        get_active_session_cache().invalidate()
         return True
 
     @staticmethod
     def delete_session(session_id):
         conn = get_db()
         cursor = conn.cursor()
+        cursor.execute("SELECT * FROM work_sessions WHERE id = ?", (session_id,))
+        before = cursor.fetchone()
         cursor.execute("DELETE FROM work_sessions WHERE id = ?", (session_id,))
+        _apply_daily_totals(cursor, _completed_split(before), sign=-1)
         conn.commit()
-        conn.close()
+        get_active_session_cache().invalidate()
         return True
 
+    @staticmethod
+    def rebuild_daily_totals():
+        """work_daily_totals を生のセッションから作り直す。戻り値は集計した日数。"""
+        conn = get_db()
+        days = rebuild_daily_totals(conn)
+        conn.commit()
+        return days
+
     @staticmethod
     def get_weekly_history(weeks=12):
         conn = get_db()
         cursor = conn.cursor()
         
-        # 完了済みセッションを年-週単位で集計
+        now = datetime.now()
+        current_week_start = now - timedelta(days=now.weekday())
+        start_week = current_week_start - timedelta(weeks=weeks - 1)
+
+        # 日次集計を年-週単位でまとめる（対象期間の日数分しか読まない）
         cursor.execute('''
             SELECT 
-                strftime('%Y-%W', start_time) as week_key,
-                MIN(date(start_time)) as week_start,
+                strftime('%Y-%W', date) as week_key,
                 SUM(duration) as total_duration
-            FROM work_sessions
-            WHERE status = 'completed'
+            FROM work_daily_totals
+            WHERE date >= ?
             GROUP BY week_key
-            ORDER BY week_key DESC
-            LIMIT ?
-        ''', (weeks,))
+        ''', (start_week.date().isoformat(),))
         
         rows = cursor.fetchall()
         weekly_map = {row['week_key']: row['total_duration'] for row in rows}
 
-        now = datetime.now()
-        current_week_start = now - timedelta(days=now.weekday())
-        start_week = current_week_start - timedelta(weeks=weeks - 1)
-
         history = []
         for i in range(weeks):
             week_start_date = start_week + timedelta(weeks=i)
@@ -281,5 +282,4 @@ class WorkSession:
                 'duration': weekly_map.get(week_key, 0)
             })
         
-        conn.close()
         return history
@@ -1,11 +1,39 @@
-from flask import Blueprint, jsonify, request
+import click
+import os
+import queue
+import time
+from flask import Blueprint, Response, jsonify, request
+from server.extensions import close_db
+from . import cache
+from .events import hub, format_event
 from .models import WorkSession
 
 bp = Blueprint('timer', __name__, url_prefix='/api/timer')
+bp.record_once(lambda state: cache.init_app(state.app))
+
+HEARTBEAT_SECONDS = 25
+# 1 本のストリームを保つ上限。過ぎたら閉じ、クライアント（EventSource）が retry 後に繋ぎ直す
+STREAM_MAX_SECONDS = float(os.environ.get("TIMER_STREAM_MAX_SECONDS", 300))
+# プロセスあたりの同時ストリーム数の上限。ストリームは 1 本につきサーバーのスレッドを
+# 1 つ占有するので、他の API の分を残す（python -m server serve はスレッド数の半分にする）
+MAX_STREAMS = int(os.environ.get("TIMER_MAX_STREAMS", 4))
+STREAM_RETRY_SECONDS = 60
+
+def state_snapshot():
+    return {
+        'session': WorkSession.get_current_session(),
+        'stats': WorkSession.get_stats(),
+    }
+
+def publish_state():
+    # 購読者がいなければスナップショットのクエリ自体を省く
+    if hub.subscriber_count:
+        hub.publish('state', state_snapshot())
 
 @bp.route('/start', methods=['POST'])
 def start_timer():
     session_id = WorkSession.start_session()
+    publish_state()
     return jsonify({'success': True, 'id': session_id})
 
 @bp.route('/stop', methods=['POST'])
@@ -13,6 +41,7 @@ def stop_timer():
     duration = WorkSession.stop_session()
     if duration is None:
         return jsonify({'error': 'No running session'}), 400
+    publish_state()
     return jsonify({'success': True, 'duration': duration})
 
 @bp.route('/pause', methods=['POST'])
@@ -20,6 +49,7 @@ def pause_timer():
     duration = WorkSession.pause_session()
     if duration is None:
         return jsonify({'error': 'No running session'}), 400
+    publish_state()
     return jsonify({'success': True, 'duration': duration})
 
 @bp.route('/status', methods=['GET'])
@@ -47,9 +77,64 @@ def get_weekly_history():
 def update_session(id):
     data = request.get_json()
     success = WorkSession.update_session(id, data)
+    if success:
+        publish_state()
     return jsonify({'success': success})
 
 @bp.route('/session/<int:id>', methods=['DELETE'])
 def delete_session(id):
     success = WorkSession.delete_session(id)
+    publish_state()
     return jsonify({'success': success})
+
+@bp.route('/events', methods=['GET'])
+def timer_events():
+    """タイマー状態の SSE ストリーム。接続時にスナップショット、以降は状態遷移時のみ送る。
+
+    配信はプロセス内の hub 経由なので、同じワーカープロセスで起きた遷移だけが届く
+    （他のワーカーでの遷移はクライアント側の低頻度ポーリングで拾う）。
+    ストリームは STREAM_MAX_SECONDS で閉じ、スレッドを握り続けない。
+    MAX_STREAMS 本を超える接続には 503 と Retry-After を返し、クライアントは
+    その間ポーリングだけで状態を取る。
+    """
+    # 先に購読してからスナップショットを取り、その間の遷移を取りこぼさない
+    subscription = hub.subscribe(limit=MAX_STREAMS)
+    if subscription is None:
+        response = jsonify({'error': 'too many event streams', 'retry_after': STREAM_RETRY_SECONDS})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_SECONDS)
+        return response
+    try:
+        initial = format_event('state', state_snapshot())
+    except Exception:
+        hub.unsubscribe(subscription)
+        raise
+    # ストリーム中はプールの接続を握らない
+    close_db()
+
+    def stream():
+        yield f"retry: 5000\n{initial}"
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                yield subscription.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                if time.monotonic() < deadline:
+                    yield ": heartbeat\n\n"
+
+    response = Response(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    return response
+
+@bp.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """work_daily_totals を work_sessions から再生成する。"""
+    days = WorkSession.rebuild_daily_totals()
+    click.echo(f"rebuilt work_daily_totals: {days} days")
@@ -1,39 +1,53 @@
 from server.extensions import get_db
+from server.ordering import key_between, keys_between
 import datetime
 
+# 繰り越し時に残しておく削除記録の件数。これより古い since には全件を返す
+TOMBSTONE_RETENTION = 1000
+
 class Todo:
     @staticmethod
-    def create_table():
+    def current_version():
         db = get_db()
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS todos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                is_completed BOOLEAN NOT NULL DEFAULT 0,
-                indent_level INTEGER NOT NULL DEFAULT 0,
-                section TEXT NOT NULL DEFAULT 'today',
-                display_order INTEGER NOT NULL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        db.commit()
+        return db.execute("SELECT version FROM todo_sync WHERE id = 1").fetchone()[0]
+
+    @staticmethod
+    def get_changes(since):
+        """since より新しい版の行と削除された id を返す。
+
+        削除記録が既に間引かれていて差分を作れない場合は full=True で全件を返す。
+        """
+        db = get_db()
+        sync = db.execute("SELECT version, pruned_version FROM todo_sync WHERE id = 1").fetchone()
+        if since < sync['pruned_version']:
+            return {'version': sync['version'], 'full': True, 'todos': Todo.get_all(), 'deleted': []}
+        
+        todos = db.execute(
+            "SELECT * FROM todos WHERE version > ? ORDER BY section ASC, sort_key ASC, id ASC", (since,)
+        ).fetchall()
+        deleted = db.execute("SELECT id FROM todo_tombstones WHERE version > ?", (since,)).fetchall()
+        return {
+            'version': sync['version'],
+            'full': False,
+            'todos': todos,
+            'deleted': [row['id'] for row in deleted],
+        }
 
     @staticmethod
     def get_all():
         db = get_db()
-        todos = db.execute("SELECT * FROM todos ORDER BY display_order ASC, created_at ASC").fetchall()
-        return [dict(todo) for todo in todos]
+        # sqlite3.Row のまま返す（JSON 化は serialization が直接行う）
+        return db.execute("SELECT * FROM todos ORDER BY section ASC, sort_key ASC, id ASC").fetchall()
 
     @staticmethod
     def create(content, section='today'):
         db = get_db()
-        # Get max display_order
-        max_order = db.execute("SELECT MAX(display_order) FROM todos WHERE section = ?", (section,)).fetchone()[0]
-        new_order = (max_order or 0) + 1
+        # セクション末尾に追加 (idx_todos_section_sort_key で MAX は O(log n))
+        last_key = db.execute("SELECT MAX(sort_key) FROM todos WHERE section = ?", (section,)).fetchone()[0]
         
         cursor = db.execute(
-            "INSERT INTO todos (content, section, display_order) VALUES (?, ?, ?)",
-            (content, section, new_order)
+            "INSERT INTO todos (content, section, sort_key) VALUES (?, ?, ?)",
+            (content, section, key_between(last_key or None, None))
         )
         db.commit()
         return cursor.lastrowid
@@ -50,7 +64,17 @@ class Todo:
         
         if not fields:
             return False
-            
+
+        if 'section' in data:
+            # 別セクションへ移すときは移動先の末尾に置く（旧セクションの sort_key を持ち込まない）
+            current = db.execute("SELECT section FROM todos WHERE id = ?", (todo_id,)).fetchone()
+            if current and current['section'] != data['section']:
+                last_key = db.execute(
+                    "SELECT MAX(sort_key) FROM todos WHERE section = ?", (data['section'],)
+                ).fetchone()[0]
+                fields.append("sort_key = ?")
+                values.append(key_between(last_key or None, None))
+
         values.append(todo_id)
         db.execute(f"UPDATE todos SET {', '.join(fields)} WHERE id = ?", values)
         db.commit()
@@ -65,13 +89,101 @@ class Todo:
 
     @staticmethod
     def reorder(items):
+        """全件を送る旧来の一括並び替え。セクションごとに display_order 順で sort_key を振り直す。"""
         db = get_db()
+        by_section = {}
         for item in items:
-            db.execute("UPDATE todos SET display_order = ?, section = ?, indent_level = ? WHERE id = ?",
-                       (item['display_order'], item['section'], item.get('indent_level', 0), item['id']))
-        db.commit()
+            by_section.setdefault(item['section'], []).append(item)
+        
+        params = []
+        for section, section_items in by_section.items():
+            section_items.sort(key=lambda item: item['display_order'])
+            keys = keys_between(None, None, len(section_items))
+            for key, item in zip(keys, section_items):
+                params.append((item['display_order'], section, item.get('indent_level', 0), key, item['id']))
+        
+        with db:
+            db.executemany(
+                "UPDATE todos SET display_order = ?, section = ?, indent_level = ?, sort_key = ? WHERE id = ?",
+                params
+            )
         return True
 
+    @staticmethod
+    def move(todo_id, after_id=None, section=None, indent_level=None):
+        """1件（とその子孫）だけを移動する。
+
+        after_id は移動先で直前に来る行（平坦化した並びでの前の行）。None ならセクション先頭。
+        子孫は直後に続く indent_level の深い行で、インデントの増減も一緒に適用する。
+        戻り値は更新した行の一覧。対象が存在しなければ None。
+        """
+        db = get_db()
+        moved = db.execute(
+            "SELECT id, section, sort_key, indent_level FROM todos WHERE id = ?", (todo_id,)
+        ).fetchone()
+        if not moved:
+            return None
+        
+        subtree = [moved['id']]
+        following = db.execute(
+            "SELECT id, indent_level FROM todos WHERE section = ? AND sort_key > ? ORDER BY sort_key, id",
+            (moved['section'], moved['sort_key'])
+        )
+        indents = {moved['id']: moved['indent_level']}
+        for row in following:
+            if row['indent_level'] <= moved['indent_level']:
+                break
+            subtree.append(row['id'])
+            indents[row['id']] = row['indent_level']
+        following.close()
+        
+        section = section or moved['section']
+        if indent_level is None:
+            indent_level = moved['indent_level']
+        delta = int(indent_level) - moved['indent_level']
+        
+        if after_id is not None and after_id in indents:
+            raise ValueError("cannot move a todo after itself or its descendant")
+        
+        placeholders = ", ".join("?" for _ in subtree)
+        if after_id is not None:
+            prev = db.execute(
+                "SELECT sort_key FROM todos WHERE id = ? AND section = ?", (after_id, section)
+            ).fetchone()
+            if not prev:
+                raise ValueError("after_id is not in the target section")
+            prev_key = prev['sort_key']
+            next_row = db.execute(
+                f"SELECT sort_key FROM todos WHERE section = ? AND sort_key > ? AND id NOT IN ({placeholders}) "
+                "ORDER BY sort_key LIMIT 1",
+                (section, prev_key, *subtree)
+            ).fetchone()
+        else:
+            prev_key = None
+            next_row = db.execute(
+                f"SELECT sort_key FROM todos WHERE section = ? AND id NOT IN ({placeholders}) "
+                "ORDER BY sort_key LIMIT 1",
+                (section, *subtree)
+            ).fetchone()
+        next_key = next_row['sort_key'] if next_row else None
+        
+        keys = keys_between(prev_key, next_key, len(subtree))
+        changes = [
+            {
+                'id': row_id,
+                'section': section,
+                'sort_key': key,
+                'indent_level': max(0, indents[row_id] + delta),
+            }
+            for row_id, key in zip(subtree, keys)
+        ]
+        with db:
+            db.executemany(
+                "UPDATE todos SET section = :section, sort_key = :sort_key, indent_level = :indent_level WHERE id = :id",
+                changes
+            )
+        return changes
+
     @staticmethod
     def rollover_tasks():
         """日付切替時に完了済みを削除し、未完了のtodayをfutureへ移動する"""
@@ -79,10 +191,24 @@ class Todo:
         
         db.execute("DELETE FROM todos WHERE is_completed = 1")
         
-        db.execute("""
-            UPDATE todos 
-            SET section = 'future' 
-            WHERE section = 'today' AND is_completed = 0
-        """)
+        # future の末尾に、today での並びを保ったまま付け足す
+        last_key = db.execute("SELECT MAX(sort_key) FROM todos WHERE section = 'future'").fetchone()[0]
+        moving = db.execute(
+            "SELECT id FROM todos WHERE section = 'today' AND is_completed = 0 ORDER BY sort_key, id"
+        ).fetchall()
+        keys = keys_between(last_key or None, None, len(moving))
+        db.executemany(
+            "UPDATE todos SET section = 'future', sort_key = ? WHERE id = ?",
+            [(key, row['id']) for key, row in zip(keys, moving)]
+        )
+        
+        # 古い削除記録を間引き、それより前の since は全件同期にフォールバックさせる
+        cutoff = db.execute(
+            "SELECT version FROM todo_tombstones ORDER BY version DESC LIMIT 1 OFFSET ?",
+            (TOMBSTONE_RETENTION,)
+        ).fetchone()
+        if cutoff:
+            db.execute("DELETE FROM todo_tombstones WHERE version <= ?", (cutoff[0],))
+            db.execute("UPDATE todo_sync SET pruned_version = ? WHERE id = 1", (cutoff[0],))
         db.commit()
         return True
@@ -1,12 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from server.compression import matching_etag
 from .models import Todo
 
 bp = Blueprint('todo', __name__, url_prefix='/api/todos')
 
 @bp.route('', methods=['GET'])
 def get_todos():
-    todos = Todo.get_all()
-    return jsonify(todos)
+    since = request.args.get('since', type=int)
+    if since is not None:
+        return jsonify(Todo.get_changes(since))
+    
+    # 版番号がそのまま ETag になるので、変更がなければ一覧を読まずに 304 を返せる
+    version = Todo.current_version()
+    etag = f'todos-{version}'
+    matched = matching_etag(request.if_none_match, etag)
+    if matched:
+        response = Response(status=304)
+    else:
+        response = jsonify(Todo.get_all())
+    response.set_etag(matched or etag)
+    response.headers['X-Todos-Version'] = str(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @bp.route('', methods=['POST'])
 def create_todo():
@@ -41,6 +56,24 @@ def reorder_todos():
         return jsonify({'success': True})
     return jsonify({'error': 'Failed to reorder'}), 400
 
+@bp.route('/move', methods=['POST'])
+def move_todo():
+    data = request.get_json()
+    if not data or 'id' not in data:
+        return jsonify({'error': 'id is required'}), 400
+    try:
+        changes = Todo.move(
+            data['id'],
+            after_id=data.get('after_id'),
+            section=data.get('section'),
+            indent_level=data.get('indent_level'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if changes is None:
+        return jsonify({'error': 'Todo not found'}), 404
+    return jsonify({'success': True, 'items': changes})
+
 @bp.route('/rollover', methods=['POST'])
 def rollover_todos():
     success = Todo.rollover_tasks()
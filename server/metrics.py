@@ -0,0 +1,423 @@
+"""プロセス内のメトリクスと Prometheus テキスト形式での書き出し（/api/metrics）。
+
+- HTTP: ルート（URL ルールの形）ごとのレイテンシのヒストグラム、ステータス別の件数、処理中の件数
+- SQL: プール経由の接続を InstrumentedConnection で作り、文の形（リテラルを ? に、
+  IN (?, ?, ...) を (...) にまとめたもの）ごとに件数と時間を数える。
+  リクエストごとの文の数と合計時間もルート別のヒストグラムにする
+- 各機能の外部呼び出し（Gemini、プリント生成など）は histogram() で定義して time() で測る
+
+値はワーカープロセスごと（gunicorn で workers を増やすとスクレイプしたワーカーの分だけ
+見える）。記録は辞書の更新とロック 1 回なので、常時有効にしておける。
+METRICS_ENABLED=0 で記録も SQL の計測もやめる。
+"""
+import bisect
+import contextvars
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SLOW_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+MAX_STATEMENT_LENGTH = 200
+STATEMENT_CACHE_SIZE = 1024
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self.inc_key(self._key(labels), amount)
+
+    def inc_key(self, key, amount=1):
+        """ラベル値のタプル（labels の順）で直接足す。計測の多い箇所用。"""
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self.observe_key(self._key(labels), value)
+
+    def observe_key(self, key, value):
+        """ラベル値のタプル（labels の順）で直接記録する。計測の多い箇所用。"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [バケットごとの件数..., 合計, 件数]
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with の中の所要時間を記録する。例外で抜けたら outcome="error"（ラベルにあれば）。"""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.labels:
+                labels = {**labels, "outcome": outcome}
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {state[-1]}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(state[-2])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = OrderedDict()
+        self._collectors = OrderedDict()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # モジュールの再読み込みなどで同じ名前を作り直した場合は既存を使う
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, name, collect):
+        """render() のたびに呼ぶ関数（その時点の値を Gauge に入れる用）。
+
+        同じ name で登録し直すと置き換える（create_app を何度呼んでも 1 つだけ残る）。
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors.values())
+            metrics = list(self._metrics.values())
+        for collect in collectors:
+            collect()
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labels=()):
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name, documentation, labels=()):
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "Time to produce the response.", ("method", "route"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "Requests currently being handled.")
+SQL_LATENCY = histogram(
+    "db_statement_duration_seconds", "SQL execute time by statement shape (_count is the statement count).",
+    ("statement",), SQL_BUCKETS,
+)
+SQL_FETCH_SECONDS = counter(
+    "db_fetch_seconds_total", "Time spent in fetchall() by statement shape.", ("statement",)
+)
+SQL_PER_REQUEST = histogram(
+    "db_statements_per_request", "SQL statements executed per request.", ("route",), COUNT_BUCKETS
+)
+SQL_TIME_PER_REQUEST = histogram(
+    "db_time_per_request_seconds", "Total SQL time per request.", ("route",), SQL_BUCKETS
+)
+
+DB_POOL_CONNECTIONS = gauge("db_pool_connections", "Pooled SQLite connections by state.", ("state",))
+DB_POOL_EVENTS = gauge("db_pool_events", "Pool waits and timeouts since start.", ("event",))
+
+
+# --- SQL ------------------------------------------------------------------
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST_RE = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.I)
+_SPACE_RE = re.compile(r"\s+")
+
+# 生の SQL -> 形。件数が上限を超えたら作り直す（動的な IN リストなどで増え続けないように）
+_shapes = {}
+
+
+def statement_shape(sql):
+    """SQL をラベル用の形に正規化する（結果はキャッシュする）。"""
+    shape = _shapes.get(sql)
+    if shape is not None:
+        return shape
+    shape = _SPACE_RE.sub(" ", sql).strip()
+    shape = _STRING_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(...)", shape)
+    shape = _VALUES_LIST_RE.sub(r"\1", shape)
+    if len(shape) > MAX_STATEMENT_LENGTH:
+        shape = shape[:MAX_STATEMENT_LENGTH] + "..."
+    if len(_shapes) >= STATEMENT_CACHE_SIZE:
+        _shapes.clear()
+    _shapes[sql] = shape
+    return shape
+
+
+# リクエスト中の [文の数, 合計秒]。リクエスト外（バックグラウンドのスレッドなど）では None
+_request_sql = contextvars.ContextVar("request_sql", default=None)
+
+
+# 実行した文そのものの記録先 [(sql, パラメータ, 秒), ...]（profiling が使う）。普段は None
+_statement_log = contextvars.ContextVar("statement_log", default=None)
+
+
+def start_statement_log():
+    """このコンテキストで実行する文を記録し始める。stop_statement_log に渡すトークンを返す。"""
+    return _statement_log.set([])
+
+
+def stop_statement_log(token):
+    """記録をやめ、記録した [(sql, パラメータ, 秒), ...] を返す。"""
+    log = _statement_log.get()
+    _statement_log.reset(token)
+    return log or []
+
+
+def _record_sql(sql, seconds, parameters=None):
+    SQL_LATENCY.observe_key((statement_shape(sql),), seconds)
+    current = _request_sql.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += seconds
+    log = _statement_log.get()
+    if log is not None:
+        log.append((sql, parameters, seconds))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """execute / executemany の時間を文の形ごとに記録するカーソル。
+
+    fetchall の時間は別のカウンタに足す。for row in cursor で読む分は含まない
+    （execute 時点の最初のステップまで）。
+    """
+
+    _last_sql = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._last_sql = sql
+            _record_sql(sql, time.perf_counter() - started, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._last_sql = sql
+            # 記録するパラメータは先頭の 1 行だけ（イテレータなら無し）
+            first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+            _record_sql(sql, time.perf_counter() - started, first)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record_sql(sql_script, time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            if self._last_sql is not None:
+                seconds = time.perf_counter() - started
+                SQL_FETCH_SECONDS.inc_key((statement_shape(self._last_sql),), seconds)
+                current = _request_sql.get()
+                if current is not None:
+                    current[1] += seconds
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.connect(factory=...) 用。execute の近道も含めて InstrumentedCursor を使う。"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# --- HTTP -----------------------------------------------------------------
+
+def _route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<unmatched>"
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_sql_token = _request_sql.set([0, 0.0])
+    HTTP_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    started = g.pop("_metrics_started", None)
+    if started is None:
+        return response
+    route = _route_label()
+    HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+
+def _teardown_request(exc=None):
+    token = g.pop("_metrics_sql_token", None)
+    if token is None:
+        return
+    HTTP_IN_FLIGHT.dec()
+    count, seconds = _request_sql.get()
+    _request_sql.reset(token)
+    route = _route_label()
+    SQL_PER_REQUEST.observe(count, route=route)
+    SQL_TIME_PER_REQUEST.observe(seconds, route=route)
+    if exc is not None:
+        # 例外で after_request が呼ばれなかった分
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+            HTTP_REQUESTS.inc(method=request.method, route=route, status=500)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def enabled(app):
+    return app.config.get("METRICS_ENABLED", False)
+
+
+def init_app(app):
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("METRICS_ENABLED", "1") != "0")
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.before_request(_before_request)
+    # after_request は登録と逆順に呼ばれる。compression より先に登録して圧縮の時間も含める
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    # 古いアプリ（とそのプール）を残さないよう弱参照で持つ
+    app_ref = weakref.ref(app)
+
+    def collect_pool():
+        current = app_ref()
+        pool = current.extensions.get("db_pool") if current is not None else None
+        if pool is None:
+            return
+        stats = pool.stats()
+        for state in ("open", "in_use", "idle"):
+            DB_POOL_CONNECTIONS.set(stats[state], state=state)
+        for event in ("waits", "timeouts"):
+            DB_POOL_EVENTS.set(stats[event], event=event)
+
+    REGISTRY.add_collector("db_pool", collect_pool)
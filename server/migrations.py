@@ -0,0 +1,308 @@
+"""番号付きスキーマ移行。
+
+create_app() から一度だけ実行する。適用済みのバージョンは schema_version
+テーブルに記録し、未適用のステップだけを順番に流す。既存の DB（テーブルは
+あるが schema_version がない）でも安全に再実行できるよう、各ステップは
+IF NOT EXISTS / カラム存在チェックで冪等にしておくこと。
+"""
+import datetime
+
+from .extensions import borrow_db, return_db
+from .ordering import keys_between
+from .schema_helpers import create_fts, rebuild_daily_totals
+
+
+def _columns(conn, table):
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _create_todos(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS todos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            is_completed BOOLEAN NOT NULL DEFAULT 0,
+            indent_level INTEGER NOT NULL DEFAULT 0,
+            section TEXT NOT NULL DEFAULT 'today',
+            display_order INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _create_work_sessions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS work_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time TIMESTAMP NOT NULL,
+            end_time TIMESTAMP,
+            duration INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'running'
+        )
+    """)
+
+
+def _create_words(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS words (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word TEXT NOT NULL,
+            meaning TEXT NOT NULL,
+            example_en TEXT,
+            example_jp TEXT,
+            pronunciation TEXT,
+            status TEXT DEFAULT 'new', -- new / learning / mastered を表す
+            next_review_date DATE,
+            level INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _add_word_memo_favorite(conn):
+    # add_word / toggle_favorite が使うが、初期 DDL には無かったカラム
+    _add_column(conn, "words", "memo", "TEXT DEFAULT ''")
+    _add_column(conn, "words", "is_favorite", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_base_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_section_order ON todos (section, display_order)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_work_sessions_status ON work_sessions (status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_work_sessions_start_time ON work_sessions (start_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_work_sessions_end_time ON work_sessions (end_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_next_review ON words (next_review_date, level)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_status ON words (status)")
+
+
+def _add_todo_sort_key(conn):
+    _add_column(conn, "todos", "sort_key", "TEXT NOT NULL DEFAULT ''")
+    rows = conn.execute(
+        "SELECT id FROM todos ORDER BY section, display_order, created_at, id"
+    ).fetchall()
+    keys = keys_between(None, None, len(rows))
+    conn.executemany(
+        "UPDATE todos SET sort_key = ? WHERE id = ?",
+        [(key, row["id"]) for key, row in zip(keys, rows)],
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_section_sort_key ON todos (section, sort_key)")
+
+
+def _add_todo_change_versions(conn):
+    # 差分同期用。todos への書き込みはトリガーで必ず版番号を進めるので、
+    # モデル側の書き込み経路（作成・更新・削除・並び替え・繰り越し）を問わず記録漏れがない
+    _add_column(conn, "todos", "version", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS todo_sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            pruned_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO todo_sync (id, version) VALUES (1, 1)")
+    conn.execute("UPDATE todos SET version = 1")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS todo_tombstones (
+            id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_version ON todos (version)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_todo_tombstones_version ON todo_tombstones (version)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_todos_version_insert AFTER INSERT ON todos
+        BEGIN
+            UPDATE todo_sync SET version = version + 1 WHERE id = 1;
+            UPDATE todos SET version = (SELECT version FROM todo_sync WHERE id = 1) WHERE id = NEW.id;
+            DELETE FROM todo_tombstones WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_todos_version_update
+        AFTER UPDATE OF content, is_completed, indent_level, section, display_order, sort_key ON todos
+        BEGIN
+            UPDATE todo_sync SET version = version + 1 WHERE id = 1;
+            UPDATE todos SET version = (SELECT version FROM todo_sync WHERE id = 1) WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_todos_version_delete AFTER DELETE ON todos
+        BEGIN
+            UPDATE todo_sync SET version = version + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO todo_tombstones (id, version)
+            VALUES (OLD.id, (SELECT version FROM todo_sync WHERE id = 1));
+        END
+    """)
+
+
+def _create_work_daily_totals(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS work_daily_totals (
+            date TEXT PRIMARY KEY,
+            duration INTEGER NOT NULL DEFAULT 0,
+            session_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    rebuild_daily_totals(conn)
+
+
+def _add_timer_generation(conn):
+    # アクティブセッションキャッシュの整合性確認用。work_sessions への書き込みで必ず進む
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS timer_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO timer_state (id, generation) VALUES (1, 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_work_sessions_generation_{event.lower()}
+            AFTER {event} ON work_sessions
+            BEGIN
+                UPDATE timer_state SET generation = generation + 1 WHERE id = 1;
+            END
+        """)
+
+
+def _create_word_lookup_cache(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS word_lookup_cache (
+            cache_key TEXT PRIMARY KEY,
+            word TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_word_lookup_cache_accessed ON word_lookup_cache (accessed_at)")
+
+
+def _create_calc_artifacts(conn):
+    # 生成済みプリントの索引。出力ディレクトリを glob / stat せずに最新や一覧を引く
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS calc_artifacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            directory TEXT NOT NULL,
+            base_name TEXT NOT NULL,
+            edition INTEGER,
+            issue_date TEXT,
+            pdf_path TEXT,
+            tex_path TEXT,
+            pdf_size INTEGER,
+            tex_size INTEGER,
+            mtime REAL NOT NULL,
+            config_key TEXT,
+            recorded_at REAL NOT NULL,
+            UNIQUE (directory, base_name)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calc_artifacts_mtime ON calc_artifacts (mtime DESC, id DESC)")
+
+
+def _create_word_reviews(conn):
+    # 単語テストの回答ログ。1 回答 1 行
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS word_reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word_id INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            prev_level INTEGER NOT NULL,
+            new_level INTEGER NOT NULL,
+            next_review_date DATE NOT NULL,
+            session_id TEXT,
+            reviewed_at TIMESTAMP NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_word_reviews_word ON word_reviews (word_id, reviewed_at)")
+
+
+def _add_word_list_indexes(conn):
+    # 一覧のキーセットページング用。絞り込み列 + (created_at, id) の範囲スキャンで 1 ページを読む
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_created ON words (created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_status_created ON words (status, created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_favorite_created ON words (is_favorite, created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_level_created ON words (level, created_at, id)")
+    # (status, created_at, id) が先頭一致で代わりになる
+    conn.execute("DROP INDEX IF EXISTS idx_words_status")
+
+
+def _create_words_fts(conn):
+    # FTS5 / trigram の無い SQLite では作らず、検索は LIKE の走査で代用する
+    create_fts(conn)
+
+
+# (バージョン, 説明, 適用関数)。バージョンは単調増加させ、既存の番号は書き換えないこと。
+MIGRATIONS = [
+    (1, "create todos", _create_todos),
+    (2, "create work_sessions", _create_work_sessions),
+    (3, "create words", _create_words),
+    (4, "add words.memo / words.is_favorite", _add_word_memo_favorite),
+    (5, "add base indexes", _add_base_indexes),
+    (6, "add todos.sort_key", _add_todo_sort_key),
+    (7, "add todo change versions and tombstones", _add_todo_change_versions),
+    (8, "create work_daily_totals rollup", _create_work_daily_totals),
+    (9, "add timer_state generation", _add_timer_generation),
+    (10, "create word_lookup_cache", _create_word_lookup_cache),
+    (11, "create calc_artifacts manifest", _create_calc_artifacts),
+    (12, "create word_reviews log", _create_word_reviews),
+    (13, "add words list indexes", _add_word_list_indexes),
+    (14, "create words_fts full-text index", _create_words_fts),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) AS v FROM schema_version").fetchone()
+    return row["v"] or 0
+
+
+def migrate(conn):
+    """未適用のステップを適用し、(最終バージョン, 今回適用したバージョン一覧) を返す。"""
+    _ensure_version_table(conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        # BEGIN IMMEDIATE で書き込みロックを取り、複数ワーカーの同時起動でも二重適用しない
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.datetime.now()),
+            )
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+    return current_version(conn), applied
+
+
+def init_app(app):
+    with app.app_context():
+        conn = borrow_db()
+        try:
+            version, applied = migrate(conn)
+        finally:
+            return_db(conn)
+    if applied:
+        app.logger.info("schema migrated to version %s (applied: %s)", version, applied)
@@ -0,0 +1,152 @@
+"""辞書順でソートできる分数インデックス（fractional indexing）キー。
+
+任意の 2 キーの間に新しいキーを生成できるので、並び替えで移動した行だけを
+更新すればよい。キーは「可変長の整数部 + 末尾が 0 でない小数部」からなる
+base62 文字列で、SQLite の BINARY 照合（バイト順）と Python の str 比較の
+どちらでも同じ順序になる。
+"""
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + "0" * 26
+
+
+def _integer_length(head):
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"invalid order key head: {head!r}")
+
+
+def _integer_part(key):
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"invalid order key: {key!r}")
+    return key[:length]
+
+
+def _validate(key):
+    if key == SMALLEST_INTEGER:
+        raise ValueError(f"invalid order key: {key!r}")
+    integer = _integer_part(key)
+    if key[len(integer):].endswith("0"):
+        raise ValueError(f"invalid order key: {key!r}")
+
+
+def _midpoint(a, b):
+    # a < b の小数部同士の中間。b が None なら上限なし
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[round(0.5 * (digit_a + digit_b))]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _increment_integer(x):
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = "0"
+    if head == "Z":
+        return "a0"
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(x):
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a, b):
+    """a < key < b となるキーを返す。a / b が None ならその側は端。"""
+    if a is not None:
+        _validate(a)
+    if b is not None:
+        _validate(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"order keys out of order: {a!r} >= {b!r}")
+
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        int_b = _integer_part(b)
+        if int_b == SMALLEST_INTEGER:
+            return int_b + _midpoint("", b[len(int_b):])
+        if int_b < b:
+            return int_b
+        result = _decrement_integer(int_b)
+        if result is None:
+            raise ValueError("cannot decrement any more")
+        return result
+
+    int_a = _integer_part(a)
+    frac_a = a[len(int_a):]
+    if b is None:
+        result = _increment_integer(int_a)
+        return int_a + _midpoint(frac_a, None) if result is None else result
+
+    int_b = _integer_part(b)
+    if int_a == int_b:
+        return int_a + _midpoint(frac_a, b[len(int_b):])
+    result = _increment_integer(int_a)
+    if result is None:
+        raise ValueError("cannot increment any more")
+    if result < b:
+        return result
+    return int_a + _midpoint(frac_a, None)
+
+
+def keys_between(a, b, n):
+    """a と b の間に昇順の n 個のキーを返す。"""
+    if n <= 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = [key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], None))
+        return keys
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(None, keys[-1]))
+        keys.reverse()
+        return keys
+    mid = n // 2
+    c = key_between(a, b)
+    return [*keys_between(a, c, mid), c, *keys_between(c, b, n - mid - 1)]
@@ -0,0 +1,350 @@
+"""リクエスト単位のプロファイラ（既定は無効）。
+
+PROFILING_ENABLED=1 のとき、次のリクエストをプロファイルする。
+
+- PROFILE_SAMPLE_RATE（0〜1）の割合でランダムに選んだリクエスト
+- X-Profile: 1 ヘッダの付いたリクエスト（応答に X-Profile-Id を付ける）
+
+プロファイラは PROFILE_MODE で選ぶ。
+
+- "sample"（既定）: 別スレッドから PROFILE_INTERVAL_MS ごとにそのリクエストの
+  スレッドのスタックを取る。オーバーヘッドが小さく、並行するリクエストも測れる
+- "cprofile": 全関数呼び出しを数える決定的プロファイラ。遅くなるうえ同時に
+  1 リクエストしか測れない（重なったリクエストは測らない）
+
+どちらもリクエスト中に実行した SQL（文・パラメータ・時間）を記録する。
+所要時間が PROFILE_SLOW_MS 以上のもの（ヘッダ指定なら常に）だけを直近
+PROFILE_BUFFER_SIZE 件までリングバッファに残し、/api/debug/profiles で一覧・詳細
+（EXPLAIN QUERY PLAN は詳細を開いた時に実行する）、pstats（snakeviz など）と
+speedscope 形式でダウンロードできる。値はワーカープロセスごと。
+"""
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, g, request
+
+from . import metrics
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_SLOW_MS = 500
+DEFAULT_BUFFER_SIZE = 50
+DEFAULT_INTERVAL_MS = 5
+# 1 リクエストで残す SQL の上限（一括更新などで膨らみすぎないように）
+MAX_STATEMENTS = 500
+MAX_PARAMETER_LENGTH = 200
+PROFILE_HEADER = "X-Profile"
+MODES = ("sample", "cprofile")
+EXPLAIN_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# cProfile はスレッドをまたいで同時に有効にできない（3.12 以降は sys.monitoring を使う）
+_cprofile_lock = threading.Lock()
+
+
+class _Sampler(threading.Thread):
+    """対象スレッドのスタックを一定間隔で取る。重みは前回のサンプルからの経過秒。"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((tuple(stack), now - last))
+            last = now
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.samples
+
+
+def samples_to_pstats(samples):
+    """サンプルを pstats の辞書にする。呼び出し回数はそのフレームが現れたサンプル数。"""
+    raw = {}
+    for stack, weight in samples:
+        seen = set()
+        last = len(stack) - 1
+        for depth, func in enumerate(stack):
+            entry = raw.setdefault(func, [0, 0.0, 0.0, {}])
+            if func not in seen:  # 再帰でも累積時間は 1 回だけ足す
+                seen.add(func)
+                entry[0] += 1
+                entry[2] += weight
+            if depth == last:
+                entry[1] += weight
+            if depth:
+                caller = entry[3].setdefault(stack[depth - 1], [0, 0.0, 0.0])
+                caller[0] += 1
+                caller[2] += weight
+                if depth == last:
+                    caller[1] += weight
+    return {
+        func: (calls, calls, tottime, cumtime,
+               {c: (n, n, ctt, cct) for c, (n, ctt, cct) in callers.items()})
+        for func, (calls, tottime, cumtime, callers) in raw.items()
+    }
+
+
+def samples_to_speedscope(samples, name):
+    """サンプルを speedscope のファイル形式（sampled プロファイル）にする。"""
+    frames, index = [], {}
+    stacks, weights = [], []
+    for stack, weight in samples:
+        ids = []
+        for func in stack:
+            if func not in index:
+                index[func] = len(frames)
+                filename, line, func_name = func
+                frames.append({"name": func_name, "file": filename, "line": line})
+            ids.append(index[func])
+        if stacks and stacks[-1] == ids:
+            weights[-1] += weight * 1000
+        else:
+            stacks.append(ids)
+            weights.append(weight * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "my-dashboard",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
+
+
+def top_functions(stats, limit=30):
+    """pstats の辞書から累積時間の大きい関数を返す。"""
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    text = str(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + "..."
+
+
+class ProfileStore:
+    """遅いリクエストのプロファイルを直近 max_size 件だけ持つリングバッファ。"""
+
+    def __init__(self, max_size=DEFAULT_BUFFER_SIZE):
+        self._profiles = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self):
+        with self._lock:
+            profiles = list(self._profiles)
+        return [profile["summary"] for profile in reversed(profiles)]
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile["summary"]["id"] == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+def get_store():
+    return current_app.extensions["profiles"]
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN の各行を "detail" の文字列で返す。実行できない文は None。"""
+    if not sql.lstrip().upper().startswith(EXPLAIN_PREFIXES):
+        return None
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters if parameters is not None else ()).fetchall()
+    except Exception as exc:
+        return [f"(EXPLAIN に失敗しました: {exc})"]
+    return [row[3] for row in rows]
+
+
+def detail(profile, conn):
+    """一覧の内容に SQL（初回はここで EXPLAIN QUERY PLAN を付ける）と上位の関数を足す。"""
+    statements = profile["statements"]
+    if not profile["explained"]:
+        plans = {}
+        for statement in statements:
+            sql = statement["sql"]
+            if sql not in plans:
+                plans[sql] = explain(conn, sql, profile["parameters"].get(sql))
+            statement["plan"] = plans[sql]
+        profile["explained"] = True
+    return {
+        **profile["summary"],
+        "statements": statements,
+        "top_functions": top_functions(profile["stats"]),
+    }
+
+
+def _should_profile(app):
+    if request.headers.get(PROFILE_HEADER, "").strip() not in ("", "0"):
+        return "header"
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    if rate > 0 and random.random() < rate:
+        return "sample"
+    return None
+
+
+def _before_request():
+    app = current_app
+    trigger = _should_profile(app)
+    if trigger is None:
+        return
+    mode = app.config["PROFILE_MODE"]
+    if mode == "cprofile":
+        if not _cprofile_lock.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = _Sampler(threading.get_ident(), app.config["PROFILE_INTERVAL_MS"] / 1000)
+        profiler.start()
+    g._profile = {
+        "id": uuid.uuid4().hex[:12],
+        "trigger": trigger,
+        "mode": mode,
+        "profiler": profiler,
+        "started": time.perf_counter(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "sql_token": metrics.start_statement_log(),
+        "status": 500,
+    }
+
+
+def _after_request(response):
+    state = g.get("_profile")
+    if state is not None:
+        state["status"] = response.status_code
+        if state["trigger"] == "header":
+            response.headers["X-Profile-Id"] = state["id"]
+    return response
+
+
+def _teardown_request(exc=None):
+    state = g.pop("_profile", None)
+    if state is None:
+        return
+    profiler = state["profiler"]
+    if state["mode"] == "cprofile":
+        profiler.disable()
+        _cprofile_lock.release()
+        profiler.create_stats()
+        stats = profiler.stats
+        samples = None
+    else:
+        samples = profiler.stop()
+        stats = None
+    duration_ms = (time.perf_counter() - state["started"]) * 1000
+    log = metrics.stop_statement_log(state["sql_token"])
+
+    app = current_app
+    if state["trigger"] != "header" and duration_ms < app.config["PROFILE_SLOW_MS"]:
+        return
+    if stats is None:
+        stats = samples_to_pstats(samples)
+
+    statements, parameters = [], {}
+    for sql, params, seconds in log[:MAX_STATEMENTS]:
+        statements.append({"sql": sql, "params": _jsonable(params), "duration_ms": round(seconds * 1000, 3)})
+        # EXPLAIN には最初に見たパラメータを使う
+        parameters.setdefault(sql, params)
+    rule = request.url_rule
+    summary = {
+        "id": state["id"],
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "route": rule.rule if rule is not None else None,
+        "status": state["status"] if exc is None else 500,
+        "duration_ms": round(duration_ms, 1),
+        "started_at": state["started_at"],
+        "mode": state["mode"],
+        "trigger": state["trigger"],
+        "sql_count": len(log),
+        "sql_ms": round(sum(seconds for _, _, seconds in log) * 1000, 3),
+        "sql_truncated": len(log) > MAX_STATEMENTS,
+        "formats": ["pstats", "speedscope"] if samples is not None else ["pstats"],
+        "pid": os.getpid(),
+    }
+    get_store().add({
+        "summary": summary,
+        "statements": statements,
+        "parameters": parameters,
+        "explained": False,
+        "stats": stats,
+        "samples": samples,
+    })
+
+
+def enabled(app):
+    return app.config.get("PROFILING_ENABLED", False)
+
+
+def init_app(app):
+    env = os.environ.get
+    app.config.setdefault("PROFILING_ENABLED", env("PROFILING_ENABLED", "0") == "1")
+    app.config.setdefault("PROFILE_MODE", env("PROFILE_MODE", "sample"))
+    app.config.setdefault("PROFILE_SAMPLE_RATE", float(env("PROFILE_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)))
+    app.config.setdefault("PROFILE_SLOW_MS", float(env("PROFILE_SLOW_MS", DEFAULT_SLOW_MS)))
+    app.config.setdefault("PROFILE_INTERVAL_MS", float(env("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)))
+    app.config.setdefault("PROFILE_BUFFER_SIZE", int(env("PROFILE_BUFFER_SIZE", DEFAULT_BUFFER_SIZE)))
+    if not app.config["PROFILING_ENABLED"]:
+        return
+    if app.config["PROFILE_MODE"] not in MODES:
+        raise ValueError(f"PROFILE_MODE must be one of {', '.join(MODES)}")
+    app.extensions["profiles"] = ProfileStore(app.config["PROFILE_BUFFER_SIZE"])
+    app.before_request(_before_request)
+    # after_request は登録と逆順に呼ばれる。compression より先に登録して圧縮の時間も含める
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
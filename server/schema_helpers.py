@@ -0,0 +1,120 @@
+"""移行（server/migrations.py）と機能の両方から使う、Flask に依存しない DB ヘルパー。
+
+移行は DISABLED_FEATURES で無効にした機能のパッケージ（blueprint を含む）を
+import しないよう、ここだけを参照する。
+
+- 作業時間の日次集計（work_daily_totals）
+- 単語の全文検索索引（words_fts）
+"""
+from datetime import datetime, timedelta
+
+FTS_COLUMNS = ("word", "meaning", "example_en", "example_jp", "memo")
+
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def split_by_day(end_time, duration):
+    """作業時間を日付ごとに配分する。
+
+    一時停止で中断しても start_time は再開時刻に書き換わるため、実働は
+    end_time から duration 秒さかのぼった連続区間とみなし、日付をまたぐ分は
+    それぞれの日に振り分ける。
+    """
+    end_time = _parse_time(end_time)
+    remaining = int(duration or 0)
+    if end_time is None or remaining <= 0:
+        return {}
+    split = {}
+    cursor = end_time
+    while remaining > 0:
+        day_start = cursor.replace(hour=0, minute=0, second=0, microsecond=0)
+        if day_start == cursor:
+            # ちょうど 0:00 は前日の終わりとして扱う（前日には丸 1 日分ある）
+            day_start -= timedelta(days=1)
+        available = int((cursor - day_start).total_seconds())
+        seconds = min(remaining, available)
+        key = day_start.date().isoformat()
+        split[key] = split.get(key, 0) + seconds
+        remaining -= seconds
+        cursor = day_start
+    return split
+
+
+def apply_daily_totals(cursor, split, sign=1):
+    if not split:
+        return
+    cursor.executemany(
+        '''
+        INSERT INTO work_daily_totals (date, duration, session_count) VALUES (?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET
+            duration = duration + excluded.duration,
+            session_count = session_count + excluded.session_count
+        ''',
+        [(date, sign * seconds, sign) for date, seconds in split.items()]
+    )
+    cursor.execute("DELETE FROM work_daily_totals WHERE session_count <= 0 AND duration <= 0")
+
+
+def rebuild_daily_totals(conn):
+    """完了済みセッションから日次集計を再計算する（コミットは呼び出し側）。"""
+    totals = {}
+    counts = {}
+    for row in conn.execute("SELECT end_time, duration FROM work_sessions WHERE status = 'completed'"):
+        for date, seconds in split_by_day(row['end_time'], row['duration']).items():
+            totals[date] = totals.get(date, 0) + seconds
+            counts[date] = counts.get(date, 0) + 1
+    conn.execute("DELETE FROM work_daily_totals")
+    conn.executemany(
+        "INSERT INTO work_daily_totals (date, duration, session_count) VALUES (?, ?, ?)",
+        [(date, totals[date], counts[date]) for date in totals]
+    )
+    return len(totals)
+
+
+def create_fts(conn):
+    """words_fts と同期トリガーを作って既存の行を索引する。作れなければ False。"""
+    columns = ", ".join(FTS_COLUMNS)
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+                {columns}, content='words', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except Exception:
+        # FTS5 なし、または trigram のない古い SQLite（3.34 未満）
+        return False
+
+    new_values = ", ".join(f"new.{name}" for name in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{name}" for name in FTS_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_words_fts_insert AFTER INSERT ON words
+        BEGIN
+            INSERT INTO words_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_words_fts_delete AFTER DELETE ON words
+        BEGIN
+            INSERT INTO words_fts (words_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    # 検索対象の列が変わった時だけ索引を張り替える（status / level の更新では触らない）
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_words_fts_update AFTER UPDATE OF {columns} ON words
+        BEGIN
+            INSERT INTO words_fts (words_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO words_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    rebuild(conn)
+    return True
+
+
+def rebuild(conn):
+    """words から索引を作り直して最適化する。"""
+    conn.execute("INSERT INTO words_fts (words_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO words_fts (words_fts) VALUES ('optimize')")
@@ -0,0 +1,154 @@
+"""本番用の起動（python -m server serve）。
+
+gunicorn があれば gthread ワーカー（プロセス × スレッド）で create_app() を動かす。
+アプリはワーカーごとに fork 後に作るので、DB 接続プール・移行の確認・静的ファイル
+パイプラインはワーカー単位で初期化される（移行は BEGIN IMMEDIATE で直列化され、
+二重には適用されない）。gunicorn が無い環境（Windows など）では waitress の
+1 プロセス・マルチスレッドで動かす。
+
+マスタープロセスへのシグナル（--pid で PID ファイルを書ける）:
+
+- HUP: 新しいワーカーを起動してから古いワーカーを順に止める（コードも読み直す）
+- TERM: 処理中のリクエストを graceful_timeout まで待ってから終了
+- INT / QUIT: すぐに終了
+
+注意: 計算プリントの生成ジョブ・単語の一括インポートの進捗・タイマーの SSE は
+プロセス内に状態を持つので、workers を 2 以上にすると別ワーカーに届いた問い合わせ
+からは見えない。既定は 1 プロセス・複数スレッド。
+
+タイマーの SSE（/api/timer/events）は開いているタブ 1 つにつきスレッドを 1 つ
+占有する。TIMER_MAX_STREAMS を指定しなければ --threads の半分を同時ストリームの
+上限にし（超えた分は 503 でクライアントはポーリングに回る）、残りのスレッドを
+他の API に残す。タブを多く開くなら --threads を増やすこと。
+"""
+import os
+import sys
+
+try:
+    import gunicorn.app.base
+except ImportError:  # gunicorn は任意。無ければ waitress
+    gunicorn = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5000
+DEFAULT_WORKERS = 1
+DEFAULT_THREADS = 8
+DEFAULT_TIMEOUT = 120
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+
+def _warm_worker(app):
+    """ワーカー起動直後に DB 接続を 1 本開いておき、最初のリクエストで待たせない。"""
+    from .extensions import borrow_db, return_db
+
+    with app.app_context():
+        conn = borrow_db()
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            return_db(conn)
+    app.logger.info("worker %s ready", os.getpid())
+
+
+def _serve_gunicorn(options):
+    from .app import create_app
+
+    class DashboardApplication(gunicorn.app.base.BaseApplication):
+        def __init__(self, settings):
+            self.settings = settings
+            self.application = None
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # fork 後のワーカーで呼ばれる
+            self.application = create_app()
+            return self.application
+
+    def post_worker_init(worker):
+        _warm_worker(worker.wsgi)
+
+    settings = {
+        "bind": f"{options.host}:{options.port}",
+        "workers": options.workers,
+        "threads": options.threads,
+        "worker_class": "gthread",
+        "timeout": options.timeout,
+        "graceful_timeout": options.graceful_timeout,
+        "max_requests": options.max_requests,
+        "max_requests_jitter": options.max_requests // 10 if options.max_requests else 0,
+        "preload_app": False,
+        "post_worker_init": post_worker_init,
+        "accesslog": "-" if options.access_log else None,
+        "errorlog": "-",
+    }
+    if options.pid:
+        settings["pidfile"] = options.pid
+    DashboardApplication(settings).run()
+
+
+def _serve_waitress(options):
+    from .app import create_app
+
+    if options.workers > 1:
+        raise SystemExit("waitress は 1 プロセスのみです（--workers 1 にするか gunicorn を入れてください）")
+    app = create_app()
+    _warm_worker(app)
+    # waitress は SIGINT / SIGTERM で処理中のリクエストを終えてから止まる
+    waitress.serve(
+        app,
+        host=options.host,
+        port=options.port,
+        threads=options.threads,
+        channel_timeout=options.timeout,
+        ident="my-dashboard",
+    )
+
+
+def serve(options):
+    server = options.server
+    if server == "auto":
+        server = "gunicorn" if gunicorn is not None else "waitress"
+    if server == "gunicorn" and gunicorn is None:
+        raise SystemExit("gunicorn がインストールされていません")
+    if server == "waitress" and waitress is None:
+        raise SystemExit("waitress がインストールされていません（gunicorn か waitress が必要です）")
+    # SSE のストリームでスレッドを使い切らないように（timer の routes は create_app で読み込まれる）
+    os.environ.setdefault("TIMER_MAX_STREAMS", str(max(1, options.threads // 2)))
+    print(
+        f"serving on http://{options.host}:{options.port} with {server} "
+        f"({options.workers} worker(s) x {options.threads} thread(s))",
+        file=sys.stderr,
+    )
+    if server == "gunicorn":
+        _serve_gunicorn(options)
+    else:
+        _serve_waitress(options)
+
+
+def add_arguments(parser):
+    env = os.environ.get
+    parser.add_argument("--host", default=env("SERVE_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(env("SERVE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=int(env("SERVE_WORKERS", DEFAULT_WORKERS)),
+                        help="プロセス数（gunicorn のみ）")
+    parser.add_argument("--threads", type=int, default=int(env("SERVE_THREADS", DEFAULT_THREADS)),
+                        help="プロセスあたりのスレッド数")
+    parser.add_argument("--timeout", type=int, default=int(env("SERVE_TIMEOUT", DEFAULT_TIMEOUT)),
+                        help="応答の無いワーカーを再起動するまでの秒数")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(env("SERVE_GRACEFUL_TIMEOUT", DEFAULT_GRACEFUL_TIMEOUT)),
+                        help="停止・再読み込み時に処理中のリクエストを待つ秒数")
+    parser.add_argument("--max-requests", type=int, default=int(env("SERVE_MAX_REQUESTS", 0)),
+                        help="この件数を処理したワーカーを入れ替える（0 で無効）")
+    parser.add_argument("--pid", default=env("SERVE_PIDFILE"), help="マスタープロセスの PID ファイル")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "waitress"), default=env("SERVE_SERVER", "auto"))
+    parser.add_argument("--access-log", action="store_true", help="アクセスログを標準出力に出す")
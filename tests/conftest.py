@@ -0,0 +1,22 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# pytest をどのディレクトリから実行しても server を import できるように
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from server.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """最新のスキーマまで移行した空の DB（Flask アプリは作らない）。"""
+    conn = sqlite3.connect(tmp_path / "test.db")
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    yield conn
+    conn.close()
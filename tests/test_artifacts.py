@@ -0,0 +1,44 @@
+import os
+
+from server.features.calculator.artifacts import ArtifactStore
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_lookup_prefers_unchanged_original(tmp_path):
+    store = ArtifactStore(tmp_path / "store", max_bytes=1 << 20)
+    pdf = write(tmp_path / "out.pdf", b"%PDF-1")
+    assert store.put("key", pdf_path=pdf)
+    paths = store.lookup("key")
+    assert paths == {"pdf_path": str(pdf.resolve()), "tex_path": None}
+    assert store.lookup("missing") is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_same_size_overwrite_falls_back_to_stored_copy(tmp_path):
+    store = ArtifactStore(tmp_path / "store", max_bytes=1 << 20)
+    pdf = write(tmp_path / "out.pdf", b"%PDF-1")
+    store.put("key", pdf_path=pdf)
+
+    # 別の設定で同じサイズの PDF に上書きされた
+    write(pdf, b"%PDF-2")
+    stat = pdf.stat()
+    os.utime(pdf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    stored = store.lookup("key")["pdf_path"]
+    assert stored != str(pdf.resolve())
+    with open(stored, "rb") as f:
+        assert f.read() == b"%PDF-1"
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    store = ArtifactStore(tmp_path / "store", max_bytes=10)
+    first = write(tmp_path / "first.pdf", b"a" * 8)
+    second = write(tmp_path / "second.pdf", b"b" * 8)
+    store.put("first", pdf_path=first)
+    store.put("second", pdf_path=second)
+    assert store.lookup("first") is None
+    assert store.lookup("second") is not None
+    assert store.stats()["bytes"] == 8
@@ -0,0 +1,65 @@
+import threading
+
+from server.features.calculator.jobs import CalcJob, CalcJobQueue
+
+
+def wait_finished(queue, job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        current = queue.get(job.id)
+        if current is not None and current.finished:
+            return current
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_runs_and_completes():
+    def runner(job):
+        job.stdout = "ok"
+
+    queue = CalcJobQueue(runner)
+    job, coalesced = queue.submit("key")
+    assert not coalesced
+    done = wait_finished(queue, job)
+    assert done.state == "completed"
+    assert done.finished_at >= done.started_at
+    assert done.to_dict()["stdout"] == "ok"
+
+
+def test_failed_job_records_error():
+    def runner(job):
+        raise RuntimeError("boom")
+
+    queue = CalcJobQueue(runner)
+    job, _ = queue.submit("key")
+    done = wait_finished(queue, job)
+    assert done.state == "failed"
+    assert done.error == "boom"
+    assert done.finished_at is not None
+
+
+def test_same_key_is_coalesced_while_running():
+    release = threading.Event()
+    queue = CalcJobQueue(lambda job: release.wait(5))
+    first, _ = queue.submit("key")
+    second, coalesced = queue.submit("key")
+    other, other_coalesced = queue.submit("other")
+    assert coalesced and second is first
+    assert not other_coalesced and other is not first
+    release.set()
+    wait_finished(queue, first)
+    wait_finished(queue, other)
+    third, coalesced = queue.submit("key")
+    assert not coalesced and third is not first
+    wait_finished(queue, third)
+
+
+def test_prune_skips_jobs_without_finish_time():
+    # 状態だけ先に変わった瞬間の job を _prune が見ても落ちない
+    queue = CalcJobQueue(lambda job: None, retention_seconds=0)
+    job = CalcJob("key")
+    job.state = "completed"
+    queue._jobs[job.id] = job
+    assert queue.get(job.id) is job
+
+    job.finished_at = 0
+    assert queue.get(job.id) is None
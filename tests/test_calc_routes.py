@@ -0,0 +1,98 @@
+import os
+import subprocess
+import threading
+
+import pytest
+
+from server.app import create_app
+from server.features.calculator import routes
+from server.features.calculator.artifacts import ArtifactStore
+from server.features.calculator.config_store import ConfigStore
+from server.features.calculator.jobs import CalcJobQueue
+
+CONFIG = {"scheduler": {"edition": 2, "start_date": "2026/04/01"}, "output": {}, "categories": {}}
+
+
+@pytest.fixture
+def calc(tmp_path, monkeypatch):
+    out_dir = tmp_path / "output"
+    out_dir.mkdir()
+    script = tmp_path / "create_worksheet.py"
+    script.write_text("print('worksheet')\n", encoding="utf-8")
+    runs = []
+
+    def fake_run_script():
+        # 実行ごとに同じ名前の出力を書き直す本物のスクリプトの代わり
+        pdf = out_dir / "worksheet.pdf"
+        tex = out_dir / "worksheet.tex"
+        pdf.write_bytes(b"%PDF-" + str(len(runs)).encode())
+        tex.write_text("\\documentclass{article}", encoding="utf-8")
+        # 粗い mtime のファイルシステムでも実行ごとに変わるようにする
+        mtime = 1_700_000_000_000_000_000 + len(runs) * 1_000_000_000
+        os.utime(pdf, ns=(mtime, mtime))
+        runs.append(pdf)
+        return subprocess.CompletedProcess([], 0, f"OUTPUT::{pdf}::{tex}\n", "")
+
+    monkeypatch.setattr(routes, "SCRIPT_PATH", script)
+    monkeypatch.setattr(routes, "config_store", ConfigStore(tmp_path / "config.json"))
+    monkeypatch.setattr(routes, "artifacts", ArtifactStore(tmp_path / "cache", max_bytes=1 << 20))
+    monkeypatch.setattr(routes, "jobs", CalcJobQueue(routes.build_worksheet))
+    monkeypatch.setattr(routes, "run_script", fake_run_script)
+    app = create_app({"DATABASE": str(tmp_path / "calc.db"), "ASSET_CACHE_DIR": "", "DISABLED_FEATURES": []})
+    client = app.test_client()
+    assert client.post("/api/calc-config", json=CONFIG).status_code == 200
+    client.runs = runs
+    return client
+
+
+def wait_job(client, job_id, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        job = client.get(f"/api/calc-run/{job_id}").get_json()
+        if job["state"] in ("completed", "failed"):
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_run_is_queued_then_served_from_cache(calc):
+    started = calc.post("/api/calc-run")
+    assert started.status_code == 202
+    assert started.get_json()["cached"] is False
+    job = wait_job(calc, started.get_json()["id"])
+    assert job["state"] == "completed"
+    assert job["pdf_path"].endswith("worksheet.pdf")
+
+    latest = calc.get("/api/calc-artifacts/latest").get_json()
+    assert latest["pdf_path"] == job["pdf_path"]
+
+    cached = calc.post("/api/calc-run")
+    assert cached.status_code == 200
+    assert cached.get_json()["cached"] is True
+    assert cached.get_json()["pdf_path"] == job["pdf_path"]
+    assert len(calc.runs) == 1
+
+
+def test_force_and_config_change_run_again(calc):
+    wait_job(calc, calc.post("/api/calc-run").get_json()["id"])
+    forced = calc.post("/api/calc-run", json={"force": True})
+    assert forced.status_code == 202
+    wait_job(calc, forced.get_json()["id"])
+
+    calc.post("/api/calc-config", json={**CONFIG, "scheduler": {"edition": 3}})
+    changed = calc.post("/api/calc-run")
+    assert changed.status_code == 202
+    wait_job(calc, changed.get_json()["id"])
+    assert len(calc.runs) == 3
+
+    # 上書きされた出力ではなく、最初の設定の保存コピーを返す
+    calc.post("/api/calc-config", json=CONFIG)
+    cached = calc.post("/api/calc-run").get_json()
+    assert cached["cached"] is True
+    with open(cached["pdf_path"], "rb") as f:
+        assert f.read() == b"%PDF-1"
+
+
+def test_unknown_job_and_bad_cursor(calc):
+    assert calc.get("/api/calc-run/missing").status_code == 404
+    assert calc.get("/api/calc-artifacts?cursor=bogus").status_code == 400
+    assert calc.get("/api/calc-artifacts/latest").status_code == 404
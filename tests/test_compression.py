@@ -0,0 +1,64 @@
+from server.app import create_app
+from server.compression import matching_etag, strip_encoding_suffix
+from werkzeug.http import parse_etags
+
+
+def make_client(tmp_path):
+    app = create_app({"DATABASE": str(tmp_path / "compress.db"), "ASSET_CACHE_DIR": "", "COMPRESS_MIN_BYTES": 1})
+    return app, app.test_client()
+
+
+def test_gzip_response_gets_its_own_etag(tmp_path):
+    app, client = make_client(tmp_path)
+    plain = client.get("/api/todos", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/api/todos", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    plain_tag, _ = plain.get_etag()
+    gzip_tag, _ = gzipped.get_etag()
+    assert gzip_tag == plain_tag + "-gz"
+
+
+def test_if_none_match_accepts_encoded_etag(tmp_path):
+    app, client = make_client(tmp_path)
+    first = client.get("/api/todos", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["ETag"]
+    again = client.get("/api/todos", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    client.post("/api/todos", json={"content": "牛乳を買う", "section": "today"})
+    changed = client.get("/api/todos", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert changed.status_code == 200
+
+
+def test_matching_etag():
+    assert strip_encoding_suffix("todos-3-br") == "todos-3"
+    assert strip_encoding_suffix("todos-3") == "todos-3"
+    assert matching_etag(parse_etags('"todos-3-gz"'), "todos-3") == "todos-3-gz"
+    assert matching_etag(parse_etags('"todos-2-gz"'), "todos-3") is None
+    assert matching_etag(parse_etags("*"), "todos-3") == "todos-3"
+
+
+def test_if_match_accepts_encoded_etag(tmp_path, monkeypatch):
+    from server.features.calculator import routes
+    from server.features.calculator.config_store import ConfigStore
+
+    monkeypatch.setattr(routes, "config_store", ConfigStore(tmp_path / "config.json"))
+    app = create_app({
+        "DATABASE": str(tmp_path / "calc.db"),
+        "ASSET_CACHE_DIR": "",
+        "DISABLED_FEATURES": [],
+        "COMPRESS_MIN_BYTES": 1,
+    })
+    client = app.test_client()
+    config = {"scheduler": {"edition": 1}, "output": {}, "categories": {}}
+    assert client.post("/api/calc-config", json=config).status_code == 200
+
+    current = client.get("/api/calc-config", headers={"Accept-Encoding": "gzip"})
+    assert current.headers["ETag"].endswith('-gz"')
+    config["scheduler"]["edition"] = 2
+    saved = client.post("/api/calc-config", json=config, headers={"If-Match": current.headers["ETag"]})
+    assert saved.status_code == 200
+    stale = client.post("/api/calc-config", json=config, headers={"If-Match": current.headers["ETag"]})
+    assert stale.status_code == 412
@@ -0,0 +1,126 @@
+import copy
+import json
+import os
+
+import pytest
+
+from server.features.calculator.config_store import (
+    ConfigConflict,
+    ConfigInvalid,
+    ConfigNotFound,
+    ConfigStore,
+    validate_config,
+)
+
+VALID = {
+    "scheduler": {"edition": 3, "start_date": "2026/04/01", "num_days": 5, "notes": ["休み明け"]},
+    "output": {"directory": "output"},
+    "categories": {
+        "addition": {"per_day": 10, "min_difficulty": 1, "max_difficulty": 3},
+        "division": {"count": 0},
+    },
+}
+
+
+def with_changes(section, **changes):
+    data = copy.deepcopy(VALID)
+    data[section].update(changes)
+    return data
+
+
+def test_valid_config_has_no_errors():
+    assert validate_config(VALID) == []
+
+
+@pytest.mark.parametrize("data", [[], "config", None])
+def test_non_object_is_rejected(data):
+    assert validate_config(data) == ["設定は JSON オブジェクトである必要があります"]
+
+
+def test_missing_sections_are_listed():
+    errors = validate_config({"scheduler": {}})
+    assert len(errors) == 1
+    assert "output" in errors[0] and "categories" in errors[0]
+
+
+@pytest.mark.parametrize("data, field", [
+    (with_changes("scheduler", edition=0), "scheduler.edition"),
+    (with_changes("scheduler", edition=True), "scheduler.edition"),
+    (with_changes("scheduler", edition="3"), "scheduler.edition"),
+    (with_changes("scheduler", start_date="April 1"), "scheduler.start_date"),
+    (with_changes("scheduler", num_days=0), "scheduler.num_days"),
+    (with_changes("scheduler", notes=["ok", 1]), "scheduler.notes"),
+    (with_changes("output", directory="  "), "output.directory"),
+    (with_changes("categories", addition={"per_day": -1}), "categories.addition.per_day"),
+    (with_changes("categories", addition={"min_difficulty": 4, "max_difficulty": 2}), "categories.addition"),
+    (with_changes("categories", addition={"max_difficulty": 6}), "categories.addition"),
+    (with_changes("categories", addition=[]), "categories.addition"),
+])
+def test_invalid_fields(data, field):
+    errors = validate_config(data)
+    assert len(errors) == 1
+    assert errors[0].startswith(field)
+
+
+def test_optional_fields_may_be_omitted():
+    data = {"scheduler": {}, "output": {}, "categories": {}}
+    assert validate_config(data) == []
+    assert validate_config(with_changes("scheduler", notes="1 行", start_date="")) == []
+
+
+def test_errors_from_every_section_are_collected():
+    data = {"scheduler": [], "output": "out", "categories": 1}
+    assert len(validate_config(data)) == 3
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConfigStore(tmp_path / "config.json")
+
+
+def test_missing_file(store):
+    with pytest.raises(ConfigNotFound):
+        store.load()
+
+
+def test_write_then_load_round_trips(store):
+    etag = store.write(VALID)
+    data, current, errors = store.snapshot()
+    assert data == VALID
+    assert current == etag
+    assert errors == []
+    # 書いた直後の読み込みはファイルを読み直さない
+    assert store.stats()["reloads"] == 0
+
+
+def test_write_rejects_invalid_config_and_keeps_file(store):
+    store.write(VALID)
+    with pytest.raises(ConfigInvalid) as excinfo:
+        store.write(with_changes("scheduler", edition=0))
+    assert excinfo.value.errors == ["scheduler.edition は 1 以上の整数です"]
+    assert json.loads(store.path.read_text(encoding="utf-8")) == VALID
+
+
+def test_if_match_detects_conflicts(store):
+    etag = store.write(VALID)
+    new_etag = store.write(with_changes("scheduler", edition=4), if_match=etag)
+    with pytest.raises(ConfigConflict) as excinfo:
+        store.write(VALID, if_match=etag)
+    assert excinfo.value.current_etag == new_etag
+
+
+def test_reloads_only_when_file_changes(store):
+    store.path.write_text(json.dumps(VALID), encoding="utf-8")
+    store.load()
+    store.load()
+    assert store.stats()["reloads"] == 1
+    assert store.stats()["hits"] == 1
+
+    invalid = with_changes("scheduler", num_days=0)
+    store.path.write_text(json.dumps(invalid, ensure_ascii=False), encoding="utf-8")
+    stat = store.path.stat()
+    os.utime(store.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    data, _, errors = store.snapshot()
+    assert data == invalid
+    assert errors == ["scheduler.num_days は 1 以上の整数です"]
+    assert store.stats()["reloads"] == 2
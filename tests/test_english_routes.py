@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+from server.app import create_app
+from server.features.english import bulk, models, services
+from server.features.english.cache import WordLookupCache, get_lookup_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app({"DATABASE": str(tmp_path / "words.db"), "ASSET_CACHE_DIR": "", "DISABLED_FEATURES": []})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_words(app, *pairs):
+    with app.app_context():
+        models.add_words([{"word": word, "meaning": meaning} for word, meaning in pairs])
+
+
+def wait_import(client, job_id, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        job = client.get(f"/api/english/import/{job_id}").get_json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("import did not finish")
+
+
+def test_import_skips_existing_and_reuses_cache(app, client, monkeypatch):
+    add_words(app, ("apple", "りんご"))
+    with app.app_context():
+        # banana だけは生成済みとしてキャッシュに入れておく
+        key = WordLookupCache.make_key("banana", services.MODEL_NAME, services.PROMPT_VERSION)
+        get_lookup_cache().put(key, "banana", services.MODEL_NAME, services.PROMPT_VERSION,
+                               {"word": "banana", "meaning": "バナナ"})
+
+    requested = []
+
+    def fake_batch(words):
+        requested.append(list(words))
+        found = {word: {"word": word, "meaning": f"{word} の意味"} for word in words if word != "broken"}
+        return found, {"broken": "missing from response"} if "broken" in words else {}
+
+    monkeypatch.setattr(services, "generate_words_info_batch", fake_batch)
+    monkeypatch.setattr(bulk, "BACKOFF_SECONDS", 0)
+
+    response = client.post("/api/english/import", json={"text": "Apple\nbanana\ncherry\n\ncherry\nbroken"})
+    assert response.status_code == 202
+    job = wait_import(client, response.get_json()["id"])
+    assert job["status"] == "completed"
+    assert (job["skipped"], job["cached"], job["generated"], job["failed"]) == (1, 1, 1, 1)
+    assert job["inserted"] == 2
+    # 失敗した語だけを再試行する
+    assert requested == [["cherry", "broken"]] + [["broken"]] * (bulk.MAX_ATTEMPTS - 1)
+
+    words = {word["word"] for word in client.get("/api/english/list").get_json()}
+    assert words == {"apple", "banana", "cherry"}
+    assert client.post("/api/english/import", json={}).status_code == 400
+    assert client.get("/api/english/import/missing").status_code == 404
+
+
+def test_review_batch_validates_and_applies(app, client):
+    add_words(app, ("apple", "りんご"), ("pear", "なし"))
+    ids = {word["word"]: word["id"] for word in client.get("/api/english/list").get_json()}
+
+    bad = client.post("/api/english/review/batch", json={"results": [{"id": ids["apple"], "result": "maybe"}]})
+    assert bad.status_code == 400
+    assert client.post("/api/english/review/batch", json={"results": []}).status_code == 400
+
+    response = client.post("/api/english/review/batch", json={"results": [
+        {"id": ids["apple"], "result": "ok"},
+        {"id": ids["pear"], "result": "ng"},
+    ]})
+    assert response.status_code == 200
+    apple = client.get(f"/api/english/word/{ids['apple']}").get_json()
+    pear = client.get(f"/api/english/word/{ids['pear']}").get_json()
+    assert apple["level"] == 1
+    assert pear["level"] == 0
+
+
+def test_list_cursor_walks_every_word_once(app, client):
+    add_words(app, *[(f"word{i}", f"意味{i}") for i in range(5)])
+    everything = [word["id"] for word in client.get("/api/english/list").get_json()]
+
+    seen, cursor = [], None
+    while True:
+        query = "/api/english/list?limit=2&fields=word" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(query).get_json()
+        assert all(set(item) == {"id", "word", "created_at"} for item in page["items"])
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == everything
+    assert client.get("/api/english/list?cursor=bogus").status_code == 400
+    assert client.get("/api/english/list?fields=password").status_code == 400
+
+
+def test_search_matches_long_and_short_terms(app, client):
+    add_words(app, ("apple", "りんご"), ("pineapple", "パイナップル"), ("grape", "ぶどう"))
+
+    found = client.get("/api/english/search?q=apple").get_json()
+    assert [item["word"] for item in found["items"]] == ["apple", "pineapple"]
+    assert found["items"][0]["highlights"]["word"] == "<mark>apple</mark>"
+
+    short = client.get("/api/english/search?q=りん").get_json()
+    assert [item["word"] for item in short["items"]] == ["apple"]
+
+    paged = client.get("/api/english/search?q=apple&limit=1").get_json()
+    assert len(paged["items"]) == 1 and paged["next_offset"] == 1
+    assert client.get("/api/english/search?q=").status_code == 400
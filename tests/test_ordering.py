@@ -0,0 +1,78 @@
+import random
+import sqlite3
+
+import pytest
+
+from server.ordering import INTEGER_ZERO, key_between, keys_between
+
+
+def test_first_key_is_integer_zero():
+    assert key_between(None, None) == INTEGER_ZERO
+
+
+@pytest.mark.parametrize("a, b", [
+    ("a0", None),
+    (None, "a0"),
+    ("a0", "a1"),
+    ("a0", "a0V"),
+    ("a0V", "a1"),
+    ("Zz", "a0"),
+    ("a0", "a01"),
+])
+def test_key_between_is_strictly_between(a, b):
+    key = key_between(a, b)
+    assert a is None or a < key
+    assert b is None or key < b
+
+
+def test_repeated_inserts_stay_ordered():
+    rng = random.Random(0)
+    keys = [key_between(None, None)]
+    for _ in range(500):
+        i = rng.randint(0, len(keys))
+        a = keys[i - 1] if i > 0 else None
+        b = keys[i] if i < len(keys) else None
+        keys.insert(i, key_between(a, b))
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+def test_append_and_prepend_many():
+    keys = ["a0"]
+    for _ in range(200):
+        keys.append(key_between(keys[-1], None))
+        keys.insert(0, key_between(None, keys[0]))
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+@pytest.mark.parametrize("a, b", [(None, None), ("a0", None), (None, "a0"), ("a0", "a1"), ("a0", "a0V")])
+@pytest.mark.parametrize("n", [0, 1, 2, 7, 64])
+def test_keys_between(a, b, n):
+    keys = keys_between(a, b, n)
+    assert len(keys) == n
+    assert keys == sorted(keys)
+    assert len(set(keys)) == n
+    if keys:
+        assert a is None or a < keys[0]
+        assert b is None or keys[-1] < b
+
+
+def test_sqlite_binary_order_matches_python():
+    keys = keys_between(None, None, 100) + [key_between(None, "a0"), key_between("Zz", "a0")]
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (k TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(k,) for k in keys])
+    assert [row[0] for row in conn.execute("SELECT k FROM t ORDER BY k")] == sorted(keys)
+
+
+@pytest.mark.parametrize("a, b", [("a1", "a0"), ("a0", "a0")])
+def test_out_of_order_bounds_are_rejected(a, b):
+    with pytest.raises(ValueError):
+        key_between(a, b)
+
+
+@pytest.mark.parametrize("key", ["a10", "a", "!0"])
+def test_invalid_keys_are_rejected(key):
+    with pytest.raises(ValueError):
+        key_between(key, None)
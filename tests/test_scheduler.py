@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from server.features.english import scheduler
+from server.features.english.scheduler import (
+    FSRSScheduler,
+    LadderScheduler,
+    ReviewHistory,
+    SM2Scheduler,
+    get_scheduler,
+    replay,
+)
+
+OK, AMBIGUOUS, NG = 2, 1, 0
+DAY0 = 20000.25  # 1970-01-01 からの日数（2024-10-04 の 6 時）
+
+
+def history(*words):
+    """(語 id, 最初の prev_level, [(grade, 日), ...]) から ReviewHistory を作る。"""
+    word_ids, grades, days, prev_levels = [], [], [], []
+    for word_id, prev_level, reviews in words:
+        for grade, day in reviews:
+            word_ids.append(word_id)
+            grades.append(grade)
+            days.append(DAY0 + day)
+            prev_levels.append(prev_level)
+    return ReviewHistory(
+        np.array(word_ids, dtype=np.int64),
+        np.array(grades, dtype=np.int64),
+        np.array(days, dtype=np.float64),
+        np.array(prev_levels, dtype=np.int64),
+    )
+
+
+def due_offset(due, last_day):
+    """次回の復習日が、最後の回答日から何日後か。"""
+    last = int(np.floor(DAY0 + last_day))
+    return int(np.datetime64(due, "D").astype(np.int64)) - last
+
+
+def test_ladder_levels_and_intervals():
+    ids, level, status, due = replay(history((1, 0, [(OK, 0), (OK, 1), (OK, 4)])), LadderScheduler())
+    assert ids.tolist() == [1]
+    assert level.tolist() == [3]
+    assert status.tolist() == ["learning"]
+    assert due_offset(due[0], 4) == 7
+
+
+def test_ladder_mastered_only_after_ok():
+    ids, level, status, _ = replay(
+        history(
+            (1, 4, [(OK, 0)]),
+            (2, 5, [(AMBIGUOUS, 0)]),
+            (3, 6, [(NG, 0)]),
+        ),
+        LadderScheduler(),
+    )
+    assert level.tolist() == [5, 4, 0]
+    assert status.tolist() == ["mastered", "learning", "learning"]
+
+
+def test_ladder_ambiguous_and_ng():
+    _, level, _, due = replay(
+        history((1, 3, [(AMBIGUOUS, 0)]), (2, 3, [(NG, 0)])),
+        LadderScheduler(),
+    )
+    assert level.tolist() == [2, 0]
+    assert due_offset(due[0], 0) == 1
+    assert due_offset(due[1], 0) == 0
+
+
+@pytest.mark.parametrize("name", sorted(scheduler.SCHEDULERS))
+def test_vectorized_replay_matches_per_word_replay(name):
+    rng = np.random.default_rng(1)
+    words = []
+    for word_id in range(1, 41):
+        count = int(rng.integers(1, 12))
+        days = np.cumsum(rng.integers(0, 10, size=count)) + rng.random(count) * 0.5
+        grades = rng.integers(0, 3, size=count)
+        words.append((word_id, int(rng.integers(0, 6)), list(zip(grades.tolist(), days.tolist()))))
+
+    together = replay(history(*words), get_scheduler(name))
+    for i, word in enumerate(words):
+        alone = replay(history(word), get_scheduler(name))
+        assert [part[i] for part in together] == [part[0] for part in alone]
+
+
+def test_sm2_interval_growth():
+    reviews = [(OK, 0), (OK, 1), (OK, 7)]
+    _, _, _, due = replay(history((1, 0, reviews)), SM2Scheduler())
+    # 1 日 → 6 日 → round(6 × 2.7) 日（ease は正解ごとに +0.1）
+    assert due_offset(due[0], 7) == 16
+
+
+def test_sm2_failure_resets_and_ease_floor():
+    sched = SM2Scheduler()
+    state = sched.init_state(np.array([3]))
+    idx = np.array([0])
+    for _ in range(20):
+        interval = sched.review(state, idx, np.array([NG]), np.array([1.0]), np.array([0]))
+    assert interval.tolist() == [1.0]
+    assert state["reps"].tolist() == [0]
+    assert state["ease"].tolist() == [sched.params["min_ease"]]
+
+
+def test_fsrs_first_review_uses_initial_stability():
+    sched = FSRSScheduler()
+    _, _, _, due = replay(history((1, 0, [(OK, 0)]), (2, 0, [(NG, 0)])), sched)
+    # 目標想起率 0.9 では間隔 ≒ 安定度。Good の初期安定度は weights[2]
+    assert due_offset(due[0], 0) == round(sched.params["weights"][2])
+    assert due_offset(due[1], 0) == 0
+
+
+def test_fsrs_higher_retention_shortens_intervals():
+    reviews = [(OK, 0), (OK, 4), (OK, 15)]
+    _, _, _, loose = replay(history((1, 0, reviews)), FSRSScheduler(retention=0.8))
+    _, _, _, strict = replay(history((1, 0, reviews)), FSRSScheduler(retention=0.95))
+    assert due_offset(strict[0], 15) < due_offset(loose[0], 15)
+
+
+def test_replay_of_empty_history():
+    ids, level, status, due = replay(history(), LadderScheduler())
+    assert len(ids) == len(level) == len(status) == len(due) == 0
+
+
+def test_get_scheduler_params():
+    assert get_scheduler("sm2", '{"initial_ease": 2.0}').params["initial_ease"] == 2.0
+    assert get_scheduler("fsrs", "").params["retention"] == 0.9
+    with pytest.raises(ValueError):
+        get_scheduler("nope")
+    with pytest.raises(ValueError):
+        get_scheduler("ladder", {"ease": 1})
+    with pytest.raises(ValueError):
+        FSRSScheduler(weights=(1.0, 2.0))
+
+
+def test_reschedule_writes_words(conn):
+    with conn:
+        conn.execute("INSERT INTO words (id, word, meaning, status, level) VALUES (1, 'apple', 'りんご', 'new', 0)")
+        conn.execute("INSERT INTO words (id, word, meaning, status, level) VALUES (2, 'pear', 'なし', 'new', 0)")
+        conn.executemany(
+            "INSERT INTO word_reviews (word_id, result, prev_level, new_level, next_review_date, reviewed_at) "
+            "VALUES (1, ?, ?, ?, ?, ?)",
+            [
+                ("ok", 0, 1, "2026-01-02", "2026-01-01 09:00:00"),
+                ("ok", 1, 2, "2026-01-05", "2026-01-02 09:00:00"),
+            ],
+        )
+    result = scheduler.reschedule(conn, LadderScheduler())
+    assert (result["words"], result["reviews"]) == (1, 2)
+    rows = {row["id"]: row for row in conn.execute("SELECT id, status, level, next_review_date FROM words")}
+    assert (rows[1]["status"], rows[1]["level"], rows[1]["next_review_date"]) == ("learning", 2, "2026-01-05")
+    # ログの無い語は変えない
+    assert (rows[2]["status"], rows[2]["level"]) == ("new", 0)
+
+
+@pytest.mark.parametrize("name, days", [("ladder", 1), ("fsrs", 4)])
+def test_review_batch_uses_scheduler_from_app_config(tmp_path, monkeypatch, name, days):
+    from datetime import date, timedelta
+
+    from server.app import create_app
+
+    monkeypatch.delenv("WORD_SCHEDULER", raising=False)
+    app = create_app({"DATABASE": str(tmp_path / "words.db"), "ASSET_CACHE_DIR": "", "WORD_SCHEDULER": name})
+    with app.app_context():
+        from server.extensions import get_db
+
+        db = get_db()
+        db.execute("INSERT INTO words (id, word, meaning, status, level) VALUES (1, 'apple', 'りんご', 'new', 0)")
+        db.commit()
+    client = app.test_client()
+    response = client.post("/api/english/review/batch", json={"results": [{"id": 1, "result": "ok"}]})
+    assert response.status_code == 200
+    word = client.get("/api/english/word/1").get_json()
+    assert word["next_review_date"] == (date.today() + timedelta(days=days)).isoformat()
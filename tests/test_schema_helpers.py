@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from server.schema_helpers import apply_daily_totals, rebuild_daily_totals, split_by_day
+
+
+@pytest.mark.parametrize("end_time, duration, expected", [
+    (datetime(2026, 1, 2, 10, 0), 3600, {"2026-01-02": 3600}),
+    # 日付をまたぐ分は前日に回す
+    (datetime(2026, 1, 2, 1, 0), 7200, {"2026-01-02": 3600, "2026-01-01": 3600}),
+    # ちょうど 0:00 に終わったら全部前日
+    (datetime(2026, 1, 2, 0, 0), 60, {"2026-01-01": 60}),
+    # 2 日以上
+    (datetime(2026, 1, 3, 12, 0), 2 * 86400, {"2026-01-03": 43200, "2026-01-02": 86400, "2026-01-01": 43200}),
+    ("2026-01-02 10:00:00.500000", 90, {"2026-01-02": 90}),
+    (datetime(2026, 1, 2, 10, 0), 0, {}),
+    (datetime(2026, 1, 2, 10, 0), None, {}),
+    (None, 3600, {}),
+])
+def test_split_by_day(end_time, duration, expected):
+    assert split_by_day(end_time, duration) == expected
+
+
+def test_split_by_day_preserves_total():
+    split = split_by_day(datetime(2026, 3, 10, 5, 30, 15), 123456)
+    assert sum(split.values()) == 123456
+
+
+def _totals(conn):
+    return {
+        row["date"]: (row["duration"], row["session_count"])
+        for row in conn.execute("SELECT date, duration, session_count FROM work_daily_totals")
+    }
+
+
+def test_incremental_totals_match_rebuild(conn):
+    sessions = [
+        (datetime(2026, 1, 1, 9, 0), datetime(2026, 1, 1, 10, 0), 3600),
+        (datetime(2026, 1, 1, 23, 0), datetime(2026, 1, 2, 1, 0), 7200),
+        (datetime(2026, 1, 2, 8, 0), datetime(2026, 1, 2, 8, 30), 1800),
+    ]
+    cursor = conn.cursor()
+    for start, end, duration in sessions:
+        cursor.execute(
+            "INSERT INTO work_sessions (start_time, end_time, duration, status) VALUES (?, ?, ?, 'completed')",
+            (start, end, duration),
+        )
+        apply_daily_totals(cursor, split_by_day(end, duration))
+    conn.commit()
+    incremental = _totals(conn)
+    assert incremental == {"2026-01-01": (7200, 2), "2026-01-02": (5400, 2)}
+
+    assert rebuild_daily_totals(conn) == 2
+    assert _totals(conn) == incremental
+
+
+def test_subtracting_a_session_removes_empty_days(conn):
+    cursor = conn.cursor()
+    split = split_by_day(datetime(2026, 1, 2, 1, 0), 7200)
+    apply_daily_totals(cursor, split)
+    apply_daily_totals(cursor, {"2026-01-02": 600})
+    apply_daily_totals(cursor, split, sign=-1)
+    assert _totals(conn) == {"2026-01-02": (600, 1)}
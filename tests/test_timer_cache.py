@@ -0,0 +1,30 @@
+import sqlite3
+
+from server.app import create_app
+
+
+def test_external_writes_are_seen_after_the_check_interval(tmp_path):
+    db_path = tmp_path / "timer.db"
+    app = create_app({"DATABASE": str(db_path), "ASSET_CACHE_DIR": "", "TIMER_CACHE_CHECK_INTERVAL": 60})
+    client = app.test_client()
+    session_id = client.post("/api/timer/start").get_json()["id"]
+    assert client.get("/api/timer/status").get_json()["status"] == "running"
+
+    # 別プロセスが停止した
+    other = sqlite3.connect(db_path)
+    with other:
+        other.execute("UPDATE work_sessions SET status = 'completed' WHERE id = ?", (session_id,))
+    other.close()
+
+    lookup = app.extensions["timer_session_cache"]
+    # 間隔内は照合せずキャッシュを返す
+    assert client.get("/api/timer/status").get_json()["status"] == "running"
+    loads = lookup.stats()["loads"]
+
+    lookup.check_interval = 0
+    assert client.get("/api/timer/status").get_json() is None
+    assert lookup.stats()["loads"] == loads + 1
+
+    # 世代が変わっていなければ読み直さない
+    client.get("/api/timer/status")
+    assert lookup.stats()["loads"] == loads + 1
@@ -0,0 +1,49 @@
+from server.app import create_app
+from server.features.timer import routes
+from server.features.timer.events import hub
+
+
+def test_streams_above_the_cap_get_503(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "MAX_STREAMS", 1)
+    app = create_app({"DATABASE": str(tmp_path / "timer.db"), "ASSET_CACHE_DIR": ""})
+    client = app.test_client()
+
+    first = client.get("/api/timer/events", buffered=False)
+    assert first.status_code == 200
+    assert next(first.response).decode().startswith("retry: 5000\nevent: state\n")
+
+    second = client.get("/api/timer/events")
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == str(routes.STREAM_RETRY_SECONDS)
+
+    first.close()
+    assert hub.subscriber_count == 0
+    third = client.get("/api/timer/events", buffered=False)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_stream_ends_at_its_lifetime(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "STREAM_MAX_SECONDS", 0.2)
+    monkeypatch.setattr(routes, "HEARTBEAT_SECONDS", 0.05)
+    app = create_app({"DATABASE": str(tmp_path / "timer.db"), "ASSET_CACHE_DIR": ""})
+    response = app.test_client().get("/api/timer/events")
+    body = response.get_data(as_text=True)
+    response.close()
+    assert body.startswith("retry: 5000\nevent: state\n")
+    assert ": heartbeat" in body
+    assert hub.subscriber_count == 0
+
+
+def test_transitions_are_pushed_to_subscribers(tmp_path):
+    app = create_app({"DATABASE": str(tmp_path / "timer.db"), "ASSET_CACHE_DIR": ""})
+    client = app.test_client()
+    stream = client.get("/api/timer/events", buffered=False)
+    chunks = iter(stream.response)
+    assert '"session": null' in next(chunks).decode()
+
+    assert client.post("/api/timer/start").status_code == 200
+    pushed = next(chunks).decode()
+    assert pushed.startswith("event: state\n")
+    assert '"status": "running"' in pushed
+    stream.close()
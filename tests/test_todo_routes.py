@@ -0,0 +1,78 @@
+import pytest
+
+from server.app import create_app
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({"DATABASE": str(tmp_path / "todo.db"), "ASSET_CACHE_DIR": ""})
+    return app.test_client()
+
+
+def add(client, content, section="today", indent_level=0):
+    todo_id = client.post("/api/todos", json={"content": content, "section": section}).get_json()["id"]
+    if indent_level:
+        client.put(f"/api/todos/{todo_id}", json={"indent_level": indent_level})
+    return todo_id
+
+
+def order(client, section="today"):
+    return [todo["id"] for todo in client.get("/api/todos").get_json() if todo["section"] == section]
+
+
+def test_move_carries_descendants(client):
+    parent = add(client, "親")
+    child = add(client, "子", indent_level=1)
+    other = add(client, "別")
+
+    response = client.post("/api/todos/move", json={"id": parent, "after_id": other})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()["items"]] == [parent, child]
+    assert order(client) == [other, parent, child]
+
+    # 先頭へ戻しつつ、別セクションへ移す
+    client.post("/api/todos/move", json={"id": parent, "after_id": None, "section": "future", "indent_level": 1})
+    future = {todo["id"]: todo for todo in client.get("/api/todos").get_json() if todo["section"] == "future"}
+    assert list(future) == [parent, child]
+    assert future[parent]["indent_level"] == 1 and future[child]["indent_level"] == 2
+
+
+def test_move_rejects_invalid_targets(client):
+    parent = add(client, "親")
+    child = add(client, "子", indent_level=1)
+    future = add(client, "未来", section="future")
+
+    assert client.post("/api/todos/move", json={"id": parent, "after_id": child}).status_code == 400
+    assert client.post("/api/todos/move", json={"id": parent, "after_id": future}).status_code == 400
+    assert client.post("/api/todos/move", json={"after_id": future}).status_code == 400
+    assert client.post("/api/todos/move", json={"id": 999}).status_code == 404
+    assert order(client) == [parent, child]
+
+
+def test_since_returns_only_changes(client):
+    kept = add(client, "残す")
+    removed = add(client, "消す")
+    version = int(client.get("/api/todos").headers["X-Todos-Version"])
+
+    client.put(f"/api/todos/{kept}", json={"is_completed": 1})
+    client.delete(f"/api/todos/{removed}")
+    changes = client.get(f"/api/todos?since={version}").get_json()
+    assert changes["full"] is False
+    assert [todo["id"] for todo in changes["todos"]] == [kept]
+    assert changes["deleted"] == [removed]
+    assert changes["version"] > version
+
+    nothing = client.get(f"/api/todos?since={changes['version']}").get_json()
+    assert nothing["todos"] == [] and nothing["deleted"] == []
+
+
+def test_unchanged_list_returns_304(client):
+    add(client, "一件目")
+    first = client.get("/api/todos")
+    etag = first.headers["ETag"]
+    assert client.get("/api/todos", headers={"If-None-Match": etag}).status_code == 304
+
+    add(client, "二件目")
+    changed = client.get("/api/todos", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
@@ -0,0 +1,57 @@
+from server.app import create_app
+from server.features.english import cache
+
+
+def make_app(tmp_path, name, **config):
+    return create_app({
+        "DATABASE": str(tmp_path / f"{name}.db"),
+        "ASSET_CACHE_DIR": "",
+        "DISABLED_FEATURES": [],
+        **config,
+    })
+
+
+def accessed_at(key):
+    from server.extensions import get_db
+
+    return get_db().execute("SELECT accessed_at FROM word_lookup_cache WHERE cache_key = ?", (key,)).fetchone()[0]
+
+
+def test_each_app_has_its_own_cache(tmp_path):
+    first = make_app(tmp_path, "first")
+    second = make_app(tmp_path, "second", WORD_CACHE_MAX_ENTRIES=5)
+    with first.app_context():
+        cache.get_lookup_cache().put("k", "apple", "m", "v", {"word": "apple", "meaning": "りんご"})
+        assert cache.get_lookup_cache().get("k")["meaning"] == "りんご"
+    with second.app_context():
+        assert cache.get_lookup_cache().get("k") is None
+        assert cache.get_lookup_cache().max_entries == 5
+    assert first.extensions["word_lookup_cache"] is not second.extensions["word_lookup_cache"]
+
+
+def test_memory_hits_refresh_disk_recency(tmp_path):
+    app = make_app(tmp_path, "touch")
+    with app.app_context():
+        lookup = cache.get_lookup_cache()
+        lookup.touch_batch = 2
+        lookup.put("hot", "hot", "m", "v", {"word": "hot", "meaning": "熱い"})
+        lookup.put("warm", "warm", "m", "v", {"word": "warm", "meaning": "暖かい"})
+        before = accessed_at("hot")
+        lookup.get("hot")
+        assert accessed_at("hot") == before  # 2 語分溜まるまでは書かない
+        lookup.get("warm")
+        assert accessed_at("hot") > before
+
+
+def test_eviction_keeps_words_hit_in_memory(tmp_path):
+    app = make_app(tmp_path, "evict", WORD_CACHE_MAX_ENTRIES=2)
+    with app.app_context():
+        lookup = cache.get_lookup_cache()
+        lookup.put("hot", "hot", "m", "v", {"word": "hot", "meaning": "熱い"})
+        lookup.put("cold", "cold", "m", "v", {"word": "cold", "meaning": "冷たい"})
+        # hot は前段でしか引かれていないが、後段の削除対象にはならない
+        lookup.get("hot")
+        lookup.put("new", "new", "m", "v", {"word": "new", "meaning": "新しい"})
+        lookup.clear_memory()
+        assert lookup.get("hot") is not None
+        assert lookup.get("cold") is None